@@ -2,43 +2,133 @@
 AI Processor Module
 Handles context understanding and token generation from email content
 """
+import hashlib
 import logging
-from typing import Dict, List, Optional, Any
+import threading
+from collections import OrderedDict
+from typing import IO, Dict, Iterable, List, Optional, Any, Tuple, Union
 import nltk
 from transformers import pipeline, AutoTokenizer, AutoModel
 import torch
 
-from config import AI_MODEL_NAME, MAX_TOKEN_LENGTH, CONFIDENCE_THRESHOLD
+from batcher import MicroBatcher
+from config import Settings, get_settings
+from context_stream import ContextAccumulator, iter_chunks
+from sentiment_lexicon import LexiconSentiment
+from shared_models import load_shared_models
+from token_message import TokenMessage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class AIProcessor:
-    """AI-powered email content processor"""
+    """
+    AI-powered email content processor
     
-    def __init__(self):
-        """Initialize AI models and tokenizer"""
+    Safe to share across threads: sentiment inference runs on a single
+    micro-batching thread that merges concurrent extract_context calls into
+    one forward pass, and embedding inference is serialized by a lock.
+    """
+    
+    # Settings that need a new AIProcessor; apply_settings handles the rest
+    MODEL_SETTINGS = frozenset({
+        'AI_MODEL_NAME', 'SENTIMENT_MODEL_NAME', 'MODEL_LOAD_MODE',
+        'INFERENCE_MAX_BATCH', 'INFERENCE_MAX_WAIT_MS'
+    })
+    
+    def __init__(
+        self,
+        model_load_mode: Optional[str] = None,
+        settings: Optional[Settings] = None
+    ):
+        """
+        Initialize AI models and tokenizer
+        
+        Args:
+            model_load_mode: 'default' loads private copies of the models;
+                'shared' reuses the process-wide weights in shared memory
+                (defaults to MODEL_LOAD_MODE)
+            settings: Settings snapshot (defaults to the current settings)
+        """
+        self.settings = settings or get_settings()
         try:
+            # Intra-op threads are process-wide, shared by every model
+            if self.settings.TORCH_THREADS:
+                torch.set_num_threads(self.settings.TORCH_THREADS)
+            
             # Download required NLTK data
             nltk.download('punkt', quiet=True)
             nltk.download('stopwords', quiet=True)
             
-            # Initialize tokenizer and model
-            self.tokenizer = AutoTokenizer.from_pretrained(AI_MODEL_NAME)
-            self.model = AutoModel.from_pretrained(AI_MODEL_NAME)
+            # Loaded once here: the corpus loader isn't safe to call from several threads
+            from nltk.corpus import stopwords
+            self.stop_words = set(stopwords.words('english'))
+            
+            if (model_load_mode or self.settings.MODEL_LOAD_MODE) == 'shared':
+                # Weights loaded once and shared with other worker processes
+                models = load_shared_models(self.settings)
+                self.tokenizer = models.tokenizer
+                self.model = models.model
+                self.sentiment_analyzer = pipeline(
+                    "sentiment-analysis",
+                    model=models.sentiment_model,
+                    tokenizer=models.sentiment_tokenizer
+                )
+            else:
+                # Initialize tokenizer and model
+                self.tokenizer = AutoTokenizer.from_pretrained(self.settings.AI_MODEL_NAME)
+                self.model = AutoModel.from_pretrained(self.settings.AI_MODEL_NAME)
+                
+                # Initialize sentiment analyzer
+                self.sentiment_analyzer = pipeline(
+                    "sentiment-analysis",
+                    model=self.settings.SENTIMENT_MODEL_NAME
+                )
             
-            # Initialize sentiment analyzer
-            self.sentiment_analyzer = pipeline(
-                "sentiment-analysis",
-                model="distilbert-base-uncased-finetuned-sst-2-english"
+            # Concurrent callers are coalesced into batched sentiment calls
+            self._sentiment_batcher = MicroBatcher(
+                self._analyze_sentiment_batch,
+                max_batch_size=self.settings.INFERENCE_MAX_BATCH,
+                max_wait=self.settings.INFERENCE_MAX_WAIT_MS / 1000,
+                name='sentiment-batcher'
             )
             
-            logger.info(f"AI Processor initialized with model: {AI_MODEL_NAME}")
+            # Fast tokenizers and models must not be called from two threads at once
+            self._model_lock = threading.Lock()
+            
+            # Clear-cut messages are classified by the lexicon, the rest escalate
+            self.sentiment_mode = self.settings.SENTIMENT_MODE
+            self.lexicon = LexiconSentiment()
+            self._tier_counts = {'lexicon': 0, 'transformer': 0}
+            self._tier_lock = threading.Lock()
+            
+            # Sentence embeddings keyed by sentence hash, least recently used first
+            self.key_phrase_mode = self.settings.KEY_PHRASE_MODE
+            self._embedding_cache: OrderedDict = OrderedDict()
+            self._embedding_lock = threading.Lock()
+            
+            logger.info(f"AI Processor initialized with model: {self.settings.AI_MODEL_NAME}")
         except Exception as e:
             logger.error(f"Error initializing AI Processor: {e}")
             raise
     
+    def apply_settings(self, settings: Settings):
+        """
+        Switch to new settings that don't affect the loaded models
+        
+        Args:
+            settings: New settings snapshot; MODEL_SETTINGS must be unchanged
+        """
+        if settings.TORCH_THREADS and settings.TORCH_THREADS != self.settings.TORCH_THREADS:
+            torch.set_num_threads(settings.TORCH_THREADS)
+        self.key_phrase_mode = settings.KEY_PHRASE_MODE
+        self.sentiment_mode = settings.SENTIMENT_MODE
+        self.settings = settings
+        with self._embedding_lock:
+            while len(self._embedding_cache) > settings.EMBEDDING_CACHE_SIZE:
+                self._embedding_cache.popitem(last=False)
+    
     def extract_context(self, email_content: str) -> Dict[str, Any]:
         """
         Extract context and meaning from email content
@@ -54,16 +144,18 @@ class AIProcessor:
             tokens = nltk.word_tokenize(email_content.lower())
             
             # Remove stopwords
-            from nltk.corpus import stopwords
-            stop_words = set(stopwords.words('english'))
-            filtered_tokens = [w for w in tokens if w not in stop_words and w.isalnum()]
+            filtered_tokens = [w for w in tokens if w not in self.stop_words and w.isalnum()]
             
             # Analyze sentiment
-            sentiment = self.sentiment_analyzer(email_content[:512])[0]
+            sentiment = self.classify_sentiment(email_content, tokens)
             
-            # Extract key phrases (simplified approach)
+            # Extract key phrases
             sentences = nltk.sent_tokenize(email_content)
-            key_phrases = sentences[:3] if len(sentences) > 3 else sentences
+            if self.key_phrase_mode == 'embedding' and len(sentences) > 1:
+                filtered_tokens, key_phrases = self._rank_by_embedding(sentences)
+            else:
+                # Simplified approach: leading sentences and tokens
+                key_phrases = sentences[:3] if len(sentences) > 3 else sentences
             
             context = {
                 'tokens': filtered_tokens[:50],  # Limit to top 50 tokens
@@ -81,6 +173,207 @@ class AIProcessor:
             logger.error(f"Error extracting context: {e}")
             return {'error': str(e)}
     
+    def extract_context_stream(
+        self,
+        source: Union[str, IO[str], Iterable[str]]
+    ) -> Dict[str, Any]:
+        """
+        Extract context from a body too large to hold as several copies
+        
+        Reads the body once, a chunk at a time, and gives the same result as
+        extract_context on the whole text while holding only the sentence
+        being read and the parts of the result that are kept. In 'embedding'
+        key phrase mode, bodies of more than STREAM_EMBEDDING_MAX_SENTENCES
+        sentences fall back to the leading sentences and tokens.
+        
+        Args:
+            source: Text file-like object, iterable of text chunks, or string
+            
+        Returns:
+            Dictionary containing extracted context information
+        """
+        try:
+            tally = self.lexicon.tally() if self.sentiment_mode == 'tiered' else None
+            embedding = self.key_phrase_mode == 'embedding'
+            accumulator = ContextAccumulator(
+                self.stop_words,
+                lexicon_tally=tally,
+                keep_sentences=self.settings.STREAM_EMBEDDING_MAX_SENTENCES if embedding else 0
+            )
+            for chunk in iter_chunks(source):
+                accumulator.feed(chunk)
+            summary = accumulator.finish().summary()
+            
+            sentiment = self._classify_tiered(
+                summary['head'], tally.result() if tally is not None else None
+            )
+            
+            sentences = summary['sentences']
+            if sentences is not None and len(sentences) > 1:
+                filtered_tokens, key_phrases = self._rank_by_embedding(sentences)
+            else:
+                filtered_tokens, key_phrases = summary['tokens'], summary['key_phrases']
+            
+            context = {
+                'tokens': filtered_tokens[:50],
+                'sentiment': sentiment['label'],
+                'sentiment_score': sentiment['score'],
+                'key_phrases': key_phrases,
+                'word_count': summary['word_count'],
+                'sentence_count': summary['sentence_count']
+            }
+            
+            logger.info(
+                f"Context extracted from stream of {summary['word_count']} words: "
+                f"{sentiment['label']} ({sentiment['score']:.2f})"
+            )
+            return context
+            
+        except Exception as e:
+            logger.error(f"Error extracting context: {e}")
+            return {'error': str(e)}
+    
+    def classify_sentiment(self, text: str, tokens: List[str]) -> Dict[str, Any]:
+        """
+        Classify sentiment, using the transformer only when the lexicon is unsure
+        
+        In 'tiered' mode the lexicon result is kept if its score reaches
+        CONFIDENCE_THRESHOLD; in 'transformer' mode every message goes to
+        the transformer.
+        
+        Args:
+            text: Message text
+            tokens: Lowercased word tokens of the message
+            
+        Returns:
+            Dictionary with 'label' and 'score'
+        """
+        lexicon = self.lexicon.classify(tokens) if self.sentiment_mode == 'tiered' else None
+        return self._classify_tiered(text, lexicon)
+    
+    def _classify_tiered(self, text: str, lexicon: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Keep a confident lexicon result, otherwise run the transformer on text"""
+        if lexicon is not None and lexicon['score'] >= self.settings.CONFIDENCE_THRESHOLD:
+            with self._tier_lock:
+                self._tier_counts['lexicon'] += 1
+            return lexicon
+        
+        with self._tier_lock:
+            self._tier_counts['transformer'] += 1
+        return self._sentiment_batcher(text[:512])
+    
+    def _analyze_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Run the sentiment pipeline over a batch of texts
+        
+        Args:
+            texts: Texts to classify
+            
+        Returns:
+            One {'label', 'score'} dictionary per text
+        """
+        return self.sentiment_analyzer(texts, batch_size=len(texts))
+    
+    def inference_stats(self) -> Dict[str, Any]:
+        """
+        Get sentiment batching statistics
+        
+        Returns:
+            Dictionary with batch count, item count, average batch size and
+            how many messages each sentiment tier classified
+        """
+        stats = self._sentiment_batcher.stats()
+        with self._tier_lock:
+            lexicon = self._tier_counts['lexicon']
+            transformer = self._tier_counts['transformer']
+        total = lexicon + transformer
+        stats['lexicon_classified'] = lexicon
+        stats['transformer_classified'] = transformer
+        stats['escalation_rate'] = transformer / total if total else 0.0
+        return stats
+    
+    def close(self):
+        """Stop the inference batching thread after pending requests finish"""
+        self._sentiment_batcher.close()
+    
+    def _embed_sentences(self, sentences: List[str]) -> torch.Tensor:
+        """
+        Embed sentences with the loaded model, reusing cached embeddings
+        
+        Uncached sentences are embedded together in one batched forward pass.
+        
+        Args:
+            sentences: Sentences to embed
+            
+        Returns:
+            Tensor of L2-normalized mean-pooled embeddings, one row per sentence
+        """
+        keys = [hashlib.sha1(sentence.encode()).digest() for sentence in sentences]
+        
+        with self._embedding_lock:
+            cached = {key: self._embedding_cache.get(key) for key in keys}
+        missing = [i for i, key in enumerate(keys) if cached[key] is None]
+        
+        if missing:
+            batch = [sentences[i] for i in missing]
+            with self._model_lock, torch.no_grad():
+                encoded = self.tokenizer(
+                    batch,
+                    padding=True,
+                    truncation=True,
+                    max_length=self.settings.MAX_TOKEN_LENGTH,
+                    return_tensors='pt'
+                )
+                hidden = self.model(**encoded).last_hidden_state
+            mask = encoded['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            pooled = torch.nn.functional.normalize(pooled, dim=1)
+            
+            with self._embedding_lock:
+                for row, i in enumerate(missing):
+                    cached[keys[i]] = pooled[row].clone()
+                    self._embedding_cache[keys[i]] = cached[keys[i]]
+                while len(self._embedding_cache) > self.settings.EMBEDDING_CACHE_SIZE:
+                    self._embedding_cache.popitem(last=False)
+        
+        with self._embedding_lock:
+            for key in keys:
+                if key in self._embedding_cache:
+                    self._embedding_cache.move_to_end(key)
+        
+        return torch.stack([cached[key] for key in keys])
+    
+    def _rank_by_embedding(self, sentences: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Rank sentences and terms by how central they are to the message
+        
+        A sentence's centrality is the cosine similarity of its embedding to
+        the mean embedding of the message. A term scores the summed centrality
+        of the sentences it appears in.
+        
+        Args:
+            sentences: Sentences of the message
+            
+        Returns:
+            Tuple of (unique terms, most central first; top three sentences in
+            their original order)
+        """
+        embeddings = self._embed_sentences(sentences)
+        centroid = torch.nn.functional.normalize(embeddings.mean(dim=0), dim=0)
+        centrality = (embeddings @ centroid).tolist()
+        
+        scores: Dict[str, float] = {}
+        for sentence, score in zip(sentences, centrality):
+            for word in set(nltk.word_tokenize(sentence.lower())):
+                if word not in self.stop_words and word.isalnum():
+                    scores[word] = scores.get(word, 0.0) + score
+        
+        # sorted() is stable, so ties keep their first-seen order
+        terms = sorted(scores, key=scores.get, reverse=True)
+        top = sorted(range(len(sentences)), key=lambda i: centrality[i], reverse=True)[:3]
+        key_phrases = [sentences[i] for i in sorted(top)]
+        return terms, key_phrases
+    
     def generate_tokens(self, context: Dict[str, Any]) -> List[str]:
         """
         Generate intelligent tokens from extracted context
@@ -115,22 +408,38 @@ class AIProcessor:
             logger.error(f"Error generating tokens: {e}")
             return []
     
+    def generate_token_message(self, context: Dict[str, Any]) -> Optional[TokenMessage]:
+        """
+        Generate tokens in the compact TokenMessage form
+        
+        Args:
+            context: Dictionary containing extracted context
+            
+        Returns:
+            TokenMessage, or None if no tokens could be generated
+        """
+        tokens = self.generate_tokens(context)
+        return TokenMessage.from_tokens(tokens) if tokens else None
+    
     def reconstruct_email(
         self,
-        tokens: List[str],
+        tokens: Union[List[str], TokenMessage],
         preferences: Optional[Dict[str, str]] = None
     ) -> str:
         """
         Reconstruct email from tokens based on user preferences
         
         Args:
-            tokens: List of tokens representing the message
+            tokens: List of tokens or TokenMessage representing the message
             preferences: User preferences for reconstruction (tone, length, etc.)
             
         Returns:
             Reconstructed email content
         """
         try:
+            if isinstance(tokens, TokenMessage):
+                tokens = tokens.to_tokens()
+            
             if not tokens:
                 return "Empty message"
             
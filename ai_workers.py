@@ -0,0 +1,93 @@
+"""
+AI Workers Module
+Runs the AI stage of sending in worker processes that share model weights
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch.multiprocessing
+
+from config import Settings, get_settings
+from shared_models import SharedModels, load_shared_models, set_shared_models
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# The worker process's own AIProcessor, built by _start_worker
+_processor = None
+
+
+def _start_worker(models: Optional[SharedModels], settings: Settings):
+    """Install the parent's shared models and build this worker's AIProcessor"""
+    global _processor
+    from ai_processor import AIProcessor
+    
+    if models is not None:
+        set_shared_models(models)
+    _processor = AIProcessor(settings=settings)
+
+
+def _prepare(content: str) -> Optional[Tuple[List[str], Dict[str, Any]]]:
+    """Extract context and generate tokens in a worker process"""
+    context = _processor.extract_context(content)
+    if 'error' in context:
+        logger.error("Failed to extract context")
+        return None
+    
+    tokens = _processor.generate_tokens(context)
+    if not tokens:
+        logger.error("Failed to generate tokens")
+        return None
+    return tokens, context
+
+
+class AIProcessPool:
+    """
+    Pool of worker processes running context extraction and token generation
+    
+    With MODEL_LOAD_MODE=shared the parent loads the models into shared
+    memory before any worker starts and hands them to each worker, so the
+    pool holds one copy of the weights however many processes it has.
+    Workers are spawned rather than forked, since the parent already runs
+    batching and transport threads, and keep the settings they started
+    with until the pool is rebuilt.
+    """
+    
+    def __init__(self, processes: int, settings: Optional[Settings] = None):
+        """
+        Initialize pool
+        
+        Args:
+            processes: Number of worker processes
+            settings: Settings snapshot (defaults to the current settings)
+        """
+        settings = settings or get_settings()
+        models = None
+        if settings.MODEL_LOAD_MODE == 'shared':
+            models = load_shared_models(settings)
+        
+        self.processes = processes
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=torch.multiprocessing.get_context('spawn'),
+            initializer=_start_worker,
+            initargs=(models, settings)
+        )
+        logger.info(f"AI process pool started with {processes} workers")
+    
+    def prepare_message(self, content: str) -> Optional[Tuple[List[str], Dict[str, Any]]]:
+        """
+        Run Messenger.prepare_message's work in a worker process
+        
+        Args:
+            content: Message content
+        
+        Returns:
+            Tuple of (tokens, context), or None if processing failed
+        """
+        return self._executor.submit(_prepare, content).result()
+    
+    def close(self):
+        """Wait for running jobs, then stop the worker processes"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,150 @@
+"""
+Batcher Module
+Coalesces concurrent inference requests into batched model calls
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Queue sentinel telling the batching thread to exit
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Runs a batch function on a single thread, merging concurrent requests
+    
+    Callers from any thread submit single items. The batching thread waits
+    up to max_wait after the first item for more to arrive, then calls
+    batch_fn once for up to max_batch_size items. Because only that thread
+    touches the model, the model never sees concurrent use.
+    """
+    
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_wait: float = 0.005,
+        name: str = 'batcher'
+    ):
+        """
+        Initialize batcher and start its thread
+        
+        Args:
+            batch_fn: Function mapping a list of items to a list of results
+            max_batch_size: Largest number of items per batch_fn call
+            max_wait: Seconds to wait for more items after the first arrives
+            name: Thread name used in logs
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+    
+    def submit(self, item: Any) -> Future:
+        """
+        Queue an item for the next batch
+        
+        Args:
+            item: Input for batch_fn
+        
+        Returns:
+            Future resolving to the item's result
+        
+        Raises:
+            RuntimeError: If the batcher is closed
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Batcher is closed")
+            self._queue.put((item, future))
+        return future
+    
+    def __call__(self, item: Any) -> Any:
+        """Submit an item and wait for its result"""
+        return self.submit(item).result()
+    
+    def _collect(self) -> List[Any]:
+        """Block for the first request, then gather more until full or out of time"""
+        first = self._queue.get()
+        if first is _STOP:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    request = self._queue.get(timeout=remaining)
+                else:
+                    request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is _STOP:
+                # Finish this batch, then stop on the next collect
+                self._queue.put(_STOP)
+                break
+            batch.append(request)
+        return batch
+    
+    def _run(self):
+        """Batching loop"""
+        while True:
+            batch = self._collect()
+            if not batch:
+                break
+            
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+            except Exception as e:
+                logger.error(f"Batch of {len(items)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            with self._lock:
+                self.batches += 1
+                self.items += len(items)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get batching statistics
+        
+        Returns:
+            Dictionary with batch count, item count and average batch size
+        """
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'avg_batch_size': self.items / self.batches if self.batches else 0.0,
+                'pending': self._queue.qsize()
+            }
+    
+    def close(self):
+        """Finish queued requests and stop the batching thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
@@ -0,0 +1,882 @@
+"""
+Performance benchmarks for AI Email Messenger
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import Future
+
+
+def _report(name, count, elapsed):
+    rate = count / elapsed if elapsed else float('inf')
+    print(f"{name}: {count} in {elapsed:.3f}s ({rate:,.0f}/s)")
+
+
+# Benchmark: context index ingestion and queries
+def benchmark_context_index(count=1_000_000):
+    from context_index import ContextIndex
+    
+    vocabulary = [f"term{i}" for i in range(20000)] + ['invoice', 'meeting', 'deadline']
+    sentiments = ['POSITIVE', 'NEGATIVE']
+    now = time.time()
+    rng = random.Random(0)
+    
+    def contexts():
+        for i in range(count):
+            yield (
+                f"user{i % 5000}@example.com",
+                {
+                    'tokens': rng.sample(vocabulary, 20),
+                    'sentiment': rng.choice(sentiments),
+                    'sentiment_score': rng.random(),
+                    'key_phrases': [],
+                    'word_count': rng.randint(10, 400)
+                },
+                "Benchmark",
+                now - rng.random() * 90 * 24 * 3600
+            )
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        index = ContextIndex(os.path.join(tmp, 'index.db'))
+        
+        start = time.perf_counter()
+        index.add_many(contexts())
+        _report("ingest", count, time.perf_counter() - start)
+        
+        week_ago = now - 7 * 24 * 3600
+        queries = {
+            'term': dict(terms=['invoice']),
+            'term+sentiment+week': dict(terms=['invoice'], sentiment='NEGATIVE', since=week_ago),
+            'two terms': dict(terms=['invoice', 'deadline']),
+            'sentiment+week': dict(sentiment='NEGATIVE', since=week_ago)
+        }
+        for name, query in queries.items():
+            runs = 20
+            start = time.perf_counter()
+            for _ in range(runs):
+                results = index.search(**query)
+            elapsed = time.perf_counter() - start
+            print(f"query {name}: {elapsed / runs * 1000:.2f} ms ({len(results)} results)")
+        
+        index.close()
+
+
+# Benchmark: STT recognition from recorded WAV fixtures
+def benchmark_stt(path='fixtures/stt'):
+    import glob
+    from stt_input import RecognitionPool
+    
+    files = sorted(glob.glob(os.path.join(path, '*.wav')))
+    if not files:
+        print(f"No WAV fixtures found in {path}")
+        return
+    
+    start = time.perf_counter()
+    pool = RecognitionPool(workers=1)
+    print(f"engine load: {(time.perf_counter() - start) * 1000:.1f} ms")
+    
+    latencies = []
+    start = time.perf_counter()
+    for name in files:
+        begin = time.perf_counter()
+        try:
+            pool.transcribe_file(name).result()
+        except Exception as e:
+            print(f"{os.path.basename(name)}: {e!r}")
+        latencies.append(time.perf_counter() - begin)
+    _report("sequential", len(files), time.perf_counter() - start)
+    latencies.sort()
+    print(f"  p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+          f"max {latencies[-1] * 1000:.1f} ms")
+    pool.shutdown()
+    
+    pool = RecognitionPool()
+    start = time.perf_counter()
+    futures = [pool.transcribe_file(name) for name in files]
+    for future in futures:
+        try:
+            future.result()
+        except Exception:
+            pass
+    _report(f"pooled ({pool.executor._max_workers} workers)", len(files), time.perf_counter() - start)
+    pool.shutdown()
+
+
+# Benchmark: memory of queued messages, list-of-strings vs TokenMessage
+def benchmark_token_memory(count=100_000):
+    import json
+    import tracemalloc
+    from token_message import Context, TokenMessage
+    
+    vocabulary = [f"word{i}" for i in range(5000)]
+    rng = random.Random(0)
+    
+    def payloads():
+        # Round-trip through JSON so every string is a fresh object, as on receipt
+        for _ in range(count):
+            content = rng.sample(vocabulary, 20)
+            tokens = ["SENTIMENT:POSITIVE"] + content + [f"LENGTH:{rng.randint(10, 400)}"]
+            context = {
+                'tokens': content + rng.sample(vocabulary, 30),
+                'sentiment': 'POSITIVE',
+                'sentiment_score': rng.random(),
+                'key_phrases': [" ".join(rng.sample(vocabulary, 12)) + "." for _ in range(3)],
+                'word_count': rng.randint(10, 400),
+                'sentence_count': rng.randint(1, 20)
+            }
+            yield json.loads(json.dumps(tokens)), json.loads(json.dumps(context))
+    
+    def measure(name, build):
+        tracemalloc.start()
+        queue = [build(tokens, context) for tokens, context in payloads()]
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        print(f"{name}: {current / 2**20:.1f} MiB retained "
+              f"({current / count:.0f} B/message), peak {peak / 2**20:.1f} MiB")
+        for stat in snapshot.statistics('lineno')[:3]:
+            print(f"    {stat}")
+        del queue
+    
+    measure("list + dict", lambda tokens, context: (tokens, context))
+    measure(
+        "TokenMessage + Context",
+        lambda tokens, context: (TokenMessage.from_tokens(tokens), Context.from_dict(context))
+    )
+    
+    tokens, context = next(payloads())
+    assert TokenMessage.from_tokens(tokens).to_tokens() == tokens
+    assert Context.from_dict(context).to_dict() == context
+
+
+# Benchmark: sequential send_message vs the stage-overlapped SendPipeline
+def benchmark_pipeline(count=200):
+    from pipeline import SendPipeline
+    
+    class SimulatedMessenger:
+        """Stand-in with a CPU-bound AI stage and an I/O-bound transport stage"""
+        
+        def prepare_message(self, content):
+            deadline = time.perf_counter() + 0.005
+            while time.perf_counter() < deadline:
+                pass
+            return ['SENTIMENT:POSITIVE', content, 'LENGTH:1'], {}
+        
+        def deliver_message(self, recipient, tokens, context, subject, sender,
+                            thread_id=None, priority=None):
+            time.sleep(0.02)
+            return True
+        
+        def submit_delivery(self, *args, **kwargs):
+            future = Future()
+            start = time.monotonic()
+            sent = self.deliver_message(*args, **kwargs)
+            future.send_seconds = time.monotonic() - start
+            future.set_result(sent)
+            return future
+    
+    messenger = SimulatedMessenger()
+    
+    start = time.perf_counter()
+    for i in range(count):
+        tokens, context = messenger.prepare_message(f"message {i}")
+        messenger.deliver_message("bob@example.com", tokens, context, "", "")
+    _report("sequential", count, time.perf_counter() - start)
+    
+    for transport_workers in (1, 4, 8):
+        pipeline = SendPipeline(messenger, ai_workers=1, transport_workers=transport_workers).start()
+        for i in range(count):
+            pipeline.submit("bob@example.com", f"message {i}")
+        pipeline.close()
+        stats = pipeline.stats()
+        _report(f"pipeline 1 AI / {transport_workers} transport", count, stats['elapsed'])
+        print(f"  utilization: ai {stats['ai']['utilization']:.0%}, "
+              f"transport {stats['transport']['utilization']:.0%}")
+
+
+SAMPLE_EMAILS = [
+    "Hi team. The quarterly invoice from Acme is still unpaid. Finance flagged it "
+    "twice this month. Could someone in accounts confirm the payment date? "
+    "Otherwise we risk a late fee. Thanks for sorting this out quickly.",
+    "Thanks for the great session yesterday! I really enjoyed the demo of the new "
+    "dashboard. Let's schedule a follow-up meeting next Tuesday to review the "
+    "rollout plan. I'll send the agenda tonight.",
+    "The deployment failed again last night. The database migration timed out "
+    "after forty minutes. We need to split the migration into smaller batches. "
+    "Please hold further releases until this is fixed. I am not happy about the delay.",
+]
+
+
+# Benchmark: heuristic vs embedding-ranked key phrases, cost per message
+def benchmark_key_phrases(count=50):
+    from ai_processor import AIProcessor
+    
+    processor = AIProcessor()
+    messages = [SAMPLE_EMAILS[i % len(SAMPLE_EMAILS)] + f" Reference {i}." for i in range(count)]
+    
+    for mode in ('heuristic', 'embedding'):
+        processor.key_phrase_mode = mode
+        for label in ('cold', 'warm'):
+            start = time.perf_counter()
+            for message in messages:
+                context = processor.extract_context(message)
+            elapsed = time.perf_counter() - start
+            print(f"{mode} ({label} cache): {elapsed / count * 1000:.1f} ms/message")
+        print(f"  tokens: {processor.generate_tokens(context)}")
+        print(f"  key phrases: {context['key_phrases']}")
+
+
+# Benchmark: concurrent extract_context on one shared AIProcessor
+def benchmark_concurrent_inference(count=256):
+    from concurrent.futures import ThreadPoolExecutor
+    from ai_processor import AIProcessor
+    
+    processor = AIProcessor()
+    messages = [SAMPLE_EMAILS[i % len(SAMPLE_EMAILS)] + f" Reference {i}." for i in range(count)]
+    
+    for threads in (1, 4, 16):
+        before = processor.inference_stats()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(processor.extract_context, messages))
+        _report(f"{threads} thread(s)", count, time.perf_counter() - start)
+        after = processor.inference_stats()
+        batches = after['batches'] - before['batches']
+        print(f"  {batches} forward passes, avg batch {count / batches:.1f}")
+    
+    processor.close()
+
+
+REPLY_CHAIN = [
+    "Hi Dana, the Q3 invoice for the Berlin office is still unpaid. Finance says the "
+    "purchase order number is missing. Can you send the purchase order for the invoice?",
+    "Thanks. I checked with procurement: the purchase order for the Berlin office invoice "
+    "was approved last week. I will forward the purchase order number today.",
+    "Great, finance received the purchase order number. They will process the Q3 invoice "
+    "for the Berlin office by Friday.",
+    "Quick update: the Berlin invoice was paid. Finance asked whether the Q4 invoice will "
+    "use the same purchase order.",
+    "Yes, the Q4 invoice can use the same purchase order. Procurement confirmed the budget "
+    "for the Berlin office covers both quarters.",
+    "Perfect, thanks Dana. I will let finance know the Q4 invoice uses the same purchase order.",
+]
+
+
+# Benchmark: bytes saved by thread delta encoding on a reply chain
+def benchmark_thread_delta(count=100):
+    import json
+    import re
+    from thread_dictionary import ThreadDictionaryStore, decode_thread_payload
+    
+    stop_words = {'the', 'a', 'is', 'for', 'of', 'to', 'can', 'you', 'i', 'will', 'was',
+                  'by', 'they', 'the', 'it', 'we', 'and', 'with', 'that', 'be', 'both'}
+    
+    def tokens_for(text, word_count):
+        words = [w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in stop_words]
+        return ["SENTIMENT:POSITIVE"] + words[:20] + [f"LENGTH:{word_count}"]
+    
+    sender_store = ThreadDictionaryStore()
+    receiver_store = ThreadDictionaryStore()
+    plain_bytes = 0
+    delta_bytes = 0
+    
+    for thread in range(count):
+        thread_id = f"thread-{thread}"
+        dictionary = sender_store.get(('bob@example.com', thread_id))
+        for text in REPLY_CHAIN:
+            tokens = tokens_for(text, len(text.split()))
+            plain = json.dumps({'tokens': tokens, 'sender': 'alice@example.com'})
+            
+            base, encoded, literals = dictionary.encode(tokens)
+            payload = {'thread': {'id': thread_id, 'base': base, 'refs': encoded},
+                       'sender': 'alice@example.com'}
+            delta = json.dumps(payload)
+            dictionary.append(literals)
+            
+            decoded = decode_thread_payload(receiver_store, 'alice@example.com', payload['thread'])
+            assert decoded == tokens
+            
+            plain_bytes += len(plain)
+            delta_bytes += len(delta)
+            if thread == 0:
+                print(f"reply: plain {len(plain)} B, delta {len(delta)} B")
+    
+    saved = plain_bytes - delta_bytes
+    print(f"{count} threads x {len(REPLY_CHAIN)} messages: plain {plain_bytes} B, "
+          f"delta {delta_bytes} B, saved {saved} B ({saved / plain_bytes:.0%})")
+
+
+# Benchmark: per-worker memory with private vs shared model weights
+def _smaps_rollup():
+    """Return (USS, PSS) of the current process in MiB from /proc"""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    uss = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return uss / 1024, fields.get('Pss', 0) / 1024
+
+
+def _shared_models_worker(mode, results, release):
+    from ai_processor import AIProcessor
+    
+    processor = AIProcessor(model_load_mode=mode)
+    processor.extract_context(SAMPLE_EMAILS[0])
+    results.put(_smaps_rollup())
+    # Stay alive so PSS is split across all workers when they measure
+    release.wait()
+    processor.close()
+
+
+def benchmark_shared_models(count=4):
+    import multiprocessing
+    
+    context = multiprocessing.get_context('fork')
+    for mode in ('default', 'shared'):
+        if mode == 'shared':
+            from shared_models import load_shared_models
+            load_shared_models()
+        
+        results = context.Queue()
+        release = context.Event()
+        workers = [
+            context.Process(target=_shared_models_worker, args=(mode, results, release))
+            for _ in range(count)
+        ]
+        for worker in workers:
+            worker.start()
+        samples = [results.get() for _ in workers]
+        release.set()
+        for worker in workers:
+            worker.join()
+        
+        uss = sum(sample[0] for sample in samples) / count
+        pss = sum(sample[1] for sample in samples) / count
+        print(f"{mode}: {count} workers, per worker USS {uss:.0f} MiB, "
+              f"PSS {pss:.0f} MiB, total PSS {pss * count:.0f} MiB")
+
+
+# Benchmark: outbound scheduler enqueue/dequeue cost
+def benchmark_scheduler(count=100_000):
+    from scheduler import FairQueue, INTERACTIVE, BULK
+    
+    rng = random.Random(0)
+    domains = [f"domain{i}.example.com" for i in range(1000)]
+    jobs = [
+        (rng.choice(domains), INTERACTIVE if rng.random() < 0.1 else BULK)
+        for _ in range(count)
+    ]
+    
+    for size in (count // 100, count // 10, count):
+        fair_queue = FairQueue()
+        start = time.perf_counter()
+        for i, (domain, priority) in enumerate(jobs[:size]):
+            fair_queue.push(i, domain, priority)
+        enqueue = time.perf_counter() - start
+        
+        now = time.monotonic()
+        start = time.perf_counter()
+        while fair_queue.pop(now)[0] is not None:
+            pass
+        dequeue = time.perf_counter() - start
+        
+        print(f"{size} pending: enqueue {enqueue / size * 1e6:.2f} us/op, "
+              f"dequeue {dequeue / size * 1e6:.2f} us/op")
+    
+    # Dispatch order under rate limits: one noisy domain against many quiet ones
+    fair_queue = FairQueue(relay_rate=1000, relay_burst=1000, domain_rate=100, domain_burst=10)
+    for i in range(1000):
+        fair_queue.push(('bulk', 'noisy.example.com'), 'noisy.example.com', BULK)
+    for i in range(100):
+        fair_queue.push(('bulk', f"quiet{i}.example.com"), f"quiet{i}.example.com", BULK)
+    fair_queue.push(('interactive', 'gui.example.com'), 'gui.example.com', INTERACTIVE)
+    
+    order = []
+    now = time.monotonic()
+    while len(fair_queue):
+        item, wait = fair_queue.pop(now)
+        if item is None:
+            now += wait
+        else:
+            order.append(item)
+    quiet_done = max(i for i, (_, domain) in enumerate(order) if domain.startswith('quiet'))
+    print(f"rate-limited: interactive sent at position {order.index(('interactive', 'gui.example.com'))}, "
+          f"all 100 quiet domains done by position {quiet_done}")
+
+
+# Benchmark: tiered (lexicon, then transformer) vs transformer-only sentiment
+def benchmark_tiered_sentiment(path='fixtures/sentiment.tsv'):
+    import csv
+    import nltk
+    from ai_processor import AIProcessor
+    
+    with open(path, newline='') as f:
+        corpus = list(csv.DictReader(f, delimiter='\t'))
+    texts = [row['text'] for row in corpus]
+    labels = [row['label'] for row in corpus]
+    tokens = [nltk.word_tokenize(text.lower()) for text in texts]
+    
+    processor = AIProcessor()
+    processor.classify_sentiment(texts[0], tokens[0])  # warm up
+    results = {}
+    for mode in ('transformer', 'tiered'):
+        processor.sentiment_mode = mode
+        before = processor.inference_stats()
+        start = time.perf_counter()
+        results[mode] = [
+            processor.classify_sentiment(text, words)['label']
+            for text, words in zip(texts, tokens)
+        ]
+        elapsed = time.perf_counter() - start
+        after = processor.inference_stats()
+        
+        escalated = after['transformer_classified'] - before['transformer_classified']
+        accuracy = sum(a == b for a, b in zip(results[mode], labels)) / len(labels)
+        _report(mode, len(texts), elapsed)
+        print(f"  accuracy {accuracy:.1%}, escalated to transformer {escalated / len(texts):.1%}")
+    
+    agreement = sum(
+        a == b for a, b in zip(results['tiered'], results['transformer'])
+    ) / len(texts)
+    print(f"tiered agrees with transformer-only on {agreement:.1%} of messages")
+    processor.close()
+
+
+# Benchmark: profiler overhead at different sampling rates
+def benchmark_profiling(count=2000):
+    import json
+    from profiler import CallProfiler
+    
+    payload = [{'id': i, 'tokens': [f"token{j}" for j in range(20)]} for i in range(200)]
+    
+    def operation():
+        return json.loads(json.dumps(payload))
+    
+    start = time.perf_counter()
+    for _ in range(count):
+        operation()
+    baseline = time.perf_counter() - start
+    _report('no profiler', count, baseline)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for allocations in (False, True):
+            for rate in (0.0, 0.01, 0.1, 1.0):
+                profiler = CallProfiler(rate, tmp, trace_allocations=allocations)
+                start = time.perf_counter()
+                for _ in range(count):
+                    with profiler.profile('operation'):
+                        operation()
+                elapsed = time.perf_counter() - start
+                stats = profiler.stats()['operation']
+                print(f"rate {rate:<5} allocations {str(allocations):<5}: "
+                      f"{elapsed / count * 1e6:7.1f} us/call, "
+                      f"measured overhead {elapsed / baseline - 1:+.1%}, "
+                      f"estimated {stats['estimated_overhead'] or 0.0:.1%}, "
+                      f"{stats['sampled']} sampled, {stats['stack_samples']} stack samples")
+        print(f"dump: {sorted(profiler.dump())}")
+
+
+# Benchmark: receiving a broadcast with and without the reconstruction cache
+def benchmark_reconstruction_cache(count=1000):
+    import json
+    import logging
+    from messenger import Messenger
+    from reconstruction_cache import ReconstructionCache
+    
+    logging.disable(logging.INFO)
+    messenger = Messenger()
+    payloads = [
+        json.dumps({'tokens': messenger.prepare_message(text)[0]})
+        for text in SAMPLE_EMAILS
+    ]
+    # A broadcast delivers each payload to many local recipients
+    received = [payloads[i % len(payloads)] for i in range(count)]
+    
+    for cache in (None, ReconstructionCache()):
+        messenger.reconstruction_cache = cache
+        start = time.perf_counter()
+        for raw in received:
+            messenger.receive_and_reconstruct(raw)
+        elapsed = time.perf_counter() - start
+        _report('cached' if cache else 'uncached', count, elapsed)
+        if cache:
+            stats = cache.stats()
+            print(f"  hit rate {stats['hit_rate']:.1%}, {stats['entries']} entries, "
+                  f"{stats['bytes']} B")
+    logging.disable(logging.NOTSET)
+    messenger.ai_processor.close()
+
+
+# Benchmark: on-device command spotting vs full recognition of voice commands
+def benchmark_stt_commands(path='fixtures/stt/commands'):
+    import glob
+    import speech_recognition as sr
+    from stt_input import CommandSpotter, RecognitionPool, match_command
+    
+    # Files are named <command>-<n>.wav, e.g. send-1.wav or quit-3.wav
+    files = sorted(glob.glob(os.path.join(path, '*.wav')))
+    if not files:
+        print(f"No WAV fixtures found in {path}")
+        return
+    recordings = []
+    for name in files:
+        with sr.AudioFile(name) as source:
+            audio = sr.Recognizer().record(source)
+        recordings.append((os.path.basename(name).split('-')[0], audio))
+    
+    spotter = CommandSpotter()
+    pool = RecognitionPool(workers=1)
+    
+    def recognize_full(audio):
+        try:
+            return pool.recognize(audio)
+        except sr.UnknownValueError:
+            return None
+    
+    def spot_then_full(audio):
+        text = spotter.spot(audio)
+        return text if text is not None else recognize_full(audio)
+    
+    for label, recognize in (
+        (f"full ({pool.engine})", recognize_full),
+        ('spotter', spotter.spot),
+        ('spotter + fallback', spot_then_full)
+    ):
+        latencies = []
+        correct = rejected = 0
+        for command, audio in recordings:
+            begin = time.perf_counter()
+            text = recognize(audio)
+            latencies.append(time.perf_counter() - begin)
+            rejected += text is None
+            correct += match_command(text) == command
+        latencies.sort()
+        print(f"{label}: accuracy {correct / len(recordings):.1%}, "
+              f"rejected {rejected / len(recordings):.1%}, "
+              f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+              f"max {latencies[-1] * 1000:.1f} ms")
+    pool.shutdown()
+
+
+# Benchmark: SMTP connection cost with full vs resumed TLS handshakes
+def _smtp_stand_in(cert_file, key_file, implicit):
+    """Start a minimal SMTP server on localhost; returns (server, port)"""
+    import socket
+    import socketserver
+    import ssl
+    import threading
+    
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock = context.wrap_socket(self.request, server_side=True) if implicit else self.request
+            reader = sock.makefile('rb')
+            sock.sendall(b"220 localhost ESMTP\r\n")
+            while True:
+                line = reader.readline()
+                if not line:
+                    return
+                command = line[:4].upper()
+                if command == b'EHLO':
+                    sock.sendall(b"250-localhost\r\n250 STARTTLS\r\n")
+                elif command == b'STAR':
+                    sock.sendall(b"220 Ready to start TLS\r\n")
+                    sock = context.wrap_socket(sock, server_side=True)
+                    reader = sock.makefile('rb')
+                elif command == b'DATA':
+                    sock.sendall(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                    while reader.readline() not in (b".\r\n", b''):
+                        pass
+                    sock.sendall(b"250 Queued\r\n")
+                elif command == b'QUIT':
+                    sock.sendall(b"221 Bye\r\n")
+                    return
+                else:
+                    sock.sendall(b"250 OK\r\n")
+    
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def benchmark_smtp_tls(count=200):
+    import ssl
+    import subprocess
+    from smtp_tls import SMTPConnector, certificate_fingerprint
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        cert_file = os.path.join(tmp, 'cert.pem')
+        key_file = os.path.join(tmp, 'key.pem')
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+             '-keyout', key_file, '-out', cert_file, '-subj', '/CN=localhost',
+             '-addext', 'subjectAltName=IP:127.0.0.1'],
+            check=True, capture_output=True
+        )
+        with open(cert_file) as f:
+            pin = certificate_fingerprint(ssl.PEM_cert_to_DER_cert(f.read()))
+        message = "Subject: benchmark\r\n\r\n" + '{"tokens": ["SENTIMENT:POSITIVE"]}'
+        
+        for mode, resume in (('none', False), ('starttls', False), ('starttls', True),
+                             ('implicit', False), ('implicit', True)):
+            server, port = _smtp_stand_in(cert_file, key_file, implicit=mode == 'implicit')
+            connector = SMTPConnector(mode, ca_file=cert_file, pins=pin, resume=resume)
+            start = time.perf_counter()
+            for _ in range(count):
+                with connector.connect('127.0.0.1', port) as smtp:
+                    smtp.sendmail('alice@example.com', ['bob@example.com'], message)
+            elapsed = time.perf_counter() - start
+            server.shutdown()
+            server.server_close()
+            
+            stats = connector.stats()
+            label = mode if mode == 'none' else f"{mode}, {'resumed' if resume else 'full'} handshakes"
+            _report(label, count, elapsed)
+            print(f"  {elapsed / count * 1000:.2f} ms/message, "
+                  f"{stats['resumed']}/{stats['handshakes']} handshakes resumed")
+
+
+# Benchmark: sharded jobs across worker processes, with a worker replaced mid-run
+class _ClusterWorkerMessenger:
+    """Stand-in messenger for cluster workers, with a short simulated send"""
+    
+    def prepare_message(self, content):
+        return ['SENTIMENT:POSITIVE', content, 'LENGTH:1'], {}
+    
+    def submit_delivery(self, recipient, tokens, context, subject, sender,
+                        thread_id=None, priority=None):
+        start = time.monotonic()
+        time.sleep(0.002)
+        future = Future()
+        future.send_seconds = time.monotonic() - start
+        future.set_result(True)
+        return future
+
+
+def _cluster_worker(coordinator, port):
+    import logging
+    from cluster import ClusterMember
+    from daemon import MessengerDaemon
+    
+    logging.disable(logging.INFO)
+    daemon = MessengerDaemon(_ClusterWorkerMessenger(), port=port, health_port=0)
+    daemon.start()
+    ClusterMember(coordinator, f"127.0.0.1:{port}", interval=0.2).start()
+    daemon.wait()
+
+
+def benchmark_cluster(count=2000):
+    import logging
+    import multiprocessing
+    import socket
+    from cluster import ClusterCoordinator, HashRing
+    
+    def free_port():
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+    
+    # Keys that change owner when a fourth node joins a three-node ring
+    ring = HashRing()
+    for node in ('a', 'b', 'c'):
+        ring.add(node)
+    domains = [f"domain{i}.example" for i in range(10000)]
+    before = [ring.node_for(domain) for domain in domains]
+    ring.add('d')
+    moved = sum(a != ring.node_for(domain) for a, domain in zip(before, domains))
+    print(f"join moves {moved / len(domains):.1%} of keys (ideal 25.0%)")
+    
+    logging.disable(logging.INFO)
+    coordinator = ClusterCoordinator(port=free_port(), health_port=0, node_timeout=1.0)
+    coordinator.start()
+    address = f"127.0.0.1:{coordinator.port}"
+    workers = [
+        multiprocessing.Process(target=_cluster_worker, args=(address, free_port()), daemon=True)
+        for _ in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    while len(coordinator.ring.nodes) < len(workers):
+        time.sleep(0.05)
+    
+    start = time.perf_counter()
+    for i in range(count):
+        if i == count // 2:
+            # Kill one worker without leaving and start a replacement
+            workers[0].terminate()
+            replacement = multiprocessing.Process(
+                target=_cluster_worker, args=(address, free_port()), daemon=True
+            )
+            replacement.start()
+            workers.append(replacement)
+        coordinator.submit({
+            'recipient': f"user{i}@domain{i % 100}.example",
+            'content': f"message {i}",
+            'id': f"job-{i}"
+        })
+    while coordinator.stats()['pending']:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    
+    stats = coordinator.stats()
+    _report("cluster", count, elapsed)
+    print(f"  sent {stats['sent']}, failed {stats['failed']}, retries {stats['retries']}, "
+          f"rerouted {stats['rerouted']}")
+    print(f"  finished per node: {sorted(stats['routed'].values())}")
+    coordinator.stop()
+    for worker in workers:
+        worker.terminate()
+    logging.disable(logging.NOTSET)
+
+
+# Benchmark: peak memory of whole-text vs streamed context extraction
+def _context_memory_worker(mode, path, results):
+    import resource
+    import nltk
+    from nltk.corpus import stopwords
+    from context_stream import ContextAccumulator
+    
+    stop_words = set(stopwords.words('english'))
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == 'whole':
+        # The text steps of extract_context
+        with open(path) as f:
+            text = f.read()
+        tokens = nltk.word_tokenize(text.lower())
+        filtered = [w for w in tokens if w not in stop_words and w.isalnum()][:50]
+        sentences = nltk.sent_tokenize(text)
+        summary = (len(tokens), len(sentences), filtered, sentences[:3])
+    else:
+        accumulator = ContextAccumulator(stop_words)
+        with open(path) as f:
+            for chunk in iter(lambda: f.read(64 * 1024), ''):
+                accumulator.feed(chunk)
+        stats = accumulator.finish().summary()
+        summary = (stats['word_count'], stats['sentence_count'], stats['tokens'], stats['key_phrases'])
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    results.put((mode, elapsed, peak / 1024, summary))
+
+
+def benchmark_context_stream(count=100):
+    import multiprocessing
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'body.txt')
+        with open(path, 'w') as f:
+            written = i = 0
+            while written < count * 1024 * 1024:
+                line = f"{SAMPLE_EMAILS[i % len(SAMPLE_EMAILS)]} Line {i}.\n"
+                f.write(line)
+                written += len(line)
+                i += 1
+        print(f"input: {written / 1024 / 1024:.0f} MB, {i} lines")
+        
+        results = multiprocessing.Queue()
+        summaries = {}
+        for mode in ('whole', 'stream'):
+            # A fresh process per mode, so peak RSS isn't shared between them
+            worker = multiprocessing.Process(target=_context_memory_worker, args=(mode, path, results))
+            worker.start()
+            mode, elapsed, peak, summaries[mode] = results.get()
+            worker.join()
+            print(f"{mode}: {elapsed:.1f}s, peak memory +{peak:.1f} MiB")
+        print(f"results match: {summaries['whole'] == summaries['stream']}")
+
+
+# Benchmark: UI frame latency while a large batch loads and sends
+def benchmark_gui_outbox(count=10000):
+    import tkinter as tk
+    from outbox import OutboxPanel, SENT, FAILED
+    
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"gui-outbox needs a display: {e}")
+        return
+    
+    def send(recipient, subject, message, preferences):
+        # Stands in for AI processing and transport
+        time.sleep(0.001)
+        return not recipient.startswith('fail')
+    
+    panel = OutboxPanel(root, send)
+    panel.grid(row=0, column=0, sticky='nsew')
+    panel.subject_entry.insert(0, "Invoice {invoice}")
+    panel.body_text.insert('1.0', "Hi {name}, invoice {invoice} is attached.")
+    rows = [
+        {'recipient': f"{'fail' if i % 100 == 0 else 'user'}{i}@example.com", 'name': f"User {i}", 'invoice': str(i)}
+        for i in range(count)
+    ]
+    
+    timings = {}
+    start = time.perf_counter()
+    
+    def check():
+        done = panel.counts[SENT] + panel.counts[FAILED]
+        if 'loaded' not in timings and panel._populated == count:
+            timings['loaded'] = time.perf_counter() - start
+        if done < count:
+            root.after(100, check)
+            return
+        timings['sent'] = time.perf_counter() - start
+        root.quit()
+    
+    panel.load_rows(rows)
+    panel.send_all()
+    root.after(100, check)
+    root.mainloop()
+    
+    latency = panel.frame_monitor.stats()
+    print(f"rows shown in {timings['loaded']:.2f}s")
+    _report('outbox sends', count, timings['sent'])
+    print(f"  sent {panel.counts[SENT]}, failed {panel.counts[FAILED]}")
+    print(
+        f"  frame latency p50 {latency['p50_ms']:.1f} ms, "
+        f"p95 {latency['p95_ms']:.1f} ms, max {latency['max_ms']:.1f} ms"
+    )
+    root.destroy()
+
+
+BENCHMARKS = {
+    'context-index': benchmark_context_index,
+    'stt': benchmark_stt,
+    'stt-commands': benchmark_stt_commands,
+    'token-memory': benchmark_token_memory,
+    'pipeline': benchmark_pipeline,
+    'key-phrases': benchmark_key_phrases,
+    'concurrent-inference': benchmark_concurrent_inference,
+    'thread-delta': benchmark_thread_delta,
+    'shared-models': benchmark_shared_models,
+    'scheduler': benchmark_scheduler,
+    'tiered-sentiment': benchmark_tiered_sentiment,
+    'profiling': benchmark_profiling,
+    'reconstruction-cache': benchmark_reconstruction_cache,
+    'smtp-tls': benchmark_smtp_tls,
+    'cluster': benchmark_cluster,
+    'context-stream': benchmark_context_stream,
+    'gui-outbox': benchmark_gui_outbox,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='AI Email Messenger - Benchmarks')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--count', type=int, help='Workload size')
+    parser.add_argument('--path', help='Fixture directory')
+    args = parser.parse_args()
+    
+    kwargs = {
+        name: value for name, value in (('count', args.count), ('path', args.path))
+        if value
+    }
+    BENCHMARKS[args.benchmark](**kwargs)
@@ -0,0 +1,150 @@
+"""
+Circuit Breaker Module
+Tracks transport health so failing paths can be skipped instead of timed out
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Per-transport circuit breaker with latency tracking"""
+    
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        latency_alpha: float = 0.3
+    ):
+        """
+        Initialize circuit breaker
+        
+        Args:
+            name: Transport name used in logs and metrics
+            failure_threshold: Consecutive failures before the breaker opens
+            reset_timeout: Seconds to stay open before allowing a probe
+            latency_alpha: Smoothing factor for the latency moving average
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency_alpha = latency_alpha
+        
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._consecutive_failures = 0
+        self._latency_ewma: Optional[float] = None
+        self._latency_at = float('-inf')
+        
+        self.successes = 0
+        self.failures = 0
+        self.rejections = 0
+        self.trips = 0
+    
+    @property
+    def state(self) -> str:
+        """Current breaker state, promoting OPEN to HALF_OPEN once the timeout elapses"""
+        with self._lock:
+            return self._current_state()
+    
+    @property
+    def latency(self) -> Optional[float]:
+        """
+        Smoothed latency of recent successful sends in seconds
+        
+        Returns None once the last sample is older than the reset timeout,
+        so a stale measurement does not keep a transport demoted forever.
+        """
+        with self._lock:
+            if time.monotonic() - self._latency_at > self.reset_timeout:
+                return None
+            return self._latency_ewma
+    
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"Circuit '{self.name}' half-open, allowing probe")
+        return self._state
+    
+    def allow_request(self) -> bool:
+        """
+        Check whether a request may use this transport
+        
+        Returns:
+            True if the caller may proceed, False if the breaker rejects it
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejections += 1
+            return False
+    
+    def record_success(self, latency: float):
+        """
+        Record a successful request
+        
+        Args:
+            latency: Time taken by the request in seconds
+        """
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit '{self.name}' closed after successful probe")
+            self._state = CLOSED
+            self._probe_in_flight = False
+            self._consecutive_failures = 0
+            self.successes += 1
+            if self._latency_ewma is None:
+                self._latency_ewma = latency
+            else:
+                self._latency_ewma += self.latency_alpha * (latency - self._latency_ewma)
+            self._latency_at = time.monotonic()
+    
+    def record_failure(self):
+        """Record a failed request, opening the breaker when the threshold is reached"""
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.trips += 1
+                    logger.warning(
+                        f"Circuit '{self.name}' opened after "
+                        f"{self._consecutive_failures} consecutive failures"
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get a snapshot of breaker state and counters
+        
+        Returns:
+            Dictionary of breaker metrics
+        """
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'successes': self.successes,
+                'failures': self.failures,
+                'consecutive_failures': self._consecutive_failures,
+                'rejections': self.rejections,
+                'trips': self.trips,
+                'latency_ewma': self._latency_ewma
+            }
@@ -0,0 +1,565 @@
+"""
+Cluster Module
+Shards send jobs across Messenger daemons with consistent hashing
+"""
+import bisect
+import hashlib
+import json
+import logging
+import socket
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+
+from daemon import _HealthServer, _JobServer
+from config import (
+    DAEMON_HOST, DAEMON_DEDUP_SIZE, CLUSTER_PORT, CLUSTER_HEALTH_PORT,
+    CLUSTER_SHARD_BY, CLUSTER_VNODES, CLUSTER_HEARTBEAT, CLUSTER_NODE_TIMEOUT,
+    CLUSTER_FAILURE_THRESHOLD, CLUSTER_REJOIN_COOLDOWN,
+    CLUSTER_FORWARD_WORKERS, CLUSTER_REPLY_TIMEOUT, CLUSTER_MAX_PENDING
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts while no node can take a job
+RETRY_DELAY = 0.5
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+def _split_address(address: str) -> Tuple[str, int]:
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def shard_key(job: Dict[str, Any], shard_by: str = CLUSTER_SHARD_BY) -> str:
+    """
+    Key a job is routed by
+    
+    Args:
+        job: Job dictionary
+        shard_by: 'domain' for the recipient's domain, or 'thread' for the
+            job's thread_id, falling back to the domain without one
+    
+    Returns:
+        Shard key
+    """
+    if shard_by == 'thread' and job.get('thread_id'):
+        return f"thread:{job['thread_id']}"
+    return job.get('recipient', '').rpartition('@')[2].lower()
+
+
+class HashRing:
+    """
+    Consistent hash ring of node addresses
+    
+    Each node is placed at several points on the ring, and a key belongs to
+    the first node point after the key's hash. Adding or removing a node
+    only moves the keys between its points and their predecessors, about
+    1/N of all keys, and the points spread load evenly across nodes.
+    """
+    
+    def __init__(self, vnodes: int = CLUSTER_VNODES):
+        """
+        Initialize ring
+        
+        Args:
+            vnodes: Points per node; more gives a more even spread
+        """
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes = set()
+        self._lock = threading.Lock()
+    
+    def add(self, node: str) -> bool:
+        """Add a node; returns False if it was already present"""
+        with self._lock:
+            if node in self._nodes:
+                return False
+            self._nodes.add(node)
+            for i in range(self.vnodes):
+                point = _hash(f"{node}#{i}")
+                index = bisect.bisect(self._points, point)
+                self._points.insert(index, point)
+                self._owners.insert(index, node)
+            return True
+    
+    def remove(self, node: str) -> bool:
+        """Remove a node; returns False if it wasn't present"""
+        with self._lock:
+            if node not in self._nodes:
+                return False
+            self._nodes.discard(node)
+            kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+            self._points = [p for p, _ in kept]
+            self._owners = [o for _, o in kept]
+            return True
+    
+    def node_for(self, key: str) -> Optional[str]:
+        """Node owning a key, or None if the ring is empty"""
+        with self._lock:
+            if not self._points:
+                return None
+            index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+            return self._owners[index]
+    
+    @property
+    def nodes(self) -> List[str]:
+        with self._lock:
+            return sorted(self._nodes)
+
+
+def request(address: str, message: Dict[str, Any], timeout: float = 5.0) -> Dict[str, Any]:
+    """
+    Send one message to a daemon or coordinator job socket and read the reply
+    
+    Args:
+        address: host:port of the job socket
+        message: Job or control message
+        timeout: Socket timeout in seconds
+    
+    Returns:
+        Reply dictionary
+    
+    Raises:
+        OSError: If the connection failed or closed without a reply
+    """
+    with socket.create_connection(_split_address(address), timeout=timeout) as sock:
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        line = sock.makefile('rb').readline()
+    if not line:
+        raise ConnectionError(f"{address} closed the connection without replying")
+    return json.loads(line)
+
+
+class _NodeClient:
+    """Pool of open job-socket connections to one node"""
+    
+    def __init__(self, address: str):
+        self.address = address
+        self._idle: List[Tuple[socket.socket, Any]] = []
+        self._lock = threading.Lock()
+    
+    def request(self, message: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Send a message over a pooled connection and read the reply"""
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            sock = socket.create_connection(_split_address(self.address), timeout=timeout)
+            connection = (sock, sock.makefile('rb'))
+        sock, reader = connection
+        
+        try:
+            sock.settimeout(timeout)
+            sock.sendall(json.dumps(message).encode() + b"\n")
+            line = reader.readline()
+            if not line:
+                raise ConnectionError(f"{self.address} closed the connection")
+            reply = json.loads(line)
+        except (OSError, ValueError):
+            sock.close()
+            raise
+        
+        with self._lock:
+            self._idle.append(connection)
+        return reply
+    
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock, _ in idle:
+            sock.close()
+
+
+class ClusterCoordinator:
+    """
+    Routes send jobs to worker daemons by consistent hashing
+    
+    Clients submit jobs to the coordinator exactly as they would to a
+    single daemon. Each job goes to the worker owning its shard key, so a
+    recipient domain (or conversation) keeps hitting the same node and
+    that node's caches, thread dictionaries and connections stay warm.
+    
+    Workers join by sending {"join": "host:port"} and repeat it as a
+    heartbeat; a worker that stops heartbeating, sends {"leave": ...} or
+    fails failure_threshold forwards in a row is dropped from the ring, and
+    its keys move to the next node. A worker dropped for missed heartbeats
+    or failures is only taken back after rejoin_cooldown, so a slow worker
+    doesn't flap in and out of the ring and drag its keys along. Delivery is at least once: a job is retried until a
+    worker reports it finished, and workers drop job ids they have already
+    accepted, so a retry to the same node isn't sent twice. A retry that
+    moved to another node after a failure can still be sent twice.
+    """
+    
+    def __init__(
+        self,
+        host: str = DAEMON_HOST,
+        port: int = CLUSTER_PORT,
+        health_port: int = CLUSTER_HEALTH_PORT,
+        shard_by: str = CLUSTER_SHARD_BY,
+        vnodes: int = CLUSTER_VNODES,
+        node_timeout: float = CLUSTER_NODE_TIMEOUT,
+        failure_threshold: int = CLUSTER_FAILURE_THRESHOLD,
+        rejoin_cooldown: float = CLUSTER_REJOIN_COOLDOWN,
+        forward_workers: int = CLUSTER_FORWARD_WORKERS,
+        reply_timeout: float = CLUSTER_REPLY_TIMEOUT,
+        max_pending: int = CLUSTER_MAX_PENDING,
+        dedup_size: int = DAEMON_DEDUP_SIZE
+    ):
+        """
+        Initialize coordinator
+        
+        Args:
+            host: Interface for the job socket and health endpoint
+            port: TCP port accepting jobs and join/leave messages
+            health_port: HTTP port serving /health (0 disables)
+            shard_by: 'domain' or 'thread', see shard_key
+            vnodes: Ring points per node
+            node_timeout: Seconds without a heartbeat before a node is dropped
+            failure_threshold: Consecutive failed forwards to a node before
+                it is dropped
+            rejoin_cooldown: Seconds a dropped node's heartbeats are ignored
+            forward_workers: Jobs forwarded to workers concurrently
+            reply_timeout: Seconds to wait for a worker to finish a job
+            max_pending: Jobs accepted but not yet finished before new
+                jobs are rejected
+            dedup_size: Recent job ids remembered to drop resubmitted jobs
+        """
+        self.host = host
+        self.port = port
+        self.health_port = health_port
+        self.shard_by = shard_by
+        self.node_timeout = node_timeout
+        self.failure_threshold = failure_threshold
+        self.rejoin_cooldown = rejoin_cooldown
+        self.reply_timeout = reply_timeout
+        self.max_pending = max_pending
+        self.dedup_size = dedup_size
+        
+        self.ring = HashRing(vnodes)
+        self._heartbeats: Dict[str, float] = {}
+        self._failures = Counter()
+        # Nodes dropped involuntarily, with when they may rejoin
+        self._cooldowns: Dict[str, float] = {}
+        self._clients: Dict[str, _NodeClient] = {}
+        self._executor = ThreadPoolExecutor(forward_workers, thread_name_prefix='forward')
+        
+        self._lock = threading.Lock()
+        self._recent: OrderedDict = OrderedDict()
+        self._pending = 0
+        self._stats = Counter()
+        self._routed = Counter()
+        
+        self._stop_event = threading.Event()
+        self._servers = []
+        self._reaper: Optional[threading.Thread] = None
+    
+    def join(self, node: str) -> bool:
+        """
+        Add a worker to the ring, or record its heartbeat if present
+        
+        Args:
+            node: host:port of the worker's job socket
+        
+        Returns:
+            False if the node is cooling down after being dropped
+        """
+        now = time.monotonic()
+        with self._lock:
+            until = self._cooldowns.get(node)
+            if until is not None:
+                if now < until:
+                    return False
+                del self._cooldowns[node]
+            self._heartbeats[node] = now
+        if self.ring.add(node):
+            logger.info(f"Node {node} joined, {len(self.ring.nodes)} nodes")
+        return True
+    
+    def leave(self, node: str, reason: str = "left", cooldown: bool = False):
+        """
+        Remove a worker from the ring
+        
+        Args:
+            node: host:port of the worker's job socket
+            reason: Logged reason
+            cooldown: Ignore the node's heartbeats for rejoin_cooldown seconds
+        """
+        with self._lock:
+            self._heartbeats.pop(node, None)
+            self._failures.pop(node, None)
+            if cooldown and self.rejoin_cooldown:
+                self._cooldowns[node] = time.monotonic() + self.rejoin_cooldown
+            client = self._clients.pop(node, None)
+        if client is not None:
+            client.close()
+        if self.ring.remove(node):
+            logger.info(f"Node {node} {reason}, {len(self.ring.nodes)} nodes")
+    
+    def _client(self, node: str) -> _NodeClient:
+        with self._lock:
+            client = self._clients.get(node)
+            if client is None:
+                client = self._clients[node] = _NodeClient(node)
+            return client
+    
+    def _reap(self):
+        """Drop nodes whose heartbeats stopped"""
+        while not self._stop_event.wait(self.node_timeout / 2):
+            now = time.monotonic()
+            with self._lock:
+                expired = [
+                    node for node, seen in self._heartbeats.items()
+                    if now - seen > self.node_timeout
+                ]
+                for node, until in list(self._cooldowns.items()):
+                    if now >= until:
+                        del self._cooldowns[node]
+            for node in expired:
+                self.leave(node, "timed out", cooldown=True)
+    
+    def submit(self, job: Dict[str, Any]) -> Optional[str]:
+        """
+        Accept a send job for forwarding
+        
+        Args:
+            job: Job dictionary as accepted by MessengerDaemon.submit
+        
+        Returns:
+            Job id, or None if the job was rejected
+        """
+        if self._stop_event.is_set() or not job.get('recipient') or not job.get('content'):
+            with self._lock:
+                self._stats['rejected'] += 1
+            return None
+        
+        job_id = job.setdefault('id', uuid.uuid4().hex)
+        with self._lock:
+            previous = self._recent.get(job_id)
+            if previous is not None and not (previous.done() and not previous.result()):
+                self._stats['duplicates'] += 1
+                return job_id
+            if self._pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                logger.warning(f"Too many pending jobs, rejected job {job_id}")
+                return None
+            self._pending += 1
+            self._stats['accepted'] += 1
+            
+            future = self._executor.submit(self._deliver, dict(job, wait=True))
+            self._recent[job_id] = future
+            while len(self._recent) > self.dedup_size:
+                self._recent.popitem(last=False)
+        return job_id
+    
+    def _deliver(self, job: Dict[str, Any]) -> bool:
+        """Forward a job until a worker finishes it; returns whether it was sent"""
+        key = shard_key(job, self.shard_by)
+        previous_node = None
+        try:
+            while True:
+                node = self.ring.node_for(key)
+                if node is None:
+                    if self._stop_event.is_set():
+                        logger.error(f"No nodes left, dropped job {job['id']}")
+                        return False
+                    time.sleep(RETRY_DELAY)
+                    continue
+                if previous_node is not None and node != previous_node:
+                    with self._lock:
+                        self._stats['rerouted'] += 1
+                previous_node = node
+                
+                try:
+                    reply = self._client(node).request(job, self.reply_timeout)
+                except (OSError, ValueError) as e:
+                    with self._lock:
+                        self._stats['retries'] += 1
+                        self._failures[node] += 1
+                        failures = self._failures[node]
+                    # Retry on the same node, which drops the job if it already
+                    # has it, until the node has failed too often in a row
+                    if failures >= self.failure_threshold:
+                        self.leave(node, f"failed {failures} times in a row ({e})", cooldown=True)
+                    else:
+                        time.sleep(RETRY_DELAY)
+                    continue
+                with self._lock:
+                    self._failures.pop(node, None)
+                
+                if not reply.get('accepted'):
+                    # Queue full or the node is shutting down
+                    with self._lock:
+                        self._stats['retries'] += 1
+                    time.sleep(RETRY_DELAY)
+                    continue
+                
+                sent = bool(reply.get('sent'))
+                with self._lock:
+                    self._routed[node] += 1
+                    self._stats['sent' if sent else 'failed'] += 1
+                return sent
+        finally:
+            with self._lock:
+                self._pending -= 1
+    
+    def result(self, job_id: str, timeout: Optional[float] = None) -> Optional[bool]:
+        """Wait for a recent job to finish; see MessengerDaemon.result"""
+        with self._lock:
+            future: Optional[Future] = self._recent.get(job_id)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            return None
+    
+    def handle_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answer one message from the job socket
+        
+        Args:
+            message: Job dictionary, or {"join": address} / {"leave": address}
+        
+        Returns:
+            Reply dictionary
+        """
+        if 'join' in message:
+            joined = self.join(message['join'])
+            return {'ok': joined, 'nodes': len(self.ring.nodes)}
+        if 'leave' in message:
+            self.leave(message['leave'])
+            return {'ok': True, 'nodes': len(self.ring.nodes)}
+        
+        job_id = self.submit(message)
+        reply = {'accepted': job_id is not None, 'id': job_id}
+        if job_id is not None and message.get('wait'):
+            reply['sent'] = self.result(job_id)
+        return reply
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get job counters and the jobs finished by each node
+        
+        Returns:
+            Dictionary of coordinator statistics
+        """
+        with self._lock:
+            stats = {
+                name: self._stats[name]
+                for name in (
+                    'accepted', 'rejected', 'duplicates', 'sent', 'failed', 'retries', 'rerouted'
+                )
+            }
+            stats['pending'] = self._pending
+            stats['routed'] = dict(self._routed)
+            stats['cooling_down'] = sorted(self._cooldowns)
+        stats['nodes'] = self.ring.nodes
+        return stats
+    
+    def start(self):
+        """Start accepting jobs and node heartbeats"""
+        self._servers.append(_JobServer((self.host, self.port), self))
+        logger.info(f"Coordinating jobs on {self.host}:{self.port}")
+        if self.health_port:
+            self._servers.append(_HealthServer((self.host, self.health_port), self))
+            logger.info(f"Health endpoint on http://{self.host}:{self.health_port}/health")
+        for server in self._servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        
+        self._reaper = threading.Thread(target=self._reap, name='node-reaper', daemon=True)
+        self._reaper.start()
+    
+    def stop(self):
+        """Stop accepting jobs and wait for accepted jobs to reach a worker"""
+        logger.info("Shutting down coordinator, forwarding pending jobs...")
+        self._stop_event.set()
+        for server in self._servers:
+            if isinstance(server, _JobServer):
+                server.shutdown()
+                server.server_close()
+        
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+        
+        for server in self._servers:
+            if isinstance(server, _HealthServer):
+                server.shutdown()
+                server.server_close()
+        logger.info(f"Coordinator stopped: {self.stats()}")
+    
+    def request_stop(self):
+        """Ask the coordinator to stop; safe to call from a signal handler"""
+        self._stop_event.set()
+    
+    def wait(self):
+        """Block until stop is requested"""
+        while not self._stop_event.wait(1.0):
+            pass
+
+
+class ClusterMember:
+    """Keeps a worker daemon joined to a coordinator with periodic heartbeats"""
+    
+    def __init__(self, coordinator: str, address: str, interval: float = CLUSTER_HEARTBEAT):
+        """
+        Initialize membership
+        
+        Args:
+            coordinator: host:port of the coordinator's job socket
+            address: host:port of this worker's job socket, as the
+                coordinator should reach it
+            interval: Seconds between heartbeats
+        """
+        self.coordinator = coordinator
+        self.address = address
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _heartbeat(self):
+        joined = False
+        while True:
+            try:
+                reply = request(self.coordinator, {'join': self.address})
+                if not reply.get('ok'):
+                    if joined:
+                        logger.warning(
+                            f"Coordinator {self.coordinator} dropped {self.address}, "
+                            f"rejoining after its cool-down"
+                        )
+                    joined = False
+                elif not joined:
+                    logger.info(f"Joined coordinator {self.coordinator} as {self.address}")
+                    joined = True
+            except (OSError, ValueError) as e:
+                logger.warning(f"Coordinator {self.coordinator} unreachable: {e}")
+                joined = False
+            if self._stop_event.wait(self.interval):
+                break
+    
+    def start(self) -> 'ClusterMember':
+        """Join the coordinator and keep heartbeating"""
+        self._thread = threading.Thread(target=self._heartbeat, name='cluster-heartbeat', daemon=True)
+        self._thread.start()
+        return self
+    
+    def leave(self):
+        """Stop heartbeating and leave the ring so no new jobs are routed here"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            request(self.coordinator, {'leave': self.address})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not leave coordinator {self.coordinator}: {e}")
@@ -1,37 +1,343 @@
 """
 Configuration settings for AI Email Messenger
 """
+import logging
 import os
-from dotenv import load_dotenv
+import threading
+from dataclasses import dataclass, fields
+from typing import Optional, Set, Tuple
 
-load_dotenv()
+from dotenv import dotenv_values, find_dotenv, load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Variables set before .env is read take precedence over it, on reload too
+_PROCESS_ENV = dict(os.environ)
+ENV_FILE = find_dotenv()
+load_dotenv(ENV_FILE)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Immutable snapshot of every setting
+    
+    Field names match the environment variables they are read from.
+    """
+    
+    # AI Model Configuration
+    AI_MODEL_NAME: str = 'distilbert-base-uncased'
+    SENTIMENT_MODEL_NAME: str = 'distilbert-base-uncased-finetuned-sst-2-english'
+    MODEL_LOAD_MODE: str = 'default'
+    MAX_TOKEN_LENGTH: int = 512
+    TORCH_THREADS: int = 0
+    CONFIDENCE_THRESHOLD: float = 0.7
+    SENTIMENT_MODE: str = 'transformer'
+    KEY_PHRASE_MODE: str = 'heuristic'
+    EMBEDDING_CACHE_SIZE: int = 10000
+    STREAM_EMBEDDING_MAX_SENTENCES: int = 1000
+    INFERENCE_MAX_BATCH: int = 16
+    INFERENCE_MAX_WAIT_MS: float = 5.0
+    
+    # Email Configuration
+    SMTP_SERVER: str = 'localhost'
+    SMTP_PORT: int = 25
+    SMTP_TLS: str = 'none'
+    SMTP_TLS_VERIFY: bool = True
+    SMTP_TLS_CA_FILE: str = ''
+    SMTP_TLS_PINS: str = ''
+    TELNET_HOST: str = 'localhost'
+    TELNET_PORT: int = 23
+    TELNET_CONNECT_TIMEOUT: float = 10.0
+    TELNET_REPLY_TIMEOUT: float = 5.0
+    BREAKER_FAILURE_THRESHOLD: int = 3
+    BREAKER_RESET_TIMEOUT: float = 30.0
+    THREAD_DICT_MAX_THREADS: int = 1000
+    THREAD_DICT_RESYNC_INTERVAL: int = 20
+    
+    # Outbound send scheduler (rates in sends per second, 0 means unlimited)
+    SEND_SCHEDULER: bool = False
+    SCHEDULER_WORKERS: int = 4
+    SCHEDULER_MAX_PENDING: int = 100000
+    RELAY_RATE: float = 10.0
+    RELAY_BURST: float = 20.0
+    DOMAIN_RATE: float = 2.0
+    DOMAIN_BURST: float = 5.0
+    
+    # Sent-message context index (disabled when empty)
+    CONTEXT_INDEX_PATH: str = ''
+    
+    # STT Configuration
+    STT_ENGINE: str = 'google'
+    STT_LANGUAGE: str = 'en-US'
+    STT_TIMEOUT: int = 5
+    STT_WORKERS: int = 2
+    STT_CALIBRATION_FILE: str = '.stt_calibration.json'
+    STT_CALIBRATION_TTL: float = 300.0
+    VOSK_MODEL_PATH: str = 'model'
+    STT_COMMAND_ENGINE: str = 'vosk'
+    STT_COMMAND_CONFIDENCE: float = 0.6
+    
+    # GUI Configuration
+    WINDOW_WIDTH: int = 800
+    WINDOW_HEIGHT: int = 600
+    THEME: str = 'default'
+    OUTBOX_WORKERS: int = 4
+    OUTBOX_CHUNK_ROWS: int = 500
+    OUTBOX_POLL_MS: int = 50
+    
+    # User Preferences
+    DEFAULT_TONE: str = 'professional'
+    DEFAULT_LENGTH: str = 'medium'
+    AUTO_SEND: bool = False
+    
+    # Reconstructed email cache budget in bytes (0 disables)
+    RECONSTRUCTION_CACHE_BYTES: int = 16 * 1024 * 1024
+    
+    # Most distinct tokens interned for in-memory token messages
+    TOKEN_VOCABULARY_SIZE: int = 50000
+    
+    # Daemon Configuration
+    DAEMON_HOST: str = '127.0.0.1'
+    DAEMON_PORT: int = 8025
+    DAEMON_HEALTH_PORT: int = 8026
+    DAEMON_SPOOL_DIR: str = ''
+    DAEMON_AI_WORKERS: int = 4
+    DAEMON_AI_PROCESSES: int = 0
+    DAEMON_TRANSPORT_WORKERS: int = 4
+    DAEMON_QUEUE_SIZE: int = 100
+    DAEMON_DEDUP_SIZE: int = 10000
+    
+    # Cluster (workers join CLUSTER_COORDINATOR when it is set)
+    CLUSTER_COORDINATOR: str = ''
+    CLUSTER_PORT: int = 8035
+    CLUSTER_HEALTH_PORT: int = 8036
+    CLUSTER_ADVERTISE: str = ''
+    CLUSTER_SHARD_BY: str = 'domain'
+    CLUSTER_VNODES: int = 64
+    CLUSTER_HEARTBEAT: float = 2.0
+    CLUSTER_NODE_TIMEOUT: float = 6.0
+    CLUSTER_FAILURE_THRESHOLD: int = 3
+    CLUSTER_REJOIN_COOLDOWN: float = 30.0
+    CLUSTER_FORWARD_WORKERS: int = 32
+    CLUSTER_REPLY_TIMEOUT: float = 120.0
+    CLUSTER_MAX_PENDING: int = 10000
+    
+    # Values tuned by `main.py --mode tune`, overriding .env (disabled when empty)
+    TUNING_PROFILE: str = ''
+    
+    # Logging
+    LOG_LEVEL: str = 'INFO'
+    LOG_FILE: str = 'messenger.log'
+    
+    # Profiling (fraction of calls sampled, 0 disables)
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_TOGGLE_RATE: float = 0.01
+    PROFILE_DIR: str = 'profiles'
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_ALLOCATIONS: bool = True
+    
+    @classmethod
+    def load(cls, env_file: Optional[str] = None) -> 'Settings':
+        """
+        Read settings from a .env file and the process environment
+        
+        A TUNING_PROFILE named in either is read too; its values override
+        the .env file but not the process environment.
+        
+        Args:
+            env_file: Path of the .env file (defaults to the one found at startup)
+        
+        Returns:
+            New Settings snapshot
+        
+        Raises:
+            ValueError: If a numeric setting does not parse
+        """
+        path = env_file or ENV_FILE
+        env = dotenv_values(path) if path else {}
+        profile = _PROCESS_ENV.get('TUNING_PROFILE', env.get('TUNING_PROFILE'))
+        if profile:
+            if os.path.exists(profile):
+                env.update(dotenv_values(profile))
+            else:
+                logger.warning(f"Tuning profile {profile} not found")
+        env = {**env, **_PROCESS_ENV}
+        
+        values = {}
+        for field in fields(cls):
+            raw = env.get(field.name)
+            if raw is None:
+                continue
+            if field.type is bool:
+                values[field.name] = raw.lower() == 'true'
+            else:
+                values[field.name] = field.type(raw)
+        return cls(**values)
+    
+    def changed(self, other: 'Settings') -> Set[str]:
+        """Names of the settings whose values differ from other"""
+        return {
+            field.name for field in fields(self)
+            if getattr(self, field.name) != getattr(other, field.name)
+        }
+
+
+_settings = Settings.load()
+_settings_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """Get the current settings snapshot"""
+    return _settings
+
+
+def set_settings(settings: Settings) -> Settings:
+    """
+    Make a settings snapshot current
+    
+    Args:
+        settings: New settings snapshot
+    
+    Returns:
+        The previous settings
+    """
+    global _settings
+    with _settings_lock:
+        old, _settings = _settings, settings
+    return old
+
+
+def reload_settings(env_file: Optional[str] = None) -> Tuple[Settings, Settings]:
+    """
+    Re-read settings and make them current
+    
+    The module-level constants below keep their startup values; components
+    that support reloading read get_settings() instead.
+    
+    Args:
+        env_file: Path of the .env file (defaults to the one found at startup)
+    
+    Returns:
+        Tuple of (previous settings, new settings)
+    """
+    new = Settings.load(env_file)
+    old = set_settings(new)
+    changed = new.changed(old)
+    logger.info(f"Settings reloaded, changed: {sorted(changed) or 'none'}")
+    return old, new
+
+
+# Startup values as module constants, for `from config import NAME`
 
 # AI Model Configuration
-AI_MODEL_NAME = os.getenv('AI_MODEL_NAME', 'distilbert-base-uncased')
-MAX_TOKEN_LENGTH = int(os.getenv('MAX_TOKEN_LENGTH', '512'))
-CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', '0.7'))
+AI_MODEL_NAME = _settings.AI_MODEL_NAME
+SENTIMENT_MODEL_NAME = _settings.SENTIMENT_MODEL_NAME
+MODEL_LOAD_MODE = _settings.MODEL_LOAD_MODE
+MAX_TOKEN_LENGTH = _settings.MAX_TOKEN_LENGTH
+TORCH_THREADS = _settings.TORCH_THREADS
+CONFIDENCE_THRESHOLD = _settings.CONFIDENCE_THRESHOLD
+SENTIMENT_MODE = _settings.SENTIMENT_MODE
+KEY_PHRASE_MODE = _settings.KEY_PHRASE_MODE
+EMBEDDING_CACHE_SIZE = _settings.EMBEDDING_CACHE_SIZE
+STREAM_EMBEDDING_MAX_SENTENCES = _settings.STREAM_EMBEDDING_MAX_SENTENCES
+INFERENCE_MAX_BATCH = _settings.INFERENCE_MAX_BATCH
+INFERENCE_MAX_WAIT_MS = _settings.INFERENCE_MAX_WAIT_MS
 
 # Email Configuration
-SMTP_SERVER = os.getenv('SMTP_SERVER', 'localhost')
-SMTP_PORT = int(os.getenv('SMTP_PORT', '25'))
-TELNET_HOST = os.getenv('TELNET_HOST', 'localhost')
-TELNET_PORT = int(os.getenv('TELNET_PORT', '23'))
+SMTP_SERVER = _settings.SMTP_SERVER
+SMTP_PORT = _settings.SMTP_PORT
+SMTP_TLS = _settings.SMTP_TLS
+SMTP_TLS_VERIFY = _settings.SMTP_TLS_VERIFY
+SMTP_TLS_CA_FILE = _settings.SMTP_TLS_CA_FILE
+SMTP_TLS_PINS = _settings.SMTP_TLS_PINS
+TELNET_HOST = _settings.TELNET_HOST
+TELNET_PORT = _settings.TELNET_PORT
+TELNET_CONNECT_TIMEOUT = _settings.TELNET_CONNECT_TIMEOUT
+TELNET_REPLY_TIMEOUT = _settings.TELNET_REPLY_TIMEOUT
+BREAKER_FAILURE_THRESHOLD = _settings.BREAKER_FAILURE_THRESHOLD
+BREAKER_RESET_TIMEOUT = _settings.BREAKER_RESET_TIMEOUT
+THREAD_DICT_MAX_THREADS = _settings.THREAD_DICT_MAX_THREADS
+THREAD_DICT_RESYNC_INTERVAL = _settings.THREAD_DICT_RESYNC_INTERVAL
+
+# Outbound send scheduler (rates in sends per second, 0 means unlimited)
+SEND_SCHEDULER = _settings.SEND_SCHEDULER
+SCHEDULER_WORKERS = _settings.SCHEDULER_WORKERS
+SCHEDULER_MAX_PENDING = _settings.SCHEDULER_MAX_PENDING
+RELAY_RATE = _settings.RELAY_RATE
+RELAY_BURST = _settings.RELAY_BURST
+DOMAIN_RATE = _settings.DOMAIN_RATE
+DOMAIN_BURST = _settings.DOMAIN_BURST
+
+# Sent-message context index (disabled when empty)
+CONTEXT_INDEX_PATH = _settings.CONTEXT_INDEX_PATH
 
 # STT Configuration
-STT_ENGINE = os.getenv('STT_ENGINE', 'google')
-STT_LANGUAGE = os.getenv('STT_LANGUAGE', 'en-US')
-STT_TIMEOUT = int(os.getenv('STT_TIMEOUT', '5'))
+STT_ENGINE = _settings.STT_ENGINE
+STT_LANGUAGE = _settings.STT_LANGUAGE
+STT_TIMEOUT = _settings.STT_TIMEOUT
+STT_WORKERS = _settings.STT_WORKERS
+STT_CALIBRATION_FILE = _settings.STT_CALIBRATION_FILE
+STT_CALIBRATION_TTL = _settings.STT_CALIBRATION_TTL
+VOSK_MODEL_PATH = _settings.VOSK_MODEL_PATH
+STT_COMMAND_ENGINE = _settings.STT_COMMAND_ENGINE
+STT_COMMAND_CONFIDENCE = _settings.STT_COMMAND_CONFIDENCE
 
 # GUI Configuration
-WINDOW_WIDTH = int(os.getenv('WINDOW_WIDTH', '800'))
-WINDOW_HEIGHT = int(os.getenv('WINDOW_HEIGHT', '600'))
-THEME = os.getenv('THEME', 'default')
+WINDOW_WIDTH = _settings.WINDOW_WIDTH
+WINDOW_HEIGHT = _settings.WINDOW_HEIGHT
+THEME = _settings.THEME
+OUTBOX_WORKERS = _settings.OUTBOX_WORKERS
+OUTBOX_CHUNK_ROWS = _settings.OUTBOX_CHUNK_ROWS
+OUTBOX_POLL_MS = _settings.OUTBOX_POLL_MS
 
 # User Preferences
-DEFAULT_TONE = os.getenv('DEFAULT_TONE', 'professional')
-DEFAULT_LENGTH = os.getenv('DEFAULT_LENGTH', 'medium')
-AUTO_SEND = os.getenv('AUTO_SEND', 'false').lower() == 'true'
+DEFAULT_TONE = _settings.DEFAULT_TONE
+DEFAULT_LENGTH = _settings.DEFAULT_LENGTH
+AUTO_SEND = _settings.AUTO_SEND
+
+# Reconstructed email cache budget in bytes (0 disables)
+RECONSTRUCTION_CACHE_BYTES = _settings.RECONSTRUCTION_CACHE_BYTES
+
+# Most distinct tokens interned for in-memory token messages
+TOKEN_VOCABULARY_SIZE = _settings.TOKEN_VOCABULARY_SIZE
+
+# Daemon Configuration
+DAEMON_HOST = _settings.DAEMON_HOST
+DAEMON_PORT = _settings.DAEMON_PORT
+DAEMON_HEALTH_PORT = _settings.DAEMON_HEALTH_PORT
+DAEMON_SPOOL_DIR = _settings.DAEMON_SPOOL_DIR
+DAEMON_AI_WORKERS = _settings.DAEMON_AI_WORKERS
+DAEMON_AI_PROCESSES = _settings.DAEMON_AI_PROCESSES
+DAEMON_TRANSPORT_WORKERS = _settings.DAEMON_TRANSPORT_WORKERS
+DAEMON_QUEUE_SIZE = _settings.DAEMON_QUEUE_SIZE
+DAEMON_DEDUP_SIZE = _settings.DAEMON_DEDUP_SIZE
+
+# Cluster (workers join CLUSTER_COORDINATOR when it is set)
+CLUSTER_COORDINATOR = _settings.CLUSTER_COORDINATOR
+CLUSTER_PORT = _settings.CLUSTER_PORT
+CLUSTER_HEALTH_PORT = _settings.CLUSTER_HEALTH_PORT
+CLUSTER_ADVERTISE = _settings.CLUSTER_ADVERTISE
+CLUSTER_SHARD_BY = _settings.CLUSTER_SHARD_BY
+CLUSTER_VNODES = _settings.CLUSTER_VNODES
+CLUSTER_HEARTBEAT = _settings.CLUSTER_HEARTBEAT
+CLUSTER_NODE_TIMEOUT = _settings.CLUSTER_NODE_TIMEOUT
+CLUSTER_FAILURE_THRESHOLD = _settings.CLUSTER_FAILURE_THRESHOLD
+CLUSTER_REJOIN_COOLDOWN = _settings.CLUSTER_REJOIN_COOLDOWN
+CLUSTER_FORWARD_WORKERS = _settings.CLUSTER_FORWARD_WORKERS
+CLUSTER_REPLY_TIMEOUT = _settings.CLUSTER_REPLY_TIMEOUT
+CLUSTER_MAX_PENDING = _settings.CLUSTER_MAX_PENDING
+
+# Values tuned by `main.py --mode tune`, overriding .env (disabled when empty)
+TUNING_PROFILE = _settings.TUNING_PROFILE
 
 # Logging
-LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
-LOG_FILE = os.getenv('LOG_FILE', 'messenger.log')
+LOG_LEVEL = _settings.LOG_LEVEL
+LOG_FILE = _settings.LOG_FILE
+
+# Profiling (fraction of calls sampled, 0 disables)
+PROFILE_SAMPLE_RATE = _settings.PROFILE_SAMPLE_RATE
+PROFILE_TOGGLE_RATE = _settings.PROFILE_TOGGLE_RATE
+PROFILE_DIR = _settings.PROFILE_DIR
+PROFILE_INTERVAL_MS = _settings.PROFILE_INTERVAL_MS
+PROFILE_ALLOCATIONS = _settings.PROFILE_ALLOCATIONS
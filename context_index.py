@@ -0,0 +1,198 @@
+"""
+Context Index Module
+Persists extracted context of sent messages for fast search without reprocessing
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    sent_at REAL NOT NULL,
+    recipient TEXT NOT NULL,
+    subject TEXT,
+    sentiment TEXT,
+    sentiment_score REAL,
+    word_count INTEGER,
+    key_phrases TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_sent_at ON messages (sent_at);
+CREATE INDEX IF NOT EXISTS idx_messages_sentiment ON messages (sentiment, sent_at);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (term, message_id)
+) WITHOUT ROWID;
+"""
+
+
+class ContextIndex:
+    """Inverted index over the context of sent messages, stored in sqlite"""
+    
+    def __init__(self, path: str):
+        """
+        Open or create the index
+        
+        Args:
+            path: sqlite database file (':memory:' for a throwaway index)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA cache_size=-65536")
+        self._conn.executescript(SCHEMA)
+        logger.info(f"Context index opened at {path}")
+    
+    def add(
+        self,
+        recipient: str,
+        context: Dict[str, Any],
+        subject: str = "",
+        sent_at: Optional[float] = None
+    ) -> int:
+        """
+        Index the context of one sent message
+        
+        Args:
+            recipient: Email address of recipient
+            context: Context dictionary from AIProcessor.extract_context
+            subject: Email subject
+            sent_at: Send time as a Unix timestamp (defaults to now)
+        
+        Returns:
+            Id of the indexed message
+        """
+        with self._lock, self._conn:
+            return self._insert(recipient, context, subject, sent_at)
+    
+    def add_many(
+        self,
+        entries: Iterable[Tuple[str, Dict[str, Any], str, Optional[float]]]
+    ) -> int:
+        """
+        Index many messages in a single transaction
+        
+        Args:
+            entries: (recipient, context, subject, sent_at) tuples
+        
+        Returns:
+            Number of messages indexed
+        """
+        count = 0
+        with self._lock, self._conn:
+            for recipient, context, subject, sent_at in entries:
+                self._insert(recipient, context, subject, sent_at)
+                count += 1
+        return count
+    
+    def _insert(
+        self,
+        recipient: str,
+        context: Dict[str, Any],
+        subject: str,
+        sent_at: Optional[float]
+    ) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO messages (sent_at, recipient, subject, sentiment, "
+            "sentiment_score, word_count, key_phrases) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                sent_at if sent_at is not None else time.time(),
+                recipient,
+                subject,
+                str(context.get('sentiment', '')).upper(),
+                context.get('sentiment_score'),
+                context.get('word_count'),
+                json.dumps(context.get('key_phrases', []))
+            )
+        )
+        message_id = cursor.lastrowid
+        terms = set(context.get('tokens', []))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO postings (term, message_id) VALUES (?, ?)",
+            [(term, message_id) for term in terms]
+        )
+        return message_id
+    
+    def search(
+        self,
+        terms: Optional[List[str]] = None,
+        sentiment: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Find indexed messages, newest first
+        
+        Args:
+            terms: Tokens that must all appear in the message
+            sentiment: Sentiment label to match (e.g. 'NEGATIVE')
+            since: Only messages sent at or after this Unix timestamp
+            until: Only messages sent before this Unix timestamp
+            limit: Maximum number of results
+        
+        Returns:
+            List of message dictionaries
+        """
+        clauses = []
+        params: List[Any] = []
+        
+        if terms:
+            postings = " INTERSECT ".join(
+                "SELECT message_id FROM postings WHERE term = ?" for _ in terms
+            )
+            clauses.append(f"id IN ({postings})")
+            params.extend(term.lower() for term in terms)
+        if sentiment:
+            clauses.append("sentiment = ?")
+            params.append(sentiment.upper())
+        if since is not None:
+            clauses.append("sent_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("sent_at < ?")
+            params.append(until)
+        
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(limit)
+        
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, sent_at, recipient, subject, sentiment, sentiment_score, "
+                f"word_count, key_phrases FROM messages {where} "
+                "ORDER BY sent_at DESC LIMIT ?",
+                params
+            ).fetchall()
+        
+        return [
+            {
+                'id': row[0],
+                'sent_at': row[1],
+                'recipient': row[2],
+                'subject': row[3],
+                'sentiment': row[4],
+                'sentiment_score': row[5],
+                'word_count': row[6],
+                'key_phrases': json.loads(row[7])
+            }
+            for row in rows
+        ]
+    
+    def count(self) -> int:
+        """Number of indexed messages"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,202 @@
+"""
+Context Stream Module
+Single-pass, bounded-memory text statistics for very large message bodies
+"""
+import logging
+import re
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Set, Union
+
+import nltk
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Characters read from a file-like source at a time
+CHUNK_SIZE = 64 * 1024
+
+# Longest run of text held while waiting for a sentence to end; longer
+# sentences (e.g. a log with no punctuation) are cut at this length
+MAX_SENTENCE_CHARS = 1024 * 1024
+
+_LAST_SPACE = re.compile(r'\s(?=\S*\Z)')
+
+
+def iter_chunks(source: Union[str, IO[str], Iterable[str]], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Iterate over a text source in chunks
+    
+    Args:
+        source: A string, a text file-like object with read(), or an
+            iterable of string chunks
+        chunk_size: Characters per read from a file-like object
+    
+    Yields:
+        Text chunks
+    """
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+    elif hasattr(source, 'read'):
+        yield from iter(lambda: source.read(chunk_size), '')
+    else:
+        yield from source
+
+
+class SentenceStream:
+    """
+    Splits streamed text into sentences as nltk.sent_tokenize would
+    
+    Punkt decides a boundary from the words on either side of it, so every
+    sentence but the last in the buffered text is final; the last one is
+    held until more text arrives or the stream ends.
+    """
+    
+    def __init__(self, max_sentence_chars: int = MAX_SENTENCE_CHARS):
+        """
+        Initialize stream
+        
+        Args:
+            max_sentence_chars: Length at which an unfinished sentence is cut
+        """
+        self.max_sentence_chars = max_sentence_chars
+        self._pending = ''
+    
+    def feed(self, text: str) -> List[str]:
+        """
+        Add text ending at a word boundary
+        
+        Args:
+            text: Next piece of text
+        
+        Returns:
+            Sentences completed by this text
+        """
+        self._pending += text
+        sentences = nltk.sent_tokenize(self._pending)
+        if len(sentences) < 2:
+            if len(self._pending) > self.max_sentence_chars:
+                return self.flush()
+            return []
+        
+        last = sentences.pop()
+        self._pending = self._pending[self._pending.rindex(last):]
+        return sentences
+    
+    def flush(self) -> List[str]:
+        """Sentences in the text still held, at the end of the stream"""
+        pending, self._pending = self._pending, ''
+        return nltk.sent_tokenize(pending) if pending.strip() else []
+
+
+class ContextAccumulator:
+    """
+    Collects what extract_context needs from a body, one chunk at a time
+    
+    Memory is bounded by the longest sentence plus the kept results: the
+    first sentences and filtered tokens, the head of the text for the
+    transformer, and optionally every sentence up to a limit.
+    """
+    
+    def __init__(
+        self,
+        stop_words: Set[str],
+        lexicon_tally: Optional[Any] = None,
+        max_tokens: int = 50,
+        max_key_phrases: int = 3,
+        head_chars: int = 512,
+        keep_sentences: int = 0
+    ):
+        """
+        Initialize accumulator
+        
+        Args:
+            stop_words: Words left out of the filtered tokens
+            lexicon_tally: LexiconTally fed every lowercased word token
+            max_tokens: Filtered tokens kept, first ones first
+            max_key_phrases: Leading sentences kept as key phrases
+            head_chars: Characters kept from the start of the text
+            keep_sentences: Keep every sentence while there are at most
+                this many, for ranking by embedding (0 keeps none)
+        """
+        self.stop_words = stop_words
+        self.lexicon_tally = lexicon_tally
+        self.max_tokens = max_tokens
+        self.max_key_phrases = max_key_phrases
+        self.head_chars = head_chars
+        self.keep_sentences = keep_sentences
+        
+        # Sentences come from the original text, word tokens from the
+        # lowercased text, which Punkt can split differently
+        self._sentences = SentenceStream()
+        self._lower_sentences = SentenceStream()
+        self._carry = ''
+        
+        self.head = ''
+        self.word_count = 0
+        self.sentence_count = 0
+        self.tokens: List[str] = []
+        self.key_phrases: List[str] = []
+        self.sentences: Optional[List[str]] = [] if keep_sentences else None
+    
+    def feed(self, chunk: str):
+        """Add the next chunk of text"""
+        if len(self.head) < self.head_chars:
+            self.head += chunk[:self.head_chars - len(self.head)]
+        
+        text = self._carry + chunk
+        match = _LAST_SPACE.search(text)
+        if match is None and len(text) <= MAX_SENTENCE_CHARS:
+            self._carry = text
+            return
+        # Only whole words are passed on; a partial word waits for the next chunk
+        cut = match.end() if match is not None else len(text)
+        text, self._carry = text[:cut], text[cut:]
+        
+        self._add_sentences(self._sentences.feed(text))
+        self._add_words(self._lower_sentences.feed(text.lower()))
+    
+    def finish(self) -> 'ContextAccumulator':
+        """Process the text still held at the end of the stream"""
+        text, self._carry = self._carry, ''
+        self._add_sentences(self._sentences.feed(text) + self._sentences.flush())
+        self._add_words(self._lower_sentences.feed(text.lower()) + self._lower_sentences.flush())
+        return self
+    
+    def _add_sentences(self, sentences: List[str]):
+        self.sentence_count += len(sentences)
+        room = self.max_key_phrases - len(self.key_phrases)
+        if room > 0:
+            self.key_phrases.extend(sentences[:room])
+        if self.sentences is not None:
+            self.sentences.extend(sentences)
+            if len(self.sentences) > self.keep_sentences:
+                self.sentences = None
+    
+    def _add_words(self, sentences: List[str]):
+        for sentence in sentences:
+            words = nltk.word_tokenize(sentence, preserve_line=True)
+            self.word_count += len(words)
+            if self.lexicon_tally is not None:
+                self.lexicon_tally.update(words)
+            if len(self.tokens) < self.max_tokens:
+                self.tokens.extend(
+                    w for w in words if w not in self.stop_words and w.isalnum()
+                )
+                del self.tokens[self.max_tokens:]
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the collected statistics
+        
+        Returns:
+            Dictionary with word_count, sentence_count, tokens, key_phrases,
+            head and sentences (None if not kept or over the limit)
+        """
+        return {
+            'word_count': self.word_count,
+            'sentence_count': self.sentence_count,
+            'tokens': self.tokens,
+            'key_phrases': self.key_phrases,
+            'head': self.head,
+            'sentences': self.sentences
+        }
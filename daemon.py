@@ -0,0 +1,395 @@
+"""
+Daemon Module
+Runs the Messenger send pipeline as a long-lived headless service
+"""
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from messenger import Messenger
+from pipeline import SendPipeline
+from scheduler import PRIORITIES, BULK
+from config import (
+    DAEMON_HOST, DAEMON_PORT, DAEMON_HEALTH_PORT, DAEMON_SPOOL_DIR,
+    DAEMON_AI_WORKERS, DAEMON_AI_PROCESSES, DAEMON_TRANSPORT_WORKERS, DAEMON_QUEUE_SIZE,
+    DAEMON_DEDUP_SIZE
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How long producers wait for room in a full queue before giving up
+ENQUEUE_TIMEOUT = 5.0
+
+
+def is_valid_job(job: Any) -> bool:
+    """
+    Whether a decoded job is a dictionary with a recipient and content,
+    and with a string id and a known priority if it names them
+    """
+    if not (isinstance(job, dict) and job.get('recipient') and job.get('content')):
+        return False
+    if 'id' in job and not isinstance(job['id'], str):
+        return False
+    priority = job.get('priority')
+    return priority is None or (isinstance(priority, str) and priority in PRIORITIES)
+
+
+class _Reservation(Future):
+    """Result of a job, reserved under its id before the job is queued"""
+    
+    def __init__(self):
+        super().__init__()
+        self.settled = threading.Event()
+        self.rejected = False
+
+
+class MessengerDaemon:
+    """Accepts send jobs from a socket or spool directory and processes them concurrently"""
+    
+    def __init__(
+        self,
+        messenger: Messenger,
+        host: str = DAEMON_HOST,
+        port: int = DAEMON_PORT,
+        health_port: int = DAEMON_HEALTH_PORT,
+        spool_dir: str = DAEMON_SPOOL_DIR,
+        ai_workers: int = DAEMON_AI_WORKERS,
+        ai_processes: int = DAEMON_AI_PROCESSES,
+        transport_workers: int = DAEMON_TRANSPORT_WORKERS,
+        queue_size: int = DAEMON_QUEUE_SIZE,
+        dedup_size: int = DAEMON_DEDUP_SIZE
+    ):
+        """
+        Initialize daemon
+        
+        Args:
+            messenger: Messenger used to process and send jobs
+            host: Interface for the job socket and health endpoint
+            port: TCP port accepting newline-delimited JSON jobs (0 disables)
+            health_port: HTTP port serving /health (0 disables)
+            spool_dir: Directory polled for *.json job files (empty disables)
+            ai_workers: Threads running context extraction and token generation
+            ai_processes: Worker processes the AI threads hand messages to,
+                sharing the parent's model weights (0 runs the AI stage in
+                this process)
+            transport_workers: Threads transmitting tokens
+            queue_size: Capacity of each inter-stage queue
+            dedup_size: Recent job ids remembered to drop resubmitted jobs
+        """
+        self.messenger = messenger
+        self.host = host
+        self.port = port
+        self.health_port = health_port
+        self.spool_dir = spool_dir
+        
+        # The pool loads shared models in this process before its workers start
+        self.ai_pool = None
+        prepare = None
+        if ai_processes:
+            from ai_workers import AIProcessPool
+            
+            self.ai_pool = AIProcessPool(ai_processes, messenger.settings)
+            prepare = self.ai_pool.prepare_message
+            ai_workers = max(ai_workers, ai_processes)
+        self.pipeline = SendPipeline(
+            messenger, ai_workers, transport_workers, queue_size, prepare=prepare
+        )
+        
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {'accepted': 0, 'rejected': 0, 'duplicates': 0}
+        
+        # Futures of recent jobs by id, so a resubmitted job isn't sent twice
+        self.dedup_size = dedup_size
+        self._recent: OrderedDict = OrderedDict()
+        self._servers = []
+        self._spool_thread: Optional[threading.Thread] = None
+    
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+    
+    def _release(self, job_id: str, reserved: _Reservation, previous: Optional[_Reservation]):
+        """Settle a reservation for a job that was never queued, restoring the id's previous attempt"""
+        with self._stats_lock:
+            self._stats['rejected'] += 1
+            if self._recent.get(job_id) is reserved:
+                if previous is not None:
+                    self._recent[job_id] = previous
+                else:
+                    del self._recent[job_id]
+        reserved.rejected = True
+        reserved.set_result(False)
+        reserved.settled.set()
+    
+    def submit(self, job: Dict[str, Any], timeout: float = ENQUEUE_TIMEOUT) -> Optional[str]:
+        """
+        Queue a send job
+        
+        Args:
+            job: Dictionary with recipient, content and optional
+                subject/sender/id/thread_id/priority ('interactive' or 'bulk')
+            timeout: Seconds to wait for room in the job queue
+        
+        A job whose id matches one still queued or already sent is not
+        queued again, so clients can safely retry a job they have no reply
+        for. A job that failed is retried.
+        
+        Returns:
+            Job id, or None if the job was rejected
+        """
+        if self._stop_event.is_set():
+            self._count('rejected')
+            return None
+        if not is_valid_job(job):
+            logger.warning("Rejected malformed job")
+            self._count('rejected')
+            return None
+        
+        # The id is reserved before queueing, so concurrent retries of one job
+        # (socket and spool, or a client retry) can't both get queued
+        job_id = job.setdefault('id', uuid.uuid4().hex)
+        reserved = _Reservation()
+        with self._stats_lock:
+            previous = self._recent.get(job_id)
+            if previous is not None and not (previous.done() and not previous.result()):
+                self._stats['duplicates'] += 1
+                duplicate = previous
+            else:
+                duplicate = None
+                self._recent[job_id] = reserved
+            self._recent.move_to_end(job_id)
+            while len(self._recent) > self.dedup_size:
+                self._recent.popitem(last=False)
+        
+        if duplicate is not None:
+            # Same answer as the attempt already under way, once it is queued
+            duplicate.settled.wait()
+            return None if duplicate.rejected else job_id
+        
+        try:
+            future = self.pipeline.submit(
+                job['recipient'],
+                job['content'],
+                job.get('subject', ''),
+                job.get('sender', 'ai-messenger@localhost'),
+                timeout=timeout,
+                priority=PRIORITIES.get(job.get('priority'), BULK),
+                thread_id=job.get('thread_id')
+            )
+        except queue.Full:
+            logger.warning(f"Job queue full, rejected job {job_id}")
+            self._release(job_id, reserved, previous)
+            return None
+        except Exception:
+            # Settle the reservation first, so retries of this id don't wait forever
+            self._release(job_id, reserved, previous)
+            raise
+        
+        def report(done):
+            sent = done.result()
+            if not sent:
+                logger.error(f"Job {job_id} failed")
+            reserved.set_result(sent)
+        
+        future.add_done_callback(report)
+        reserved.settled.set()
+        self._count('accepted')
+        return job_id
+    
+    def result(self, job_id: str, timeout: Optional[float] = None) -> Optional[bool]:
+        """
+        Wait for a recent job to finish
+        
+        Args:
+            job_id: Id returned by submit
+            timeout: Seconds to wait (None waits until the job finishes)
+        
+        Returns:
+            True if the message was sent, False if it failed, None if the
+            job is unknown or still running at the timeout
+        """
+        with self._stats_lock:
+            future: Optional[Future] = self._recent.get(job_id)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            return None
+    
+    def handle_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answer one message from the job socket
+        
+        Args:
+            message: Job dictionary; with 'wait' set, the reply is sent once
+                the job finishes and includes whether it was sent
+        
+        Returns:
+            Reply dictionary
+        """
+        job_id = self.submit(message)
+        reply = {'accepted': job_id is not None, 'id': job_id}
+        if job_id is not None and message.get('wait'):
+            reply['sent'] = self.result(job_id)
+        return reply
+    
+    def _poll_spool(self):
+        """Claim *.json job files from the spool directory"""
+        while not self._stop_event.wait(0.5):
+            try:
+                names = sorted(n for n in os.listdir(self.spool_dir) if n.endswith('.json'))
+            except OSError as e:
+                logger.error(f"Cannot read spool directory: {e}")
+                continue
+            
+            for name in names:
+                if self._stop_event.is_set() or self.pipeline.inbound.full():
+                    break
+                path = os.path.join(self.spool_dir, name)
+                try:
+                    with open(path) as f:
+                        job = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Invalid spool file {name}: {e}")
+                    os.replace(path, path + '.failed')
+                    continue
+                if not is_valid_job(job):
+                    logger.error(f"Invalid spool file {name}: not a job with recipient and content")
+                    os.replace(path, path + '.failed')
+                    continue
+                
+                job.setdefault('id', name[:-len('.json')])
+                if self.submit(job) is None:
+                    # Queue full or stopping; the file is picked up again next poll
+                    break
+                os.remove(path)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get job counters, queue depths, stage utilization and throughput
+        
+        Returns:
+            Dictionary of daemon statistics
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(self.pipeline.stats())
+        return stats
+    
+    def start(self):
+        """Start workers and job sources"""
+        self.pipeline.start()
+        
+        if self.port:
+            self._servers.append(_JobServer((self.host, self.port), self))
+            logger.info(f"Accepting jobs on {self.host}:{self.port}")
+        if self.health_port:
+            self._servers.append(_HealthServer((self.host, self.health_port), self))
+            logger.info(f"Health endpoint on http://{self.host}:{self.health_port}/health")
+        for server in self._servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._spool_thread = threading.Thread(
+                target=self._poll_spool,
+                name='spool',
+                daemon=True
+            )
+            self._spool_thread.start()
+            logger.info(f"Polling spool directory {self.spool_dir}")
+    
+    def stop(self):
+        """Stop accepting jobs, drain both queues and wait for workers to finish"""
+        logger.info("Shutting down daemon, draining queues...")
+        self._stop_event.set()
+        
+        for server in self._servers:
+            if isinstance(server, _JobServer):
+                server.shutdown()
+                server.server_close()
+        if self._spool_thread is not None:
+            self._spool_thread.join()
+        
+        self.pipeline.close()
+        if self.ai_pool is not None:
+            self.ai_pool.close()
+        
+        for server in self._servers:
+            if isinstance(server, _HealthServer):
+                server.shutdown()
+                server.server_close()
+        
+        logger.info(f"Daemon stopped: {self.stats()}")
+    
+    def request_stop(self):
+        """Ask the daemon to stop; safe to call from a signal handler"""
+        self._stop_event.set()
+    
+    def wait(self):
+        """Block until stop is requested"""
+        while not self._stop_event.wait(1.0):
+            pass
+
+
+class _JobRequestHandler(socketserver.StreamRequestHandler):
+    """Reads one JSON job per line and answers with one JSON line"""
+    
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+                if not isinstance(message, dict):
+                    raise ValueError("Message must be a JSON object")
+                reply = self.server.daemon.handle_message(message)
+            except (TypeError, ValueError) as e:
+                reply = {'accepted': False, 'error': str(e)}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class _JobServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, address, daemon: MessengerDaemon):
+        self.daemon = daemon
+        super().__init__(address, _JobRequestHandler)
+
+
+class _HealthRequestHandler(BaseHTTPRequestHandler):
+    """Serves daemon statistics as JSON on /health"""
+    
+    def do_GET(self):
+        if self.path.rstrip('/') != '/health':
+            self.send_error(404)
+            return
+        body = json.dumps(self.server.daemon.stats()).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class _HealthServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, address, daemon: MessengerDaemon):
+        self.daemon = daemon
+        super().__init__(address, _HealthRequestHandler)
@@ -3,90 +3,314 @@ Email Handler Module
 Manages email transmission over telnet and SMTP
 """
 import telnetlib
-import smtplib
 import logging
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 import json
 
-from config import SMTP_SERVER, SMTP_PORT, TELNET_HOST, TELNET_PORT
+from circuit_breaker import CircuitBreaker, OPEN
+from smtp_tls import SMTPConnector
+from thread_dictionary import (
+    ThreadDictionaryStore, encode_thread_payload, decode_thread_payload
+)
+from token_message import TokenMessage
+from config import Settings, get_settings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Token transports in default preference order
+TRANSPORTS = ('telnet', 'smtp')
+
+# Settings the SMTP connector is built from
+SMTP_TLS_SETTINGS = ('SMTP_TLS', 'SMTP_TLS_VERIFY', 'SMTP_TLS_CA_FILE', 'SMTP_TLS_PINS')
+
 
 class EmailHandler:
     """Handles email transmission and reception"""
     
-    def __init__(self):
-        """Initialize email handler"""
-        self.smtp_server = SMTP_SERVER
-        self.smtp_port = SMTP_PORT
-        self.telnet_host = TELNET_HOST
-        self.telnet_port = TELNET_PORT
+    def __init__(self, settings: Optional[Settings] = None):
+        """
+        Initialize email handler
+        
+        Args:
+            settings: Settings snapshot (defaults to the current settings)
+        """
+        self.settings = settings or get_settings()
+        self.breakers = {
+            name: CircuitBreaker(
+                name,
+                failure_threshold=self.settings.BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=self.settings.BREAKER_RESET_TIMEOUT
+            )
+            for name in TRANSPORTS
+        }
+        self._transmitters = {
+            'telnet': self._transmit_telnet,
+            'smtp': self._transmit_smtp
+        }
+        
+        # Shared TLS context and resumable sessions for every SMTP connection
+        self.smtp = SMTPConnector.from_settings(self.settings)
+        
+        # Per-conversation token dictionaries for delta-encoded replies
+        self.outbound_threads = ThreadDictionaryStore(self.settings.THREAD_DICT_MAX_THREADS)
+        self.inbound_threads = ThreadDictionaryStore(self.settings.THREAD_DICT_MAX_THREADS)
         logger.info("Email Handler initialized")
     
+    @property
+    def smtp_server(self) -> str:
+        return self.settings.SMTP_SERVER
+    
+    @property
+    def smtp_port(self) -> int:
+        return self.settings.SMTP_PORT
+    
+    @property
+    def telnet_host(self) -> str:
+        return self.settings.TELNET_HOST
+    
+    @property
+    def telnet_port(self) -> int:
+        return self.settings.TELNET_PORT
+    
+    def apply_settings(self, settings: Settings):
+        """
+        Switch to new transport settings without dropping breaker or thread state
+        
+        Each send reads the settings snapshot once, so it uses either the old
+        host and port pair or the new one, never a mix.
+        
+        Args:
+            settings: New settings snapshot
+        """
+        for breaker in self.breakers.values():
+            breaker.failure_threshold = settings.BREAKER_FAILURE_THRESHOLD
+            breaker.reset_timeout = settings.BREAKER_RESET_TIMEOUT
+        self.outbound_threads.max_threads = settings.THREAD_DICT_MAX_THREADS
+        self.inbound_threads.max_threads = settings.THREAD_DICT_MAX_THREADS
+        if any(getattr(settings, name) != getattr(self.settings, name) for name in SMTP_TLS_SETTINGS):
+            self.smtp = SMTPConnector.from_settings(settings)
+        self.settings = settings
+    
     def send_via_telnet(
+        self,
+        recipient: str,
+        tokens: Union[List[str], TokenMessage],
+        sender: str = "ai-messenger@localhost",
+        thread_id: Optional[str] = None
+    ) -> bool:
+        """
+        Send tokenized message via telnet, falling back to SMTP
+        
+        Transports are tried in order of health: open circuits are skipped
+        and, once every remaining path has a recent latency sample, the
+        fastest one goes first.
+        
+        With a thread_id, tokens already sent in the same conversation are
+        replaced by references into a token dictionary shared with the
+        receiver, and only new tokens are sent as literals. The dictionary
+        restarts every THREAD_DICT_RESYNC_INTERVAL messages and after a
+        failed send, so a receiver that fell out of sync recovers.
+        
+        Args:
+            recipient: Email address of recipient
+            tokens: List of message tokens or TokenMessage
+            sender: Email address of sender
+            thread_id: Conversation id for delta encoding
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if isinstance(tokens, TokenMessage):
+            tokens = tokens.to_tokens()
+        
+        if thread_id is None:
+            return self._route(recipient, tokens, sender)
+        
+        settings = self.settings
+        dictionary = self.outbound_threads.get((recipient, thread_id))
+        with dictionary.lock:
+            # Restart at base 0 now and then, so a receiver that lost a
+            # message, restarted or evicted the thread gets back in sync
+            interval = settings.THREAD_DICT_RESYNC_INTERVAL
+            if interval and dictionary.messages >= interval:
+                dictionary.reset()
+            base, encoded, literals = dictionary.encode(tokens)
+            thread = encode_thread_payload(thread_id, base, encoded)
+            sent = self._route(recipient, tokens, sender, thread)
+            # Only grow the dictionary once the receiver has the literals too
+            if sent:
+                dictionary.append(literals)
+                dictionary.messages += 1
+            else:
+                # The receiver may have got the payload before the failure,
+                # so the next message can't assume either dictionary size
+                dictionary.reset()
+        return sent
+    
+    def _route(
         self,
         recipient: str,
         tokens: List[str],
-        sender: str = "ai-messenger@localhost"
+        sender: str,
+        thread: Optional[Dict[str, Any]] = None
     ) -> bool:
         """
-        Send tokenized message via telnet
+        Try each healthy transport in preference order until one succeeds
         
         Args:
             recipient: Email address of recipient
             tokens: List of message tokens
             sender: Email address of sender
+            thread: Delta-encoded payload fields sent instead of the tokens
             
         Returns:
             True if successful, False otherwise
         """
-        try:
-            # Convert tokens to JSON payload
-            payload = json.dumps({
-                'tokens': tokens,
-                'sender': sender,
-                'recipient': recipient
-            })
-            
-            logger.info(f"Sending {len(tokens)} tokens to {recipient} via telnet")
-            
-            # Connect via telnet (simplified implementation)
-            # In real implementation, this would connect to actual telnet server
-            with telnetlib.Telnet(self.telnet_host, self.telnet_port, timeout=10) as tn:
-                # Send HELO command
-                tn.write(b"HELO localhost\r\n")
-                tn.read_until(b"250", timeout=5)
-                
-                # Send MAIL FROM
-                tn.write(f"MAIL FROM:<{sender}>\r\n".encode())
-                tn.read_until(b"250", timeout=5)
-                
-                # Send RCPT TO
-                tn.write(f"RCPT TO:<{recipient}>\r\n".encode())
-                tn.read_until(b"250", timeout=5)
-                
-                # Send DATA
-                tn.write(b"DATA\r\n")
-                tn.read_until(b"354", timeout=5)
-                
-                # Send payload
-                tn.write(payload.encode() + b"\r\n.\r\n")
-                tn.read_until(b"250", timeout=5)
-                
-                # Quit
-                tn.write(b"QUIT\r\n")
-            
-            logger.info(f"Successfully sent tokens to {recipient}")
+        for name in self._transport_order():
+            breaker = self.breakers[name]
+            if not breaker.allow_request():
+                logger.info(f"Skipping {name} transport, probe already in flight")
+                continue
+            
+            start = time.monotonic()
+            try:
+                self._transmitters[name](recipient, tokens, sender, thread)
+            except Exception as e:
+                breaker.record_failure()
+                logger.error(f"Error sending via {name}: {e}")
+                continue
+            
+            breaker.record_success(time.monotonic() - start)
+            logger.info(f"Successfully sent tokens to {recipient} via {name}")
             return True
+        
+        logger.error(f"No transport could deliver tokens to {recipient}")
+        return False
+    
+    def _transport_order(self) -> List[str]:
+        """
+        Order transports by health and recent latency
+        
+        Returns:
+            Names of transports whose circuit is not open, preferred first
+        """
+        available = [
+            name for name in TRANSPORTS
+            if self.breakers[name].state != OPEN
+        ]
+        latencies = {name: self.breakers[name].latency for name in available}
+        
+        # Keep the default order until every candidate has a recent sample
+        if None not in latencies.values():
+            available.sort(key=latencies.get)
+        return available
+    
+    def get_transport_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get circuit breaker state and latency for each transport
+        
+        Returns:
+            Dictionary mapping transport name to its metrics; SMTP also
+            includes TLS handshake statistics
+        """
+        metrics = {name: breaker.metrics() for name, breaker in self.breakers.items()}
+        metrics['smtp']['tls'] = self.smtp.stats()
+        return metrics
+    
+    def _transmit_telnet(
+        self,
+        recipient: str,
+        tokens: List[str],
+        sender: str,
+        thread: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Transmit tokens over telnet, raising on any failure
+        
+        Args:
+            recipient: Email address of recipient
+            tokens: List of message tokens
+            sender: Email address of sender
+            thread: Delta-encoded payload fields sent instead of the tokens
+        """
+        # Convert tokens to JSON payload
+        payload = json.dumps({
+            **(thread or {'tokens': tokens}),
+            'sender': sender,
+            'recipient': recipient
+        })
+        
+        logger.info(f"Sending {len(tokens)} tokens to {recipient} via telnet")
+        
+        # Connect via telnet (simplified implementation)
+        # In real implementation, this would connect to actual telnet server
+        settings = self.settings
+        reply_timeout = settings.TELNET_REPLY_TIMEOUT
+        with telnetlib.Telnet(
+            settings.TELNET_HOST, settings.TELNET_PORT, timeout=settings.TELNET_CONNECT_TIMEOUT
+        ) as tn:
+            # Send HELO command
+            tn.write(b"HELO localhost\r\n")
+            tn.read_until(b"250", timeout=reply_timeout)
             
-        except Exception as e:
-            logger.error(f"Error sending via telnet: {e}")
-            logger.info("Telnet connection failed - using fallback SMTP")
-            return self._send_via_smtp(recipient, tokens, sender)
+            # Send MAIL FROM
+            tn.write(f"MAIL FROM:<{sender}>\r\n".encode())
+            tn.read_until(b"250", timeout=reply_timeout)
+            
+            # Send RCPT TO
+            tn.write(f"RCPT TO:<{recipient}>\r\n".encode())
+            tn.read_until(b"250", timeout=reply_timeout)
+            
+            # Send DATA
+            tn.write(b"DATA\r\n")
+            tn.read_until(b"354", timeout=reply_timeout)
+            
+            # Send payload
+            tn.write(payload.encode() + b"\r\n.\r\n")
+            tn.read_until(b"250", timeout=reply_timeout)
+            
+            # Quit
+            tn.write(b"QUIT\r\n")
+    
+    def _transmit_smtp(
+        self,
+        recipient: str,
+        tokens: List[str],
+        sender: str,
+        thread: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Transmit tokens over SMTP, raising on any failure
+        
+        Args:
+            recipient: Email address of recipient
+            tokens: List of message tokens
+            sender: Email address of sender
+            thread: Delta-encoded payload fields sent instead of the tokens
+        """
+        # Create message
+        msg = MIMEMultipart()
+        msg['From'] = sender
+        msg['To'] = recipient
+        msg['Subject'] = 'AI Messenger - Tokenized Message'
+        
+        # Convert tokens to payload
+        payload = json.dumps({
+            **(thread or {'tokens': tokens}),
+            'sender': sender,
+            'type': 'ai-messenger-tokens'
+        })
+        
+        msg.attach(MIMEText(payload, 'plain'))
+        
+        # Send via SMTP
+        settings = self.settings
+        with self.smtp.connect(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
+            server.send_message(msg)
     
     def _send_via_smtp(
         self,
@@ -105,32 +329,17 @@ class EmailHandler:
         Returns:
             True if successful, False otherwise
         """
+        start = time.monotonic()
         try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = sender
-            msg['To'] = recipient
-            msg['Subject'] = 'AI Messenger - Tokenized Message'
-            
-            # Convert tokens to payload
-            payload = json.dumps({
-                'tokens': tokens,
-                'sender': sender,
-                'type': 'ai-messenger-tokens'
-            })
-            
-            msg.attach(MIMEText(payload, 'plain'))
-            
-            # Send via SMTP
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.send_message(msg)
-            
-            logger.info(f"Successfully sent tokens to {recipient} via SMTP")
-            return True
-            
+            self._transmit_smtp(recipient, tokens, sender)
         except Exception as e:
+            self.breakers['smtp'].record_failure()
             logger.error(f"Error sending via SMTP: {e}")
             return False
+        
+        self.breakers['smtp'].record_success(time.monotonic() - start)
+        logger.info(f"Successfully sent tokens to {recipient} via SMTP")
+        return True
     
     def send_reconstructed_email(
         self,
@@ -159,7 +368,8 @@ class EmailHandler:
             
             msg.attach(MIMEText(content, 'plain'))
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+            settings = self.settings
+            with self.smtp.connect(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
                 server.send_message(msg)
             
             logger.info(f"Successfully sent reconstructed email to {recipient}")
@@ -179,13 +389,38 @@ class EmailHandler:
         Returns:
             List of tokens if valid, None otherwise
         """
+        return self.decode_message(raw_message)[0]
+    
+    def decode_message(self, raw_message: str) -> Tuple[Optional[List[str]], bool]:
+        """
+        Extract tokens from received message, noting whether decoding changed state
+        
+        Args:
+            raw_message: Raw message content
+            
+        Returns:
+            Tuple of (list of tokens if valid, otherwise None; True if the
+            payload was delta-encoded and updated a thread dictionary, so
+            the same text may decode differently next time)
+        """
         try:
             data = json.loads(raw_message)
+            if 'thread' in data:
+                tokens = decode_thread_payload(
+                    self.inbound_threads,
+                    data.get('sender', ''),
+                    data['thread']
+                )
+                if tokens is not None:
+                    logger.info(
+                        f"Received {len(tokens)} tokens in thread {data['thread']['id']}"
+                    )
+                return tokens, True
             if 'tokens' in data:
                 tokens = data['tokens']
                 logger.info(f"Received {len(tokens)} tokens")
-                return tokens
-            return None
+                return tokens, False
+            return None, False
         except Exception as e:
             logger.error(f"Error receiving tokens: {e}")
-            return None
+            return None, False
@@ -8,6 +8,7 @@ import logging
 from typing import Optional
 
 from config import WINDOW_WIDTH, WINDOW_HEIGHT
+from outbox import OutboxPanel
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,14 +17,18 @@ logger = logging.getLogger(__name__)
 class MessengerGUI:
     """GUI interface for AI Email Messenger"""
     
-    def __init__(self, messenger_callback=None):
+    def __init__(self, messenger_callback=None, bulk_callback=None):
         """
         Initialize GUI
         
         Args:
             messenger_callback: Callback function to handle message sending
+            bulk_callback: Callback sending outbox messages at bulk priority
+                (defaults to messenger_callback)
         """
         self.messenger_callback = messenger_callback
+        self.bulk_callback = bulk_callback or messenger_callback
+        self.outbox_window: Optional[tk.Toplevel] = None
         self.root = tk.Tk()
         self.root.title("AI Email Messenger")
         self.root.geometry(f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}")
@@ -122,6 +127,13 @@ class MessengerGUI:
         )
         self.clear_button.pack(side=tk.LEFT, padx=5)
         
+        self.outbox_button = ttk.Button(
+            button_frame,
+            text="Outbox...",
+            command=self._on_outbox
+        )
+        self.outbox_button.pack(side=tk.LEFT, padx=5)
+        
         self.quit_button = ttk.Button(
             button_frame,
             text="Quit",
@@ -188,6 +200,30 @@ class MessengerGUI:
         self.message_text.delete("1.0", tk.END)
         self.status_var.set("Cleared")
     
+    def _on_outbox(self):
+        """Open the batch composer and outbox, or raise it if already open"""
+        if self.outbox_window is not None and self.outbox_window.winfo_exists():
+            self.outbox_window.lift()
+            return
+        
+        if not self.messenger_callback:
+            logger.warning("No messenger callback configured")
+            messagebox.showinfo("Info", "Batch sending needs a messenger")
+            return
+        
+        self.outbox_window = tk.Toplevel(self.root)
+        self.outbox_window.title("Outbox")
+        self.outbox_window.geometry(f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}")
+        self.outbox_window.columnconfigure(0, weight=1)
+        self.outbox_window.rowconfigure(0, weight=1)
+        
+        panel = OutboxPanel(
+            self.outbox_window,
+            self.bulk_callback,
+            get_preferences=lambda: {'tone': self.tone_var.get(), 'length': self.length_var.get()}
+        )
+        panel.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+    
     def _on_quit(self):
         """Handle quit button click"""
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
@@ -1,15 +1,18 @@
 """
 Main Entry Point for AI Email Messenger
-Supports both GUI and STT modes
+Supports GUI, STT and headless daemon modes, and tuning settings for this host
 """
 import argparse
 import logging
+import signal
 import sys
+import threading
 
 from messenger import Messenger
-from gui import MessengerGUI
-from stt_input import STTInput
-from config import LOG_LEVEL, LOG_FILE
+from scheduler import BULK
+from config import (
+    LOG_LEVEL, LOG_FILE, DAEMON_HOST, DAEMON_PORT, CLUSTER_COORDINATOR, CLUSTER_ADVERTISE
+)
 
 # Configure logging
 logging.basicConfig(
@@ -23,20 +26,51 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def install_signal_handlers(messenger: Messenger):
+    """
+    Reload settings from .env on SIGHUP and toggle profiling on SIGUSR1,
+    where the platform has those signals
+    """
+    if not hasattr(signal, 'SIGHUP'):
+        return
+    
+    # Rebuilding a component or writing profiles can take a while; keep the handlers short
+    def reload_config():
+        try:
+            messenger.reload_config()
+        except Exception as e:
+            logger.error(f"Failed to reload settings, keeping the current ones: {e}")
+    
+    def reload(signum, frame):
+        threading.Thread(target=reload_config, name='config-reload', daemon=True).start()
+    
+    def toggle_profiling(signum, frame):
+        threading.Thread(target=messenger.profiler.toggle, name='profile-toggle', daemon=True).start()
+    
+    signal.signal(signal.SIGHUP, reload)
+    signal.signal(signal.SIGUSR1, toggle_profiling)
+
+
 def run_gui_mode():
     """Run messenger in GUI mode"""
     logger.info("Starting in GUI mode")
     
     try:
+        from gui import MessengerGUI
+        
         # Initialize messenger
         messenger = Messenger()
+        install_signal_handlers(messenger)
         
-        # Create callback for GUI
+        # Create callbacks for GUI; outbox batches go behind single messages
         def send_callback(recipient, subject, message, preferences):
             return messenger.send_message(recipient, subject, message, preferences)
         
+        def bulk_send_callback(recipient, subject, message, preferences):
+            return messenger.send_message(recipient, subject, message, preferences, priority=BULK)
+        
         # Initialize and run GUI
-        gui = MessengerGUI(messenger_callback=send_callback)
+        gui = MessengerGUI(messenger_callback=send_callback, bulk_callback=bulk_send_callback)
         gui.run()
         
     except Exception as e:
@@ -50,8 +84,11 @@ def run_stt_mode():
     logger.info("Starting in STT mode")
     
     try:
+        from stt_input import STTInput
+        
         # Initialize components
         messenger = Messenger()
+        install_signal_handlers(messenger)
         stt = STTInput()
         
         print("\n" + "="*50)
@@ -131,6 +168,90 @@ def run_stt_mode():
         sys.exit(1)
 
 
+def run_daemon_mode():
+    """Run messenger as a headless service processing queued send jobs"""
+    logger.info("Starting in daemon mode")
+    
+    try:
+        from daemon import MessengerDaemon
+        
+        messenger = Messenger()
+        daemon = MessengerDaemon(messenger)
+        install_signal_handlers(messenger)
+        
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.request_stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: daemon.request_stop())
+        
+        daemon.start()
+        
+        # As a cluster worker, take jobs routed by the coordinator
+        member = None
+        if CLUSTER_COORDINATOR:
+            from cluster import ClusterMember
+            
+            address = CLUSTER_ADVERTISE or f"{DAEMON_HOST}:{DAEMON_PORT}"
+            member = ClusterMember(CLUSTER_COORDINATOR, address).start()
+        
+        daemon.wait()
+        if member is not None:
+            member.leave()
+        daemon.stop()
+        
+    except Exception as e:
+        logger.error(f"Error in daemon mode: {e}")
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+def run_coordinator_mode():
+    """Run a coordinator that shards send jobs across daemon-mode workers"""
+    logger.info("Starting in coordinator mode")
+    
+    try:
+        from cluster import ClusterCoordinator
+        
+        coordinator = ClusterCoordinator()
+        
+        signal.signal(signal.SIGTERM, lambda signum, frame: coordinator.request_stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: coordinator.request_stop())
+        
+        coordinator.start()
+        coordinator.wait()
+        coordinator.stop()
+        
+    except Exception as e:
+        logger.error(f"Error in coordinator mode: {e}")
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+def run_tune_mode(args):
+    """Calibrate inference and transport settings and write a tuning profile"""
+    logger.info("Starting in tune mode")
+    
+    try:
+        from tuner import AutoTuner
+        
+        tuner = AutoTuner(
+            latency_target_ms=args.latency_target,
+            messages=args.messages,
+            relay_latency_ms=args.relay_latency,
+            on_trial=lambda stage, trial: print(f"  {stage}: {trial.describe()}")
+        )
+        values = tuner.run()
+        tuner.write_profile(args.profile, values)
+        
+        print("\nChosen settings:")
+        for name, value in values.items():
+            print(f"  {name}={value}")
+        print(f"\nWritten to {args.profile}; set TUNING_PROFILE={args.profile} in .env to use them")
+        
+    except Exception as e:
+        logger.error(f"Error in tune mode: {e}")
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(
@@ -138,10 +259,34 @@ def main():
     )
     parser.add_argument(
         '--mode',
-        choices=['gui', 'stt'],
+        choices=['gui', 'stt', 'daemon', 'coordinator', 'tune'],
         default='gui',
         help='Mode to run the messenger (default: gui)'
     )
+    parser.add_argument(
+        '--profile',
+        default='.env.tuned',
+        help='Tune mode: file the tuned settings are written to (default: .env.tuned)'
+    )
+    parser.add_argument(
+        '--latency-target',
+        type=float,
+        default=1000.0,
+        help='Tune mode: highest acceptable p95 latency per message in ms (default: 1000)'
+    )
+    parser.add_argument(
+        '--messages',
+        type=int,
+        default=200,
+        help='Tune mode: messages per calibration trial (default: 200)'
+    )
+    parser.add_argument(
+        '--relay-latency',
+        type=float,
+        default=None,
+        help='Tune mode: measured round trip to the relay in ms, simulated per SMTP reply; '
+             'telnet timeouts are only raised when it is given (default: 2 ms, timeouts kept)'
+    )
     
     args = parser.parse_args()
     
@@ -150,8 +295,14 @@ def main():
     
     if args.mode == 'gui':
         run_gui_mode()
-    else:  # args.mode == 'stt'
+    elif args.mode == 'stt':
         run_stt_mode()
+    elif args.mode == 'daemon':
+        run_daemon_mode()
+    elif args.mode == 'coordinator':
+        run_coordinator_mode()
+    else:  # args.mode == 'tune'
+        run_tune_mode(args)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,396 @@
+"""
+Outbox Module
+Batch composer and outbox for sending many messages from the GUI
+"""
+import csv
+import logging
+import queue
+import time
+import tkinter as tk
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk, scrolledtext, filedialog, messagebox
+from typing import Any, Callable, Dict, List, Optional
+
+from config import OUTBOX_WORKERS, OUTBOX_CHUNK_ROWS, OUTBOX_POLL_MS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+# Results applied to the Treeview per poll, so a burst can't stall a frame
+MAX_UPDATES_PER_POLL = 500
+
+
+class _Fields(dict):
+    """Leaves placeholders without a matching CSV column as they are"""
+    
+    def __missing__(self, key: str) -> str:
+        return '{' + key + '}'
+
+
+def load_batch(path: str) -> List[Dict[str, str]]:
+    """
+    Read a mail-merge CSV
+    
+    Args:
+        path: CSV file with a header row and a 'recipient' column; other
+            columns can be used as {placeholders} in the templates
+    
+    Returns:
+        One dictionary of fields per row
+    
+    Raises:
+        ValueError: If there is no recipient column
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        if 'recipient' not in (reader.fieldnames or []):
+            raise ValueError("CSV needs a 'recipient' column")
+        return [row for row in reader if (row.get('recipient') or '').strip()]
+
+
+def render(template: str, fields: Dict[str, str]) -> str:
+    """Fill {placeholders} in a template from a row's fields"""
+    return template.format_map(_Fields(fields))
+
+
+class FrameMonitor:
+    """
+    Measures event loop latency as a proxy for UI frame latency
+    
+    A timer is scheduled every interval; how late it runs is how long
+    the event loop was busy and the UI couldn't repaint or react.
+    """
+    
+    def __init__(self, root: tk.Misc, interval_ms: int = 16, window: int = 2000):
+        """
+        Initialize monitor
+        
+        Args:
+            root: Widget whose event loop is measured
+            interval_ms: Timer interval, about one frame
+            window: Recent samples kept for the statistics
+        """
+        self.root = root
+        self.interval_ms = interval_ms
+        self.samples: deque = deque(maxlen=window)
+        self._expected = 0.0
+        self._job = None
+    
+    def start(self):
+        """Start sampling"""
+        if self._job is None:
+            self._expected = time.perf_counter() + self.interval_ms / 1000
+            self._job = self.root.after(self.interval_ms, self._tick)
+    
+    def _tick(self):
+        now = time.perf_counter()
+        self.samples.append(max(now - self._expected, 0.0))
+        self._expected = now + self.interval_ms / 1000
+        self._job = self.root.after(self.interval_ms, self._tick)
+    
+    def stop(self):
+        """Stop sampling"""
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Get latency statistics over the recent window
+        
+        Returns:
+            Dictionary with p50, p95 and max lateness in milliseconds
+        """
+        samples = sorted(self.samples)
+        if not samples:
+            return {'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'p50_ms': samples[len(samples) // 2] * 1000,
+            'p95_ms': samples[int(len(samples) * 0.95)] * 1000,
+            'max_ms': samples[-1] * 1000
+        }
+
+
+class OutboxPanel(ttk.Frame):
+    """
+    Batch composer and outbox
+    
+    A CSV of recipients and fields is merged into subject and body
+    templates and sent on a worker pool. The Treeview is filled a chunk
+    of rows per event loop turn, and workers never touch widgets: they
+    post status changes to a queue that the UI thread drains on a timer,
+    a bounded number per turn, so the window stays responsive with tens
+    of thousands of rows.
+    """
+    
+    COLUMNS = ('recipient', 'subject', 'status', 'detail')
+    
+    def __init__(
+        self,
+        parent: tk.Misc,
+        send_callback: Callable[[str, str, str, Dict[str, str]], bool],
+        get_preferences: Optional[Callable[[], Dict[str, str]]] = None,
+        workers: int = OUTBOX_WORKERS,
+        chunk_rows: int = OUTBOX_CHUNK_ROWS,
+        poll_ms: int = OUTBOX_POLL_MS
+    ):
+        """
+        Initialize outbox
+        
+        Args:
+            parent: Parent widget
+            send_callback: Called as (recipient, subject, message, preferences)
+                on a worker thread; returns True if the message was sent
+            get_preferences: Returns the AI preferences for the batch
+            workers: Messages sent concurrently
+            chunk_rows: Treeview rows inserted per event loop turn
+            poll_ms: Milliseconds between drains of the results queue
+        """
+        super().__init__(parent, padding="10")
+        self.send_callback = send_callback
+        self.get_preferences = get_preferences or (lambda: {})
+        self.chunk_rows = chunk_rows
+        self.poll_ms = poll_ms
+        
+        self.rows: List[Dict[str, Any]] = []
+        self.counts: Counter = Counter()
+        self._results: queue.Queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='outbox')
+        # Each submit is a numbered batch; Cancel skips every batch submitted so far
+        self._batch = 0
+        self._cancelled_batch = 0
+        self._generation = 0
+        self._populated = 0
+        self._populate_job = None
+        self._poll_job = None
+        
+        self.frame_monitor = FrameMonitor(self)
+        self._create_widgets()
+        self.frame_monitor.start()
+        self._poll_job = self.after(self.poll_ms, self._poll)
+    
+    def _create_widgets(self):
+        """Create and layout outbox widgets"""
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+        
+        # Composer
+        composer = ttk.LabelFrame(self, text="Batch Composer", padding="5")
+        composer.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=5)
+        composer.columnconfigure(1, weight=1)
+        
+        ttk.Button(composer, text="Import CSV...", command=self._on_import).grid(
+            row=0, column=0, sticky=tk.W, padx=5
+        )
+        self.source_var = tk.StringVar(value="No recipients loaded")
+        ttk.Label(composer, textvariable=self.source_var).grid(row=0, column=1, sticky=tk.W, padx=5)
+        
+        ttk.Label(composer, text="Subject:").grid(row=1, column=0, sticky=tk.W, padx=5)
+        self.subject_entry = ttk.Entry(composer, width=50)
+        self.subject_entry.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=5)
+        
+        ttk.Label(composer, text="Message:").grid(row=2, column=0, sticky=(tk.W, tk.N), padx=5)
+        self.body_text = scrolledtext.ScrolledText(composer, wrap=tk.WORD, width=60, height=6)
+        self.body_text.grid(row=2, column=1, sticky=(tk.W, tk.E), padx=5, pady=5)
+        ttk.Label(
+            composer,
+            text="Use {column} to insert a CSV field, e.g. Hi {name}"
+        ).grid(row=3, column=1, sticky=tk.W, padx=5)
+        
+        # Outbox
+        outbox = ttk.LabelFrame(self, text="Outbox", padding="5")
+        outbox.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        outbox.columnconfigure(0, weight=1)
+        outbox.rowconfigure(0, weight=1)
+        
+        self.tree = ttk.Treeview(outbox, columns=self.COLUMNS, show='headings', selectmode='extended')
+        for column, width in zip(self.COLUMNS, (220, 200, 80, 200)):
+            self.tree.heading(column, text=column.capitalize())
+            self.tree.column(column, width=width, stretch=column != 'status')
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar = ttk.Scrollbar(outbox, orient=tk.VERTICAL, command=self.tree.yview)
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        
+        # Buttons
+        button_frame = ttk.Frame(self, padding="5")
+        button_frame.grid(row=2, column=0, sticky=(tk.W, tk.E))
+        ttk.Button(button_frame, text="Send All", command=self.send_all).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Retry Failed", command=self.retry_failed).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Retry Selected", command=self.retry_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Cancel", command=self.cancel).pack(side=tk.LEFT, padx=5)
+        
+        # Status bar
+        self.status_var = tk.StringVar(value="Ready")
+        ttk.Label(self, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W).grid(
+            row=3, column=0, sticky=(tk.W, tk.E)
+        )
+    
+    def _on_import(self):
+        """Handle Import CSV button click"""
+        path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv"), ("All files", "*")])
+        if not path:
+            return
+        try:
+            rows = load_batch(path)
+        except (OSError, ValueError, csv.Error) as e:
+            messagebox.showerror("Error", f"Could not import {path}: {e}")
+            return
+        self.load_rows(rows)
+        self.source_var.set(f"{len(rows)} recipients from {path}")
+    
+    def load_rows(self, rows: List[Dict[str, str]]):
+        """
+        Replace the outbox with new rows
+        
+        Args:
+            rows: Field dictionaries, each with a 'recipient'
+        """
+        self.cancel()
+        if self._populate_job is not None:
+            self.after_cancel(self._populate_job)
+        self.tree.delete(*self.tree.get_children())
+        
+        # Results still coming from the previous batch are dropped
+        self._generation += 1
+        self.rows = [
+            {'fields': fields, 'subject': '', 'status': QUEUED, 'detail': '', 'in_flight': False}
+            for fields in rows
+        ]
+        self.counts = Counter({QUEUED: len(self.rows)})
+        self._populated = 0
+        self._populate_job = self.after_idle(self._populate)
+        self._update_status()
+    
+    def _populate(self):
+        """Insert the next chunk of rows into the Treeview"""
+        end = min(self._populated + self.chunk_rows, len(self.rows))
+        for index in range(self._populated, end):
+            row = self.rows[index]
+            self.tree.insert('', tk.END, iid=str(index), values=(
+                row['fields']['recipient'], row['subject'], row['status'], row['detail']
+            ))
+        self._populated = end
+        self._populate_job = self.after(1, self._populate) if end < len(self.rows) else None
+    
+    def _submit(self, indexes: List[int]):
+        """Render and queue rows for sending"""
+        subject_template = self.subject_entry.get().strip()
+        body_template = self.body_text.get("1.0", tk.END).strip()
+        if not body_template:
+            messagebox.showerror("Error", "Please enter a message")
+            return
+        
+        self._batch += 1
+        preferences = self.get_preferences()
+        for index in indexes:
+            row = self.rows[index]
+            if row['in_flight']:
+                continue
+            try:
+                subject = render(subject_template, row['fields'])
+                body = render(body_template, row['fields'])
+            except (ValueError, LookupError, AttributeError, TypeError) as e:
+                self._results.put((self._generation, index, FAILED, f"Template error: {e}"))
+                continue
+            row['subject'] = subject
+            row['in_flight'] = True
+            self._set_row(index, QUEUED, '')
+            self._executor.submit(
+                self._send_row, self._generation, self._batch, index,
+                row['fields']['recipient'].strip(), subject, body, preferences
+            )
+        self._update_status()
+    
+    def _send_row(
+        self,
+        generation: int,
+        batch: int,
+        index: int,
+        recipient: str,
+        subject: str,
+        body: str,
+        preferences: Dict[str, str]
+    ):
+        """Send one row on a worker thread, reporting through the results queue"""
+        if generation != self._generation:
+            return
+        if batch <= self._cancelled_batch:
+            self._results.put((generation, index, QUEUED, "Cancelled"))
+            return
+        self._results.put((generation, index, SENDING, ''))
+        try:
+            sent = self.send_callback(recipient, subject, body, preferences)
+            self._results.put((generation, index, SENT if sent else FAILED, '' if sent else "Send failed"))
+        except Exception as e:
+            logger.error(f"Error sending to {recipient}: {e}")
+            self._results.put((generation, index, FAILED, str(e)))
+    
+    def _set_row(self, index: int, status: str, detail: str):
+        """Record a row's status and show it if the row is in the Treeview yet"""
+        row = self.rows[index]
+        self.counts[row['status']] -= 1
+        self.counts[status] += 1
+        row['status'] = status
+        row['detail'] = detail
+        if index < self._populated:
+            self.tree.item(str(index), values=(
+                row['fields']['recipient'], row['subject'], status, detail
+            ))
+    
+    def _poll(self):
+        """Apply queued results from the workers"""
+        for _ in range(MAX_UPDATES_PER_POLL):
+            try:
+                generation, index, status, detail = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self._generation:
+                self.rows[index]['in_flight'] = status == SENDING
+                self._set_row(index, status, detail)
+        self._update_status()
+        self._poll_job = self.after(self.poll_ms, self._poll)
+    
+    def _update_status(self):
+        latency = self.frame_monitor.stats()
+        counts = ", ".join(
+            f"{self.counts[status]} {status}" for status in (QUEUED, SENDING, SENT, FAILED)
+        )
+        self.status_var.set(
+            f"{len(self.rows)} rows: {counts} | UI latency p95 {latency['p95_ms']:.0f} ms"
+        )
+    
+    def send_all(self):
+        """Send every row that hasn't been sent or isn't already in progress"""
+        self._submit([i for i, row in enumerate(self.rows) if row['status'] in (QUEUED, FAILED)])
+    
+    def retry_failed(self):
+        """Send failed rows again"""
+        self._submit([i for i, row in enumerate(self.rows) if row['status'] == FAILED])
+    
+    def retry_selected(self):
+        """Send the selected rows that failed again"""
+        self._submit([
+            int(iid) for iid in self.tree.selection()
+            if self.rows[int(iid)]['status'] == FAILED
+        ])
+    
+    def cancel(self):
+        """Skip rows that haven't started sending yet; Send All picks them up again"""
+        self._cancelled_batch = self._batch
+    
+    def destroy(self):
+        """Stop timers and workers along with the widget"""
+        self.cancel()
+        self.frame_monitor.stop()
+        for job in (self._populate_job, self._poll_job):
+            if job is not None:
+                self.after_cancel(job)
+        self._executor.shutdown(wait=False)
+        super().destroy()
@@ -0,0 +1,291 @@
+"""
+Pipeline Module
+Overlaps the AI stage and the transport stage of sending with bounded queues
+"""
+import functools
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from scheduler import BULK
+from token_message import TokenMessage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Queue sentinel telling a worker to exit, sorted after every message
+_STOP = object()
+_STOP_PRIORITY = float('inf')
+
+# How long a transport worker waits before retrying a send the scheduler had no room for
+SCHEDULER_RETRY_DELAY = 0.05
+
+
+class StageStats:
+    """Busy time and item counts for one pipeline stage"""
+    
+    def __init__(self, workers: int):
+        """
+        Initialize stage statistics
+        
+        Args:
+            workers: Number of workers serving the stage
+        """
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+    
+    def record(self, elapsed: float, ok: bool):
+        """Record one processed item"""
+        with self._lock:
+            self.busy += elapsed
+            if ok:
+                self.processed += 1
+            else:
+                self.failed += 1
+    
+    def snapshot(self, wall: float) -> Dict[str, Any]:
+        """
+        Get stage statistics
+        
+        Args:
+            wall: Seconds the pipeline has been running
+        
+        Returns:
+            Dictionary with counts, busy time and utilization
+        """
+        with self._lock:
+            items = self.processed + self.failed
+            return {
+                'workers': self.workers,
+                'processed': self.processed,
+                'failed': self.failed,
+                'busy_seconds': self.busy,
+                'avg_latency': self.busy / items if items else 0.0,
+                'utilization': self.busy / (wall * self.workers) if wall else 0.0
+            }
+
+
+class SendPipeline:
+    """
+    Producer/consumer send pipeline
+    
+    AI workers run Messenger.prepare_message and put token payloads on a
+    bounded queue that transport workers drain with Messenger.submit_delivery,
+    so inference for one message overlaps transmission of earlier ones.
+    
+    Both queues hand out interactive messages before bulk ones, first in
+    first out within a priority. Transport workers don't wait for scheduled
+    sends: the send scheduler holds them and their futures finish them, so
+    a slow domain can't tie up the workers. At most queue_size sends are
+    handed over at once; past that the transport workers block, the
+    outbound queue fills and the AI workers are held back in turn.
+    """
+    
+    def __init__(
+        self,
+        messenger,
+        ai_workers: int = 4,
+        transport_workers: int = 4,
+        queue_size: int = 100,
+        prepare: Optional[Callable] = None
+    ):
+        """
+        Initialize pipeline
+        
+        Args:
+            messenger: Messenger providing prepare_message and submit_delivery,
+                whose futures report the transmission time as send_seconds
+            ai_workers: Threads running context extraction and token generation
+            transport_workers: Threads transmitting tokens
+            queue_size: Capacity of each queue, and most sends handed to
+                the transport at once
+            prepare: Used instead of messenger.prepare_message, e.g. to run
+                the AI stage in worker processes
+        """
+        self.messenger = messenger
+        self.prepare = prepare or messenger.prepare_message
+        self.inbound: queue.PriorityQueue = queue.PriorityQueue(maxsize=queue_size)
+        self.outbound: queue.PriorityQueue = queue.PriorityQueue(maxsize=queue_size)
+        self.ai_stats = StageStats(ai_workers)
+        self.transport_stats = StageStats(transport_workers)
+        
+        # Tie-breaker keeping equal priorities in submission order
+        self._sequence = itertools.count()
+        
+        # Sends handed to the scheduler that haven't finished yet
+        self._in_flight = 0
+        self._in_flight_cond = threading.Condition()
+        self._in_flight_slots = threading.Semaphore(queue_size)
+        
+        self._ai_threads = [
+            threading.Thread(target=self._ai_worker, name=f'ai-{i}', daemon=True)
+            for i in range(ai_workers)
+        ]
+        self._transport_threads = [
+            threading.Thread(target=self._transport_worker, name=f'transport-{i}', daemon=True)
+            for i in range(transport_workers)
+        ]
+        self._started_at = 0.0
+        self._stopped_at = 0.0
+    
+    def start(self) -> 'SendPipeline':
+        """Start all workers"""
+        self._started_at = time.monotonic()
+        for thread in self._ai_threads + self._transport_threads:
+            thread.start()
+        return self
+    
+    def submit(
+        self,
+        recipient: str,
+        content: str,
+        subject: str = "",
+        sender: str = "ai-messenger@localhost",
+        timeout: Optional[float] = None,
+        priority: int = BULK,
+        thread_id: Optional[str] = None
+    ) -> Future:
+        """
+        Queue a message for sending
+        
+        Args:
+            recipient: Email address of recipient
+            content: Message content
+            subject: Email subject
+            sender: Email address of sender
+            timeout: Seconds to wait for room in the queue (None waits forever)
+            priority: Scheduler priority class used for transmission
+            thread_id: Conversation id for delta-encoded payloads
+        
+        Returns:
+            Future resolving to True if the message was sent
+        
+        Raises:
+            queue.Full: If the queue stayed full for the whole timeout
+        """
+        future: Future = Future()
+        self.inbound.put(
+            (priority, next(self._sequence),
+             (recipient, content, subject, sender, priority, thread_id, future)),
+            timeout=timeout
+        )
+        return future
+    
+    def _ai_worker(self):
+        """Extract context and generate tokens for queued messages"""
+        while True:
+            _, _, item = self.inbound.get()
+            if item is _STOP:
+                break
+            recipient, content, subject, sender, priority, thread_id, future = item
+            
+            start = time.monotonic()
+            try:
+                prepared = self.prepare(content)
+            except Exception as e:
+                logger.error(f"Error preparing message for {recipient}: {e}")
+                prepared = None
+            self.ai_stats.record(time.monotonic() - start, prepared is not None)
+            
+            if prepared is None:
+                future.set_result(False)
+                continue
+            
+            tokens, context = prepared
+            self.outbound.put((priority, next(self._sequence), (
+                recipient, TokenMessage.from_tokens(tokens), context, subject, sender,
+                priority, thread_id, future
+            )))
+    
+    def _transport_worker(self):
+        """Hand prepared token messages to the transport"""
+        while True:
+            _, _, item = self.outbound.get()
+            if item is _STOP:
+                break
+            recipient, tokens, context, subject, sender, priority, thread_id, future = item
+            
+            self._in_flight_slots.acquire()
+            try:
+                delivery = self._hand_off(
+                    recipient, tokens, context, subject, sender, priority, thread_id
+                )
+            except Exception as e:
+                logger.error(f"Error delivering message to {recipient}: {e}")
+                self._in_flight_slots.release()
+                self.transport_stats.record(0.0, False)
+                future.set_result(False)
+                continue
+            
+            with self._in_flight_cond:
+                self._in_flight += 1
+            delivery.add_done_callback(functools.partial(self._finish, future))
+    
+    def _hand_off(self, recipient, tokens, context, subject, sender, priority, thread_id):
+        """Submit a send, waiting for room while the scheduler is full"""
+        while True:
+            try:
+                return self.messenger.submit_delivery(
+                    recipient, tokens, context, subject, sender,
+                    thread_id=thread_id, priority=priority
+                )
+            except queue.Full:
+                time.sleep(SCHEDULER_RETRY_DELAY)
+    
+    def _finish(self, future: Future, delivery: Future):
+        """Record a finished send and resolve the caller's future"""
+        sent = delivery.result()
+        self.transport_stats.record(delivery.send_seconds, sent)
+        future.set_result(sent)
+        self._in_flight_slots.release()
+        with self._in_flight_cond:
+            self._in_flight -= 1
+            self._in_flight_cond.notify_all()
+    
+    def close(self):
+        """Wait for every queued message to finish, then stop the workers"""
+        for _ in self._ai_threads:
+            self.inbound.put((_STOP_PRIORITY, next(self._sequence), _STOP))
+        for thread in self._ai_threads:
+            thread.join()
+        for _ in self._transport_threads:
+            self.outbound.put((_STOP_PRIORITY, next(self._sequence), _STOP))
+        for thread in self._transport_threads:
+            thread.join()
+        with self._in_flight_cond:
+            while self._in_flight:
+                self._in_flight_cond.wait()
+        self._stopped_at = time.monotonic()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get per-stage utilization, queue depths and throughput
+        
+        Transport busy time is the time sends took to transmit. With the
+        send scheduler on they run on its threads rather than the transport
+        workers, so transport utilization can exceed 100%.
+        
+        Returns:
+            Dictionary of pipeline statistics
+        """
+        if not self._started_at:
+            wall = 0.0
+        else:
+            wall = (self._stopped_at or time.monotonic()) - self._started_at
+        transport = self.transport_stats.snapshot(wall)
+        return {
+            'ai': self.ai_stats.snapshot(wall),
+            'transport': transport,
+            'inbound_queue': self.inbound.qsize(),
+            'outbound_queue': self.outbound.qsize(),
+            'in_flight': self._in_flight,
+            'elapsed': wall,
+            'messages_per_sec': transport['processed'] / wall if wall else 0.0
+        }
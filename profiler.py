@@ -0,0 +1,274 @@
+"""
+Profiler Module
+Sampled stack and allocation profiling of Messenger operations
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _collapse(frame) -> str:
+    """Render a frame's stack root first, in collapsed-stack format"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class _OperationStats:
+    """Call counts, latencies and collected profiles for one operation"""
+    
+    def __init__(self):
+        self.calls = 0
+        self.sampled = 0
+        self.time = 0.0
+        self.sampled_time = 0.0
+        self.stacks: Counter = Counter()
+        self.allocation_size: Counter = Counter()
+        self.allocation_count: Counter = Counter()
+
+
+class CallProfiler:
+    """
+    Profiles a random sample of calls to named operations
+    
+    A sampled call has its thread's stack captured every interval by a
+    sampler thread, giving collapsed stacks for flamegraph tools, and, with
+    allocation tracing on, the allocation sites still holding memory when
+    the call returns. At most one call is sampled at a time, so overhead is
+    bounded by the sampling rate. Calls that aren't sampled only have their
+    latency recorded, which is what stats() compares sampled calls against.
+    
+    Allocation tracing is process-wide: while a call is sampled, memory
+    allocated by other threads is traced too, slows those threads down and
+    is charged to the sampled operation. In multi-threaded modes read the
+    allocation sites as the whole process's, not the one call's.
+    """
+    
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        output_dir: str = 'profiles',
+        interval: float = 0.005,
+        trace_allocations: bool = True,
+        top_allocations: int = 25,
+        toggle_rate: float = 0.01
+    ):
+        """
+        Initialize profiler
+        
+        Args:
+            sample_rate: Fraction of calls to profile (0 disables)
+            output_dir: Directory dump() writes profiles to
+            interval: Seconds between stack samples
+            trace_allocations: Record allocation sites with tracemalloc
+            top_allocations: Allocation sites written per operation
+            toggle_rate: Fraction toggle() turns on when no sample rate is set
+        """
+        self.sample_rate = sample_rate
+        self.toggle_rate = toggle_rate
+        self.output_dir = output_dir
+        self.interval = interval
+        self.trace_allocations = trace_allocations
+        self.top_allocations = top_allocations
+        
+        self._operations: Dict[str, _OperationStats] = {}
+        self._lock = threading.Lock()
+        self._slot = threading.Lock()
+        self._paused_rate = sample_rate
+        
+        # Thread id and stack counter of the call being sampled
+        self._target = None
+        self._active = threading.Event()
+        self._sampler = None
+    
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """
+        Time a call to an operation, profiling it if sampled
+        
+        Args:
+            name: Operation name used in stats and dump file names
+        """
+        rate = self.sample_rate
+        sampled = rate > 0 and random.random() < rate and self._slot.acquire(blocking=False)
+        if not sampled:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    stats = self._stats(name)
+                    stats.calls += 1
+                    stats.time += elapsed
+            return
+        
+        try:
+            with self._lock:
+                stacks = self._stats(name).stacks
+            tracing = self.trace_allocations and not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+            self._start_sampling(stacks)
+            
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                elapsed = time.perf_counter() - start
+                self._active.clear()
+                snapshot = tracemalloc.take_snapshot() if tracing else None
+                if tracing:
+                    tracemalloc.stop()
+                self._record(name, elapsed, snapshot)
+        finally:
+            self._slot.release()
+    
+    def _stats(self, name: str) -> _OperationStats:
+        """Get an operation's stats; caller holds self._lock"""
+        stats = self._operations.get(name)
+        if stats is None:
+            stats = self._operations[name] = _OperationStats()
+        return stats
+    
+    def _start_sampling(self, stacks: Counter):
+        """Point the sampler thread at the current thread"""
+        self._target = (threading.get_ident(), stacks)
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample, name='profiler', daemon=True)
+            self._sampler.start()
+        self._active.set()
+    
+    def _sample(self):
+        """Capture the target thread's stack every interval while a call is sampled"""
+        while True:
+            self._active.wait()
+            target = self._target
+            if target is None:
+                continue
+            thread_id, stacks = target
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None and self._active.is_set():
+                stack = _collapse(frame)
+                with self._lock:
+                    stacks[stack] += 1
+            del frame
+            time.sleep(self.interval)
+    
+    def _record(self, name: str, elapsed: float, snapshot):
+        """Add a sampled call's latency and allocations to its operation"""
+        statistics = snapshot.statistics('lineno') if snapshot is not None else []
+        with self._lock:
+            stats = self._stats(name)
+            stats.calls += 1
+            stats.sampled += 1
+            stats.sampled_time += elapsed
+            for stat in statistics:
+                frame = stat.traceback[0]
+                site = f"{frame.filename}:{frame.lineno}"
+                stats.allocation_size[site] += stat.size
+                stats.allocation_count[site] += stat.count
+    
+    def set_sample_rate(self, rate: float):
+        """Change the fraction of calls profiled (0 disables)"""
+        self.sample_rate = rate
+        if rate > 0:
+            self._paused_rate = rate
+    
+    def toggle(self) -> bool:
+        """
+        Turn sampling off, dumping what was collected, or back on
+        
+        Returns:
+            True if sampling is now on
+        """
+        if self.sample_rate > 0:
+            self.sample_rate = 0.0
+            self.dump()
+            logger.info("Profiling disabled")
+            return False
+        self.sample_rate = self._paused_rate or self.toggle_rate
+        logger.info(f"Profiling enabled, sampling {self.sample_rate:.1%} of calls")
+        return True
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-operation call counts and the latency cost of sampling
+        
+        Returns:
+            Dictionary mapping operation name to call counts, average
+            latency of sampled and unsampled calls, and the estimated
+            overall overhead as a fraction of total call time (None until
+            there are unsampled calls to compare with)
+        """
+        result = {}
+        with self._lock:
+            for name, stats in self._operations.items():
+                unsampled = stats.calls - stats.sampled
+                avg = stats.time / unsampled if unsampled else 0.0
+                avg_sampled = stats.sampled_time / stats.sampled if stats.sampled else 0.0
+                total = stats.time + stats.sampled_time
+                extra = max(avg_sampled - avg, 0.0) * stats.sampled if avg else 0.0
+                result[name] = {
+                    'calls': stats.calls,
+                    'sampled': stats.sampled,
+                    'avg_latency': avg,
+                    'avg_sampled_latency': avg_sampled,
+                    'estimated_overhead': extra / total if total and avg else None,
+                    'stack_samples': sum(stats.stacks.values())
+                }
+        return result
+    
+    def dump(self) -> Dict[str, str]:
+        """
+        Write collected profiles to output_dir
+        
+        Each operation gets <name>.collapsed, one "frame;frame;frame count"
+        line per distinct stack for flamegraph.pl or speedscope, and, if
+        allocations were traced, <name>.allocations.txt with the top sites
+        by size. Files hold everything collected since startup.
+        
+        Returns:
+            Dictionary mapping file name to path
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        written = {}
+        with self._lock:
+            operations = {
+                name: (
+                    dict(stats.stacks),
+                    stats.allocation_size.most_common(self.top_allocations),
+                    dict(stats.allocation_count)
+                )
+                for name, stats in self._operations.items()
+            }
+        
+        for name, (stacks, top_sites, counts) in operations.items():
+            if stacks:
+                path = os.path.join(self.output_dir, f"{name}.collapsed")
+                with open(path, 'w') as f:
+                    for stack, count in sorted(stacks.items()):
+                        f.write(f"{stack} {count}\n")
+                written[os.path.basename(path)] = path
+            if top_sites:
+                path = os.path.join(self.output_dir, f"{name}.allocations.txt")
+                with open(path, 'w') as f:
+                    for site, size in top_sites:
+                        f.write(f"{size / 1024:10.1f} KiB {counts[site]:8d} blocks  {site}\n")
+                written[os.path.basename(path)] = path
+        
+        logger.info(f"Wrote {len(written)} profile files to {self.output_dir}")
+        return written
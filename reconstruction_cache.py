@@ -0,0 +1,177 @@
+"""
+Reconstruction Cache Module
+Bounded cache of reconstructed emails for repeated payloads and preferences
+"""
+import hashlib
+import json
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bytes charged per entry on top of the result string, for the key and bookkeeping
+ENTRY_OVERHEAD = 200
+
+
+def _digest(*parts: bytes) -> bytes:
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        hasher.update(len(part).to_bytes(8, 'little'))
+        hasher.update(part)
+    return hasher.digest()
+
+
+def _canonical_preferences(preferences: Dict[str, str]) -> bytes:
+    return json.dumps(preferences, sort_keys=True, separators=(',', ':')).encode()
+
+
+class ReconstructionCache:
+    """
+    LRU cache of reconstructed emails, bounded by memory
+    
+    Results are stored under two kinds of key. A token key hashes the
+    token list and preferences, so the same message reached through
+    different payloads is rendered once. A raw key hashes the received
+    payload text and preferences, so an identical payload skips JSON
+    parsing as well. Only stateless payloads may use raw keys: parsing a
+    delta-encoded thread payload updates the receiver's thread dictionary,
+    which must not be skipped.
+    """
+    
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        """
+        Initialize cache
+        
+        Args:
+            max_bytes: Approximate memory budget for cached results
+        """
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        
+        self.raw_hits = 0
+        self.token_hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def token_key(tokens: List[str], preferences: Dict[str, str]) -> Tuple[str, bytes]:
+        """Canonical key for a token list and preferences"""
+        joined = '\x1f'.join(tokens).encode()
+        return 'tokens', _digest(joined, _canonical_preferences(preferences))
+    
+    @staticmethod
+    def raw_key(raw_message: str, preferences: Dict[str, str]) -> Tuple[str, bytes]:
+        """Key for a received payload's exact text and preferences"""
+        return 'raw', _digest(raw_message.encode(), _canonical_preferences(preferences))
+    
+    def get_raw(self, raw_message: str, preferences: Dict[str, str]) -> Optional[str]:
+        """
+        Look up a result by payload text, without parsing it
+        
+        Args:
+            raw_message: Received payload
+            preferences: Reconstruction preferences
+        
+        Returns:
+            Cached reconstruction, or None
+        """
+        return self._get(self.raw_key(raw_message, preferences), raw=True)
+    
+    def get(self, tokens: List[str], preferences: Dict[str, str]) -> Optional[str]:
+        """
+        Look up a result by tokens
+        
+        Args:
+            tokens: Decoded message tokens
+            preferences: Reconstruction preferences
+        
+        Returns:
+            Cached reconstruction, or None
+        """
+        return self._get(self.token_key(tokens, preferences), raw=False)
+    
+    def put_raw(self, raw_message: str, preferences: Dict[str, str], result: str):
+        """Cache a result under a stateless payload's text"""
+        self._put(self.raw_key(raw_message, preferences), result)
+    
+    def put(self, tokens: List[str], preferences: Dict[str, str], result: str):
+        """Cache a result under its tokens"""
+        self._put(self.token_key(tokens, preferences), result)
+    
+    def _get(self, key: Tuple[str, bytes], raw: bool) -> Optional[str]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                # A raw miss falls through to a token lookup, which counts the miss
+                if not raw:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if raw:
+                self.raw_hits += 1
+            else:
+                self.token_hits += 1
+            return result
+    
+    @staticmethod
+    def _size(result: str) -> int:
+        return sys.getsizeof(result) + ENTRY_OVERHEAD
+    
+    def _put(self, key: Tuple[str, bytes], result: str):
+        size = self._size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._size(previous)
+            self._entries[key] = result
+            self._bytes += size
+            self._evict()
+    
+    def _evict(self):
+        """Drop least recently used entries until within budget; caller holds the lock"""
+        while self._bytes > self.max_bytes and self._entries:
+            _, result = self._entries.popitem(last=False)
+            self._bytes -= self._size(result)
+            self.evictions += 1
+    
+    def resize(self, max_bytes: int):
+        """Change the memory budget, evicting entries if it shrank"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+        
+        Returns:
+            Dictionary with hit counts by key kind, misses, hit rate,
+            evictions, entry count and bytes used
+        """
+        with self._lock:
+            hits = self.raw_hits + self.token_hits
+            lookups = hits + self.misses
+            return {
+                'raw_hits': self.raw_hits,
+                'token_hits': self.token_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
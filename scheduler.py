@@ -0,0 +1,332 @@
+"""
+Scheduler Module
+Prioritized, rate-limited and fair dispatch of outbound sends
+"""
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower is served first
+INTERACTIVE = 0
+BULK = 1
+PRIORITIES = {'interactive': INTERACTIVE, 'bulk': BULK}
+
+# Idle domain buckets kept before full ones are pruned
+IDLE_BUCKETS = 1024
+
+# Rounding slack, so waiting exactly the returned time always suffices
+EPSILON = 1e-9
+
+
+class TokenBucket:
+    """Token bucket allowing rate sends per second with bursts of up to burst"""
+    
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+    
+    def __init__(self, rate: float, burst: float, now: float):
+        """
+        Initialize a full bucket
+        
+        Args:
+            rate: Tokens added per second (0 means unlimited)
+            burst: Bucket capacity
+            now: Current monotonic time
+        """
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = now
+    
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available, 0 if one is available now"""
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0 - EPSILON:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+    
+    def consume(self):
+        """Take one token; call only after wait_time returned 0"""
+        if self.rate > 0:
+            self.tokens = max(self.tokens - 1.0, 0.0)
+    
+    def is_full(self, now: float) -> bool:
+        """True if the bucket has refilled to capacity"""
+        return self.wait_time(now) == 0.0 and self.tokens >= self.burst
+
+
+class _Flow:
+    """Messages of one priority class to one recipient domain"""
+    
+    __slots__ = ('priority', 'domain', 'messages', 'tag')
+    
+    def __init__(self, priority: int, domain: str, tag: int):
+        self.priority = priority
+        self.domain = domain
+        self.messages: deque = deque()
+        self.tag = tag
+
+
+class FairQueue:
+    """
+    Priority queue with per-domain fair queuing and token-bucket rate limits
+    
+    Messages are grouped into flows by (priority, recipient domain). Within
+    a priority class, flows are served by start-time fair queuing: each
+    flow carries a virtual start tag, so a domain with 10,000 queued
+    messages gets one turn for each turn of a domain with one. Flows whose
+    domain bucket is empty wait on a separate heap keyed by the time a
+    token becomes available. A single relay bucket limits the total rate.
+    
+    push and pop cost O(log n) in the number of active flows, which is at
+    most the number of pending messages. Not thread-safe; OutboundScheduler
+    serializes access.
+    """
+    
+    def __init__(
+        self,
+        relay_rate: float = 0.0,
+        relay_burst: float = 1.0,
+        domain_rate: float = 0.0,
+        domain_burst: float = 1.0
+    ):
+        """
+        Initialize queue
+        
+        Args:
+            relay_rate: Sends per second allowed through the relay (0 means unlimited)
+            relay_burst: Sends the relay accepts back to back
+            domain_rate: Sends per second allowed to each recipient domain (0 means unlimited)
+            domain_burst: Sends each domain accepts back to back
+        """
+        self.domain_rate = domain_rate
+        self.domain_burst = domain_burst
+        self.relay_bucket = TokenBucket(relay_rate, relay_burst, time.monotonic())
+        self.domain_buckets: Dict[str, TokenBucket] = {}
+        self._prune_at = IDLE_BUCKETS
+        
+        self._flows: Dict[Tuple[int, str], _Flow] = {}
+        self._ready: list = []      # (priority, tag, seq, flow)
+        self._delayed: list = []    # (ready_at, seq, flow)
+        self._virtual_time: Dict[int, int] = {}
+        self._seq = itertools.count()
+        self._pending = 0
+    
+    def __len__(self) -> int:
+        return self._pending
+    
+    def push(self, item: Any, domain: str, priority: int = BULK):
+        """
+        Queue an item
+        
+        Args:
+            item: Queued object returned by pop
+            domain: Recipient domain used for fairness and rate limiting
+            priority: INTERACTIVE or BULK
+        """
+        key = (priority, domain)
+        flow = self._flows.get(key)
+        if flow is None:
+            flow = _Flow(priority, domain, self._virtual_time.get(priority, 0))
+            self._flows[key] = flow
+            heapq.heappush(self._ready, (priority, flow.tag, next(self._seq), flow))
+        flow.messages.append(item)
+        self._pending += 1
+    
+    def pop(self, now: float) -> Tuple[Any, Optional[float]]:
+        """
+        Take the next item allowed to go now
+        
+        Args:
+            now: Current monotonic time
+        
+        Returns:
+            Tuple of (item, None), or (None, seconds until an item may be
+            ready) with None as the wait if the queue is empty
+        """
+        while self._delayed and self._delayed[0][0] <= now + EPSILON:
+            _, seq, flow = heapq.heappop(self._delayed)
+            heapq.heappush(self._ready, (flow.priority, flow.tag, seq, flow))
+        
+        relay_wait = self.relay_bucket.wait_time(now)
+        if relay_wait > 0 and self._pending:
+            return None, relay_wait
+        
+        while self._ready:
+            priority, tag, seq, flow = self._ready[0]
+            bucket = self._domain_bucket(flow.domain, now)
+            domain_wait = bucket.wait_time(now)
+            if domain_wait > 0:
+                heapq.heappop(self._ready)
+                heapq.heappush(self._delayed, (now + domain_wait, seq, flow))
+                continue
+            
+            bucket.consume()
+            self.relay_bucket.consume()
+            item = flow.messages.popleft()
+            self._pending -= 1
+            self._virtual_time[priority] = tag
+            
+            if flow.messages:
+                flow.tag = tag + 1
+                heapq.heapreplace(self._ready, (priority, flow.tag, next(self._seq), flow))
+            else:
+                heapq.heappop(self._ready)
+                del self._flows[(priority, flow.domain)]
+            return item, None
+        
+        if self._delayed:
+            return None, self._delayed[0][0] - now
+        return None, None
+    
+    def _domain_bucket(self, domain: str, now: float) -> TokenBucket:
+        """Get a domain's bucket, pruning buckets of idle domains when there are many"""
+        bucket = self.domain_buckets.get(domain)
+        if bucket is None:
+            if len(self.domain_buckets) >= self._prune_at:
+                active = {flow.domain for flow in self._flows.values()}
+                self.domain_buckets = {
+                    name: kept for name, kept in self.domain_buckets.items()
+                    if name in active or not kept.is_full(now)
+                }
+                self._prune_at = len(self.domain_buckets) + IDLE_BUCKETS
+            bucket = TokenBucket(self.domain_rate, self.domain_burst, now)
+            self.domain_buckets[domain] = bucket
+        return bucket
+    
+    def stats(self) -> Dict[str, int]:
+        """Get pending message and flow counts"""
+        return {
+            'pending': self._pending,
+            'flows': len(self._flows),
+            'rate_limited_flows': len(self._delayed)
+        }
+
+
+class OutboundScheduler:
+    """
+    Dispatches send tasks from a FairQueue on a pool of worker threads
+    
+    Interactive sends always go before queued bulk sends, each recipient
+    domain gets a fair share of its priority class, and token buckets keep
+    the relay and every domain under their configured rates.
+    """
+    
+    def __init__(
+        self,
+        workers: int = 4,
+        relay_rate: float = 0.0,
+        relay_burst: float = 1.0,
+        domain_rate: float = 0.0,
+        domain_burst: float = 1.0,
+        max_pending: int = 0
+    ):
+        """
+        Initialize scheduler and start its workers
+        
+        Args:
+            workers: Threads running send tasks
+            relay_rate: Sends per second allowed through the relay (0 means unlimited)
+            relay_burst: Sends the relay accepts back to back
+            domain_rate: Sends per second allowed to each recipient domain (0 means unlimited)
+            domain_burst: Sends each domain accepts back to back
+            max_pending: Most queued sends before submit raises queue.Full (0 means unbounded)
+        """
+        self.max_pending = max_pending
+        self._queue = FairQueue(relay_rate, relay_burst, domain_rate, domain_burst)
+        self._cond = threading.Condition()
+        self._closing = False
+        self.dispatched = {INTERACTIVE: 0, BULK: 0}
+        
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'scheduler-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def submit(
+        self,
+        recipient: str,
+        task: Callable[[], Any],
+        priority: int = BULK
+    ) -> Future:
+        """
+        Queue a send task
+        
+        Args:
+            recipient: Email address of recipient, used for its domain
+            task: Callable performing the send
+            priority: INTERACTIVE or BULK
+        
+        Returns:
+            Future resolving to the task's result
+        
+        Raises:
+            queue.Full: If max_pending sends are already queued
+            RuntimeError: If the scheduler is closed
+        """
+        future: Future = Future()
+        domain = recipient.rpartition('@')[2].lower()
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Scheduler is closed")
+            if self.max_pending and len(self._queue) >= self.max_pending:
+                raise queue.Full
+            self._queue.push((priority, task, future), domain, priority)
+            self._cond.notify()
+        return future
+    
+    def _worker(self):
+        """Run queued tasks as the rate limits allow"""
+        while True:
+            with self._cond:
+                while True:
+                    item, wait = self._queue.pop(time.monotonic())
+                    if item is not None:
+                        break
+                    if self._closing and not len(self._queue):
+                        return
+                    self._cond.wait(wait)
+                priority, task, future = item
+                self.dispatched[priority] += 1
+            
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(task())
+            except Exception as e:
+                logger.error(f"Scheduled send failed: {e}")
+                future.set_exception(e)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get queue depth and dispatch counts
+        
+        Returns:
+            Dictionary of scheduler statistics
+        """
+        with self._cond:
+            stats = self._queue.stats()
+            stats['dispatched_interactive'] = self.dispatched[INTERACTIVE]
+            stats['dispatched_bulk'] = self.dispatched[BULK]
+        return stats
+    
+    def close(self):
+        """Send everything already queued, then stop the workers"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
@@ -0,0 +1,127 @@
+"""
+Sentiment Lexicon Module
+Cheap word-list sentiment used before escalating to the transformer
+"""
+import logging
+from typing import Any, Dict, Iterable, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Courtesy and sign-off words ("thanks", "kind regards", "all the best",
+# "welcome", "fine") are left out: they close angry and neutral messages as
+# often as happy ones
+POSITIVE_WORDS = frozenset("""
+    accept accepted amazing approve approved awesome beautiful benefit
+    better brilliant celebrate congrats congratulations delighted delight
+    easy effective enjoy enjoyed excellent excited exciting fantastic
+    favorite fortunate friendly glad good grateful great happy helpful
+    impressed impressive improve improved improvement incredible love loved
+    lovely lucky nice outstanding perfect pleased positive progress
+    promising recommend recommended resolved reward rewarding smooth solid
+    success successful superb supportive terrific thrilled valuable win
+    wonderful
+""".split())
+
+NEGATIVE_WORDS = frozenset("""
+    angry annoyed annoying awful bad blocked broken complain complaint concern
+    concerned confused confusing crash crashed damage damaged delay delayed
+    disappointed disappointing disappointment dissatisfied error errors fail
+    failed failing failure frustrated frustrating hate horrible issue issues
+    late lost mistake missing negative outage overdue poor problem problems
+    refund reject rejected sad sorry stuck terrible trouble unacceptable
+    unfortunately unhappy unreliable upset urgent useless worried worry worse
+    worst wrong
+""".split())
+
+# Words that flip the polarity of the next few words
+NEGATIONS = frozenset({"not", "no", "never", "n't", "nothing", "neither", "nor", "without"})
+NEGATION_WINDOW = 3
+
+
+class LexiconSentiment:
+    """
+    Counts polarity words, with negation, to classify clear-cut messages
+    
+    Confidence grows with the margin between positive and negative hits,
+    smoothed so that a single word or a mixed message stays uncertain and
+    is left to the transformer.
+    """
+    
+    def __init__(self, smoothing: float = 2.0):
+        """
+        Initialize classifier
+        
+        Args:
+            smoothing: Pseudo-count added to the hit total; higher is more cautious
+        """
+        self.smoothing = smoothing
+    
+    def classify(self, tokens: List[str]) -> Dict[str, Any]:
+        """
+        Classify lowercased word tokens
+        
+        Args:
+            tokens: Word tokens of the message, including stop words so
+                negations like "not" are seen
+        
+        Returns:
+            Dictionary with 'label' (POSITIVE or NEGATIVE) and 'score' in [0.5, 1]
+        """
+        tally = self.tally()
+        tally.update(tokens)
+        return tally.result()
+    
+    def tally(self) -> 'LexiconTally':
+        """Start counting a message whose tokens arrive in pieces"""
+        return LexiconTally(self.smoothing)
+
+
+class LexiconTally:
+    """Running polarity counts of one message, fed tokens in order"""
+    
+    def __init__(self, smoothing: float):
+        self.smoothing = smoothing
+        self.positive = 0
+        self.negative = 0
+        self._index = 0
+        self._negated_until = -1
+    
+    def update(self, tokens: Iterable[str]):
+        """Count the next tokens of the message"""
+        positive = negative = 0
+        negated_until = self._negated_until
+        i = self._index - 1
+        
+        for i, token in enumerate(tokens, self._index):
+            if token in NEGATIONS:
+                negated_until = i + NEGATION_WINDOW
+                continue
+            if token in POSITIVE_WORDS:
+                polarity = 1
+            elif token in NEGATIVE_WORDS:
+                polarity = -1
+            else:
+                continue
+            if i <= negated_until:
+                polarity = -polarity
+            if polarity > 0:
+                positive += 1
+            else:
+                negative += 1
+        
+        self._index = i + 1
+        self._negated_until = negated_until
+        self.positive += positive
+        self.negative += negative
+    
+    def result(self) -> Dict[str, Any]:
+        """
+        Classify the tokens counted so far
+        
+        Returns:
+            Dictionary with 'label' (POSITIVE or NEGATIVE) and 'score' in [0.5, 1]
+        """
+        margin = self.positive - self.negative
+        score = 0.5 + 0.5 * abs(margin) / (self.positive + self.negative + self.smoothing)
+        return {'label': 'NEGATIVE' if margin < 0 else 'POSITIVE', 'score': score}
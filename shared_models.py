@@ -0,0 +1,85 @@
+"""
+Shared Models Module
+Loads model weights once into shared memory so worker processes reuse them
+"""
+import logging
+import threading
+from typing import Optional, Tuple
+
+from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+
+from config import Settings, get_settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SharedModels:
+    """Tokenizers and models whose weights live in shared memory"""
+    
+    def __init__(self, model_name: str, sentiment_model_name: str):
+        """
+        Load models and move their parameters into shared memory
+        
+        Args:
+            model_name: Embedding model to load
+            sentiment_model_name: Sentiment classification model to load
+        """
+        logger.info("Loading shared model weights...")
+        self.names = (model_name, sentiment_model_name)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.sentiment_tokenizer = AutoTokenizer.from_pretrained(sentiment_model_name)
+        self.sentiment_model = AutoModelForSequenceClassification.from_pretrained(
+            sentiment_model_name
+        )
+        
+        # Weights are only read for inference; shared storage is mapped, not
+        # copied, into forked workers and passed by handle to spawned ones
+        for model in (self.model, self.sentiment_model):
+            model.eval()
+            model.requires_grad_(False)
+            model.share_memory()
+
+
+_shared: Optional[SharedModels] = None
+_shared_lock = threading.Lock()
+
+
+def _model_names(settings: Settings) -> Tuple[str, str]:
+    return settings.AI_MODEL_NAME, settings.SENTIMENT_MODEL_NAME
+
+
+def load_shared_models(settings: Optional[Settings] = None) -> SharedModels:
+    """
+    Get the process-wide shared models for the configured model names
+    
+    Models are loaded on first use and loaded again when the model names
+    change, e.g. after a settings reload. Call this in the parent before
+    starting worker processes so every worker maps the same weights
+    instead of loading its own copy.
+    
+    Args:
+        settings: Settings snapshot naming the models (defaults to the current settings)
+    
+    Returns:
+        SharedModels instance
+    """
+    global _shared
+    names = _model_names(settings or get_settings())
+    with _shared_lock:
+        if _shared is None or _shared.names != names:
+            _shared = SharedModels(*names)
+        return _shared
+
+
+def set_shared_models(models: SharedModels):
+    """
+    Install models received from a parent process (spawn start method)
+    
+    Args:
+        models: SharedModels passed to the worker through torch.multiprocessing
+    """
+    global _shared
+    with _shared_lock:
+        _shared = models
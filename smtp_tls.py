@@ -0,0 +1,182 @@
+"""
+SMTP TLS Module
+Opens SMTP connections over STARTTLS or implicit TLS with session resumption
+"""
+import hashlib
+import logging
+import smtplib
+import ssl
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TLS_MODES = ('none', 'starttls', 'implicit')
+
+
+def certificate_fingerprint(der_certificate: bytes) -> str:
+    """SHA-256 fingerprint of a DER certificate, as lowercase hex"""
+    return hashlib.sha256(der_certificate).hexdigest()
+
+
+def _normalize_pin(pin: str) -> str:
+    return pin.strip().replace(':', '').lower()
+
+
+class _ResumingContext:
+    """
+    Stands in for the SSLContext smtplib wraps one connection's socket with
+    
+    smtplib only calls wrap_socket(sock, server_hostname=...), so this adds
+    the cached session and checks the certificate pin without reimplementing
+    starttls() or SMTP_SSL.
+    """
+    
+    def __init__(self, connector: 'SMTPConnector', key: Tuple[str, int]):
+        self.connector = connector
+        self.key = key
+        self.socket: Optional[ssl.SSLSocket] = None
+    
+    def wrap_socket(self, sock, server_hostname: Optional[str] = None, **kwargs) -> ssl.SSLSocket:
+        connector = self.connector
+        session = connector._sessions.get(self.key) if connector.resume else None
+        tls_sock = connector.context.wrap_socket(
+            sock, server_hostname=server_hostname, session=session, **kwargs
+        )
+        connector._record_handshake(tls_sock.session_reused)
+        
+        if connector.pins:
+            fingerprint = certificate_fingerprint(tls_sock.getpeercert(binary_form=True) or b'')
+            if fingerprint not in connector.pins:
+                tls_sock.close()
+                raise ssl.SSLError(
+                    f"Certificate of {server_hostname} ({fingerprint}) matches no pinned fingerprint"
+                )
+        self.socket = tls_sock
+        return tls_sock
+
+
+class SMTPConnector:
+    """
+    Opens SMTP connections with a shared TLS configuration
+    
+    All connections share one SSLContext, and the TLS session of the last
+    connection to each server is kept so the next connection can resume it
+    with an abbreviated handshake instead of a full key exchange and
+    certificate verification. Certificate pins, if given, are SHA-256
+    fingerprints of the server certificate checked after every handshake,
+    resumed or not.
+    """
+    
+    def __init__(
+        self,
+        mode: str = 'none',
+        verify: bool = True,
+        ca_file: str = '',
+        pins: str = '',
+        resume: bool = True,
+        timeout: float = 30.0
+    ):
+        """
+        Initialize connector
+        
+        Args:
+            mode: 'none' for plain SMTP, 'starttls' to upgrade after EHLO, or
+                'implicit' for TLS from the start (usually port 465)
+            verify: Verify the server certificate and host name
+            ca_file: CA bundle to verify against instead of the system store
+            pins: Comma-separated SHA-256 certificate fingerprints (hex,
+                colons optional); empty disables pinning
+            resume: Reuse TLS sessions across connections
+            timeout: Socket timeout in seconds
+        
+        Raises:
+            ValueError: If the mode is not one of TLS_MODES
+        """
+        if mode not in TLS_MODES:
+            raise ValueError(f"Unknown SMTP TLS mode: {mode}")
+        self.mode = mode
+        self.resume = resume
+        self.timeout = timeout
+        self.pins = frozenset(_normalize_pin(pin) for pin in pins.split(',') if pin.strip())
+        
+        self.context = ssl.create_default_context(cafile=ca_file or None)
+        if not verify:
+            self.context.check_hostname = False
+            self.context.verify_mode = ssl.CERT_NONE
+        
+        self._sessions: Dict[Tuple[str, int], ssl.SSLSession] = {}
+        self._lock = threading.Lock()
+        self.handshakes = 0
+        self.resumed = 0
+    
+    @classmethod
+    def from_settings(cls, settings) -> 'SMTPConnector':
+        """Create a connector from a Settings snapshot"""
+        return cls(
+            mode=settings.SMTP_TLS,
+            verify=settings.SMTP_TLS_VERIFY,
+            ca_file=settings.SMTP_TLS_CA_FILE,
+            pins=settings.SMTP_TLS_PINS
+        )
+    
+    def _record_handshake(self, reused: bool):
+        with self._lock:
+            self.handshakes += 1
+            if reused:
+                self.resumed += 1
+    
+    @contextmanager
+    def connect(self, host: str, port: int) -> Iterator[smtplib.SMTP]:
+        """
+        Open an SMTP connection, secured according to the mode
+        
+        The connection is closed with QUIT when the block exits. The TLS
+        session is saved for the next connection only if the block
+        completed without error.
+        
+        Args:
+            host: SMTP server host
+            port: SMTP server port
+        
+        Yields:
+            Connected smtplib.SMTP instance, after EHLO and any STARTTLS
+        
+        Raises:
+            smtplib.SMTPNotSupportedError: If STARTTLS is required but not offered
+            ssl.SSLError: If the handshake fails or the certificate isn't pinned
+        """
+        key = (host, port)
+        context = _ResumingContext(self, key)
+        
+        if self.mode == 'implicit':
+            server = smtplib.SMTP_SSL(host, port, timeout=self.timeout, context=context)
+        else:
+            server = smtplib.SMTP(host, port, timeout=self.timeout)
+        
+        with server:
+            if self.mode == 'starttls':
+                server.starttls(context=context)
+            yield server
+            
+            # TLS 1.3 tickets arrive after the handshake, so take the session late
+            if context.socket is not None and context.socket.session is not None:
+                self._sessions[key] = context.socket.session
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get handshake statistics
+        
+        Returns:
+            Dictionary with the mode, handshake count, resumed handshakes
+            and the fraction of handshakes that were resumed
+        """
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'handshakes': self.handshakes,
+                'resumed': self.resumed,
+                'resumption_rate': self.resumed / self.handshakes if self.handshakes else 0.0
+            }
@@ -2,15 +2,227 @@
 Speech-to-Text Input Module
 Handles voice command input for the messenger
 """
+import json
 import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 import speech_recognition as sr
-from typing import Optional
+from typing import Any, Dict, Optional
 
-from config import STT_ENGINE, STT_LANGUAGE, STT_TIMEOUT
+from config import (
+    STT_ENGINE, STT_LANGUAGE, STT_TIMEOUT, STT_WORKERS,
+    STT_CALIBRATION_FILE, STT_CALIBRATION_TTL, VOSK_MODEL_PATH,
+    STT_COMMAND_ENGINE, STT_COMMAND_CONFIDENCE
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Spoken words for each voice command, as matched by main.py and confirm_action
+COMMAND_WORDS = {
+    'send': ('send', 'message'),
+    'quit': ('quit', 'exit'),
+    'help': ('help',),
+    'yes': ('yes', 'confirm'),
+    'no': ('no', 'cancel'),
+}
+
+# Local engine models are loaded once per process and shared by all recognizers
+_local_models: Dict[str, Any] = {}
+_local_models_lock = threading.Lock()
+
+
+def get_vosk_model(model_path: str = VOSK_MODEL_PATH):
+    """
+    Load a Vosk model, reusing it if it was already loaded
+    
+    Args:
+        model_path: Directory containing the Vosk model
+    
+    Returns:
+        Shared vosk.Model instance
+    """
+    with _local_models_lock:
+        model = _local_models.get(model_path)
+        if model is None:
+            try:
+                from vosk import Model, SetLogLevel
+            except ImportError:
+                raise RuntimeError("STT engine 'vosk' requires the vosk package (pip install vosk)")
+            SetLogLevel(-1)
+            logger.info(f"Loading Vosk model from {model_path}")
+            model = Model(model_path)
+            _local_models[model_path] = model
+        return model
+
+
+class RecognitionPool:
+    """Runs speech recognition on a worker pool so recording can overlap recognition"""
+    
+    def __init__(
+        self,
+        engine: str = STT_ENGINE,
+        language: str = STT_LANGUAGE,
+        workers: int = STT_WORKERS
+    ):
+        """
+        Initialize recognition workers
+        
+        Args:
+            engine: Recognition engine ('google', 'sphinx' or 'vosk')
+            language: Language code for engines that accept one
+            workers: Number of concurrent recognition workers
+        """
+        self.engine = engine
+        self.language = language
+        self.recognizer = sr.Recognizer()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stt')
+        
+        # Load local models up front rather than on the first utterance
+        if self.engine == 'vosk':
+            self.vosk_model = get_vosk_model()
+    
+    def recognize(self, audio: sr.AudioData) -> str:
+        """
+        Convert recorded audio to text with the configured engine
+        
+        Args:
+            audio: Recorded audio
+        
+        Returns:
+            Recognized text
+        
+        Raises:
+            sr.UnknownValueError: If the speech could not be understood
+            sr.RequestError: If the recognition service failed
+        """
+        if self.engine == 'vosk':
+            return self._recognize_vosk(audio)
+        if self.engine == 'sphinx':
+            return self.recognizer.recognize_sphinx(audio)
+        return self.recognizer.recognize_google(audio, language=self.language)
+    
+    def _recognize_vosk(self, audio: sr.AudioData) -> str:
+        """Recognize audio with the shared Vosk model"""
+        from vosk import KaldiRecognizer
+        
+        recognizer = KaldiRecognizer(self.vosk_model, 16000)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=16000, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get('text', '')
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+    
+    def submit(self, audio: sr.AudioData) -> Future:
+        """
+        Queue audio for recognition on the worker pool
+        
+        Args:
+            audio: Recorded audio
+        
+        Returns:
+            Future resolving to the recognized text
+        """
+        return self.executor.submit(self.recognize, audio)
+    
+    def transcribe_file(self, path: str) -> Future:
+        """
+        Queue a recorded WAV/AIFF/FLAC file for recognition
+        
+        Args:
+            path: Path to the audio file
+        
+        Returns:
+            Future resolving to the recognized text
+        """
+        with sr.AudioFile(path) as source:
+            audio = self.recognizer.record(source)
+        return self.submit(audio)
+    
+    def shutdown(self):
+        """Stop the worker pool after pending recognitions finish"""
+        self.executor.shutdown(wait=True)
+
+
+def match_command(text: Optional[str]) -> Optional[str]:
+    """
+    Map recognized text to the command it names
+    
+    Args:
+        text: Recognized text
+    
+    Returns:
+        Key of COMMAND_WORDS, or None if no command word was said
+    """
+    words = set((text or '').lower().split())
+    for command, spoken in COMMAND_WORDS.items():
+        if words.intersection(spoken):
+            return command
+    return None
+
+
+class CommandSpotter:
+    """
+    On-device recognizer for the fixed command vocabulary
+    
+    Vosk is restricted to a grammar of the command words, which makes
+    recognition of a short utterance take tens of milliseconds instead of
+    a round trip to a full recognizer. Anything outside the grammar, or
+    recognized with low confidence, is rejected so the caller can fall back
+    to full recognition.
+    """
+    
+    def __init__(
+        self,
+        engine: str = STT_COMMAND_ENGINE,
+        min_confidence: float = STT_COMMAND_CONFIDENCE
+    ):
+        """
+        Initialize spotter
+        
+        Args:
+            engine: Spotting engine (only 'vosk' is supported)
+            min_confidence: Lowest word confidence accepted
+        
+        Raises:
+            ValueError: If the engine is not supported
+            RuntimeError: If vosk is not installed
+        """
+        if engine != 'vosk':
+            raise ValueError(f"Unsupported command spotting engine: {engine}")
+        self.engine = engine
+        self.min_confidence = min_confidence
+        self.model = get_vosk_model()
+        
+        phrases = ['send message'] + [word for words in COMMAND_WORDS.values() for word in words]
+        self.grammar = json.dumps(phrases + ['[unk]'])
+    
+    def spot(self, audio: sr.AudioData) -> Optional[str]:
+        """
+        Recognize a command utterance
+        
+        Args:
+            audio: Recorded audio
+        
+        Returns:
+            Recognized command words, or None if the utterance was not a
+            confidently recognized command
+        """
+        from vosk import KaldiRecognizer
+        
+        recognizer = KaldiRecognizer(self.model, 16000, self.grammar)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=16000, convert_width=2))
+        result = json.loads(recognizer.FinalResult())
+        
+        words = result.get('result', [])
+        if not words or any(word['word'] == '[unk]' for word in words):
+            return None
+        if min(word['conf'] for word in words) < self.min_confidence:
+            return None
+        return result['text']
+
 
 class STTInput:
     """Speech-to-Text input handler"""
@@ -18,28 +230,130 @@ class STTInput:
     def __init__(self):
         """Initialize STT components"""
         try:
-            self.recognizer = sr.Recognizer()
             self.microphone = sr.Microphone()
             self.engine = STT_ENGINE
             self.language = STT_LANGUAGE
             self.timeout = STT_TIMEOUT
+            self.pool = RecognitionPool(self.engine, self.language)
+            self.recognizer = self.pool.recognizer
+            self.spotter = self._create_spotter()
             
-            # Adjust for ambient noise
-            with self.microphone as source:
-                logger.info("Calibrating for ambient noise...")
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
+            # The microphone can only be opened by one caller at a time
+            self._mic_lock = threading.Lock()
+            self._stop_event = threading.Event()
+            
+            # Adjust for ambient noise, reusing a recent calibration if there is one
+            threshold = self._load_calibration()
+            if threshold is None:
+                with self._mic_lock:
+                    self._calibrate()
+            else:
+                self.recognizer.energy_threshold = threshold
+                logger.info(f"Using cached ambient noise calibration ({threshold:.0f})")
+            
+            self._calibration_thread = threading.Thread(
+                target=self._refresh_calibration,
+                name='stt-calibration',
+                daemon=True
+            )
+            self._calibration_thread.start()
             
             logger.info(f"STT Input initialized with {self.engine} engine")
         except Exception as e:
             logger.error(f"Error initializing STT: {e}")
             raise
     
-    def listen(self, prompt: str = "Listening...") -> Optional[str]:
+    @staticmethod
+    def _create_spotter() -> Optional[CommandSpotter]:
+        """Create the command spotter, or None to recognize commands in full"""
+        if STT_COMMAND_ENGINE == 'none':
+            return None
+        try:
+            return CommandSpotter()
+        except Exception as e:
+            logger.warning(f"Command spotting unavailable, using {STT_ENGINE} for commands: {e}")
+            return None
+    
+    def _load_calibration(self) -> Optional[float]:
+        """
+        Read the cached energy threshold if it is still fresh
+        
+        Returns:
+            Cached energy threshold, or None if missing or stale
+        """
+        try:
+            with open(STT_CALIBRATION_FILE) as f:
+                data = json.load(f)
+            if time.time() - data['calibrated_at'] < STT_CALIBRATION_TTL:
+                return float(data['energy_threshold'])
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+    
+    def _calibrate(self, duration: float = 1):
+        """
+        Measure ambient noise and cache the resulting energy threshold
+        
+        The caller must hold the microphone lock.
+        
+        Args:
+            duration: Seconds of ambient audio to sample
+        """
+        with self.microphone as source:
+            logger.info("Calibrating for ambient noise...")
+            self.recognizer.adjust_for_ambient_noise(source, duration=duration)
+        
+        try:
+            with open(STT_CALIBRATION_FILE, 'w') as f:
+                json.dump({
+                    'energy_threshold': self.recognizer.energy_threshold,
+                    'calibrated_at': time.time()
+                }, f)
+        except OSError as e:
+            logger.warning(f"Could not cache ambient noise calibration: {e}")
+    
+    def _refresh_calibration(self):
+        """Recalibrate in the background whenever the microphone is idle"""
+        while not self._stop_event.wait(STT_CALIBRATION_TTL):
+            if not self._mic_lock.acquire(blocking=False):
+                continue
+            try:
+                self._calibrate(duration=0.5)
+            except Exception as e:
+                logger.warning(f"Background calibration failed: {e}")
+            finally:
+                self._mic_lock.release()
+    
+    def record(
+        self,
+        timeout: Optional[float] = None,
+        phrase_time_limit: Optional[float] = None
+    ) -> sr.AudioData:
+        """
+        Record a single utterance from the microphone
+        
+        Args:
+            timeout: Seconds to wait for speech to start
+            phrase_time_limit: Maximum length of the utterance in seconds
+        
+        Returns:
+            Recorded audio
+        """
+        with self._mic_lock:
+            with self.microphone as source:
+                return self.recognizer.listen(
+                    source,
+                    timeout=timeout,
+                    phrase_time_limit=phrase_time_limit
+                )
+    
+    def listen(self, prompt: str = "Listening...", command: bool = False) -> Optional[str]:
         """
         Listen for voice input and convert to text
         
         Args:
             prompt: Message to display while listening
+            command: Try the on-device command spotter before full recognition
             
         Returns:
             Recognized text or None if failed
@@ -47,16 +361,18 @@ class STTInput:
         try:
             logger.info(prompt)
             
-            with self.microphone as source:
-                audio = self.recognizer.listen(source, timeout=self.timeout)
+            audio = self.record(timeout=self.timeout)
             
             logger.info("Processing speech...")
             
-            # Use selected engine (default: google)
-            if self.engine == 'sphinx':
-                text = self.recognizer.recognize_sphinx(audio)
-            else:
-                text = self.recognizer.recognize_google(audio, language=self.language)
+            text = None
+            if command and self.spotter is not None:
+                try:
+                    text = self.spotter.spot(audio)
+                except Exception as e:
+                    logger.warning(f"Command spotter failed, falling back to {self.engine}: {e}")
+            if text is None:
+                text = self.pool.submit(audio).result()
             
             logger.info(f"Recognized: {text}")
             return text
@@ -81,31 +397,54 @@ class STTInput:
         Returns:
             Command text or None if failed
         """
-        return self.listen("Say a command...")
+        return self.listen("Say a command...", command=True)
     
-    def get_email_content(self) -> Optional[str]:
+    def get_email_content(self, max_duration: float = 30) -> Optional[str]:
         """
         Get email content via voice input
         
+        The message is recorded phrase by phrase; each phrase is recognized
+        on the worker pool while the next one is being recorded.
+        
+        Args:
+            max_duration: Maximum recording time in seconds
+        
         Returns:
             Email content or None if failed
         """
         logger.info("Ready to record email content")
-        logger.info("Speak your message (you have 30 seconds)")
+        logger.info(f"Speak your message (you have {max_duration:.0f} seconds)")
+        
+        pending = []
+        deadline = time.monotonic() + max_duration
         
         try:
-            with self.microphone as source:
-                # Extended timeout for longer messages
-                audio = self.recognizer.listen(source, timeout=30, phrase_time_limit=30)
+            # Extended timeout before the first phrase for longer messages
+            phrase_timeout = max_duration
+            while time.monotonic() < deadline:
+                try:
+                    audio = self.record(
+                        timeout=phrase_timeout,
+                        phrase_time_limit=deadline - time.monotonic()
+                    )
+                except sr.WaitTimeoutError:
+                    break
+                pending.append(self.pool.submit(audio))
+                phrase_timeout = self.timeout
             
             logger.info("Processing your message...")
             
-            # Use selected engine (default: google)
-            if self.engine == 'sphinx':
-                text = self.recognizer.recognize_sphinx(audio)
-            else:
-                text = self.recognizer.recognize_google(audio, language=self.language)
+            phrases = []
+            for future in pending:
+                try:
+                    phrases.append(future.result())
+                except sr.UnknownValueError:
+                    logger.warning("Could not understand part of the message")
+            
+            if not phrases:
+                return None
             
+            text = " ".join(phrases)
             logger.info(f"Message captured ({len(text)} characters)")
             return text
             
@@ -125,7 +464,7 @@ class STTInput:
         """
         logger.info(f"{question} (Say 'yes' or 'no')")
         
-        response = self.listen("Waiting for confirmation...")
+        response = self.listen("Waiting for confirmation...", command=True)
         
         if response:
             response_lower = response.lower()
@@ -135,3 +474,8 @@ class STTInput:
                 return False
         
         return False
+    
+    def close(self):
+        """Stop background calibration and recognition workers"""
+        self._stop_event.set()
+        self.pool.shutdown()
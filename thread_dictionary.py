@@ -0,0 +1,172 @@
+"""
+Thread Dictionary Module
+Per-conversation token dictionaries for delta-encoded reply payloads
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# An encoded token: an int references a dictionary entry, a str is a new literal
+EncodedToken = Union[int, str]
+
+
+class ThreadDictionary:
+    """
+    Token dictionary for one conversation
+    
+    Sender and receiver each keep a copy that grows identically: every
+    literal token in a delivered message is appended, so later messages
+    can refer to it by index.
+    """
+    
+    def __init__(self):
+        """Initialize an empty dictionary"""
+        self.entries: List[str] = []
+        self.index: Dict[str, int] = {}
+        # Messages delivered since the dictionary last restarted at base 0
+        self.messages = 0
+        self.lock = threading.Lock()
+    
+    def encode(self, tokens: List[str]) -> Tuple[int, List[EncodedToken], List[str]]:
+        """
+        Encode tokens against the dictionary without modifying it
+        
+        Args:
+            tokens: Tokens to encode
+        
+        Returns:
+            Tuple of (dictionary size the encoding is based on, encoded
+            tokens, new literals to append once the message is delivered)
+        """
+        base = len(self.entries)
+        pending: Dict[str, int] = {}
+        encoded: List[EncodedToken] = []
+        
+        for token in tokens:
+            ref = self.index.get(token)
+            if ref is None:
+                ref = pending.get(token)
+            if ref is None:
+                pending[token] = base + len(pending)
+                encoded.append(token)
+            else:
+                encoded.append(ref)
+        
+        return base, encoded, list(pending)
+    
+    def decode(self, encoded: List[EncodedToken]) -> List[str]:
+        """
+        Expand encoded tokens, appending new literals to the dictionary
+        
+        Args:
+            encoded: Encoded tokens produced by encode() on the sender
+        
+        Returns:
+            Expanded token list
+        """
+        tokens = []
+        for item in encoded:
+            if isinstance(item, int):
+                tokens.append(self.entries[item])
+            else:
+                if item not in self.index:
+                    self.append([item])
+                tokens.append(item)
+        return tokens
+    
+    def append(self, literals: List[str]):
+        """Add delivered literals to the dictionary"""
+        for token in literals:
+            self.index[token] = len(self.entries)
+            self.entries.append(token)
+    
+    def reset(self):
+        """Forget all entries"""
+        self.entries.clear()
+        self.index.clear()
+        self.messages = 0
+
+
+class ThreadDictionaryStore:
+    """Bounded collection of thread dictionaries, least recently used evicted first"""
+    
+    def __init__(self, max_threads: int = 1000):
+        """
+        Initialize store
+        
+        Args:
+            max_threads: Most conversations to keep dictionaries for
+        """
+        self.max_threads = max_threads
+        self._threads: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> ThreadDictionary:
+        """
+        Get the dictionary for a conversation, creating it if needed
+        
+        Args:
+            key: Conversation key
+        
+        Returns:
+            ThreadDictionary for the conversation
+        """
+        with self._lock:
+            dictionary = self._threads.get(key)
+            if dictionary is None:
+                dictionary = ThreadDictionary()
+                self._threads[key] = dictionary
+                while len(self._threads) > self.max_threads:
+                    self._threads.popitem(last=False)
+            else:
+                self._threads.move_to_end(key)
+            return dictionary
+    
+    def __len__(self) -> int:
+        return len(self._threads)
+
+
+def encode_thread_payload(thread_id: str, base: int, encoded: List[EncodedToken]) -> Dict[str, Any]:
+    """Build the payload fields carrying a delta-encoded token list"""
+    return {'thread': {'id': thread_id, 'base': base, 'refs': encoded}}
+
+
+def decode_thread_payload(
+    store: ThreadDictionaryStore,
+    sender: str,
+    thread: Dict[str, Any]
+) -> Optional[List[str]]:
+    """
+    Expand the thread fields of a received payload
+    
+    A base of 0 means the sender started a fresh dictionary, so the
+    receiver's copy is reset. Any other base must match the receiver's
+    dictionary size, otherwise a message was lost or reordered, or the
+    receiver restarted or evicted the conversation; the conversation is
+    decodable again from the sender's next base-0 payload.
+    
+    Args:
+        store: Receiver-side dictionary store
+        sender: Sender address, so thread ids from different senders don't collide
+        thread: The payload's 'thread' object
+    
+    Returns:
+        Expanded token list, or None if the dictionaries are out of sync
+    """
+    dictionary = store.get((sender, thread['id']))
+    with dictionary.lock:
+        base = thread['base']
+        if base == 0:
+            dictionary.reset()
+        elif base != len(dictionary.entries):
+            logger.error(
+                f"Thread {thread['id']} out of sync: payload based on {base} "
+                f"entries, receiver has {len(dictionary.entries)}; "
+                f"waiting for the sender's next full payload"
+            )
+            return None
+        return dictionary.decode(thread['refs'])
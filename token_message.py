@@ -0,0 +1,269 @@
+"""
+Token Message Module
+Compact in-memory representation of token payloads and extracted context
+"""
+import logging
+import sys
+import threading
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import TOKEN_VOCABULARY_SIZE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SENTIMENT_PREFIX = "SENTIMENT:"
+LENGTH_PREFIX = "LENGTH:"
+
+# Ids from here up index a message's own tokens that aren't in the vocabulary
+_OVERFLOW = 1 << 31
+
+
+class Vocabulary:
+    """
+    Interns token strings as integer ids shared across messages
+    
+    Holds at most max_size tokens and never drops one, since live messages
+    refer to them by id. Once it is full, tokens not already in it are kept
+    by the message that uses them and freed with it, so an open-ended stream
+    of names, numbers and references can't grow it without bound.
+    """
+    
+    def __init__(self, max_size: int = TOKEN_VOCABULARY_SIZE):
+        """
+        Initialize an empty vocabulary
+        
+        Args:
+            max_size: Most tokens interned
+        """
+        self.max_size = max_size
+        self._ids: Dict[str, int] = {}
+        self._tokens: List[str] = []
+        self._lock = threading.Lock()
+    
+    def intern(self, token: str) -> Optional[int]:
+        """
+        Get the id of a token, adding it to the vocabulary if there is room
+        
+        Args:
+            token: Token string
+        
+        Returns:
+            Integer id of the token, or None if it isn't in the full vocabulary
+        """
+        token_id = self._ids.get(token)
+        if token_id is None and len(self._tokens) < self.max_size:
+            with self._lock:
+                token_id = self._ids.get(token)
+                if token_id is None and len(self._tokens) < self.max_size:
+                    token_id = len(self._tokens)
+                    self._tokens.append(sys.intern(token))
+                    self._ids[self._tokens[token_id]] = token_id
+        return token_id
+    
+    def encode(self, tokens: Iterable[str]) -> Tuple[array, Tuple[str, ...]]:
+        """
+        Convert token strings to a compact array of ids
+        
+        Returns:
+            Tuple of (ids, overflow tokens the ids from _OVERFLOW up refer to)
+        """
+        token_ids = []
+        overflow: Dict[str, int] = {}
+        for token in tokens:
+            token_id = self.intern(token)
+            if token_id is None:
+                token_id = overflow.setdefault(token, _OVERFLOW + len(overflow))
+            token_ids.append(token_id)
+        return array('I', token_ids), tuple(overflow)
+    
+    def decode(self, token_ids: Iterable[int], overflow: Sequence[str] = ()) -> List[str]:
+        """Convert token ids back to strings"""
+        tokens = self._tokens
+        return [
+            tokens[token_id] if token_id < _OVERFLOW else overflow[token_id - _OVERFLOW]
+            for token_id in token_ids
+        ]
+    
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+
+# Process-wide vocabulary shared by every TokenMessage and Context
+VOCABULARY = Vocabulary()
+
+
+class TokenMessage:
+    """
+    Token payload with typed sentiment/length and interned content tokens
+    
+    Lists produced by AIProcessor.generate_tokens ([SENTIMENT:x] + content +
+    [LENGTH:n]) are split into typed fields. Any other list is kept verbatim
+    in token_ids with sentiment and length left as None, so conversion back
+    with to_tokens() is always lossless.
+    """
+    
+    __slots__ = ('sentiment', 'length', 'token_ids', 'overflow')
+    
+    def __init__(
+        self,
+        content_tokens: Iterable[str] = (),
+        sentiment: Optional[str] = None,
+        length: Optional[int] = None
+    ):
+        """
+        Initialize token message
+        
+        Args:
+            content_tokens: Content tokens in order
+            sentiment: Sentiment label (e.g. 'POSITIVE')
+            length: Word count of the original message
+        """
+        self.sentiment = sys.intern(sentiment) if sentiment is not None else None
+        self.length = length
+        self.token_ids, self.overflow = VOCABULARY.encode(content_tokens)
+    
+    @property
+    def content_tokens(self) -> List[str]:
+        """Content tokens as strings"""
+        return VOCABULARY.decode(self.token_ids, self.overflow)
+    
+    @classmethod
+    def from_tokens(cls, tokens: List[str]) -> 'TokenMessage':
+        """
+        Build a token message from the list-of-strings form
+        
+        Args:
+            tokens: List of tokens as produced by generate_tokens
+        
+        Returns:
+            Equivalent TokenMessage
+        """
+        start, end = 0, len(tokens)
+        sentiment = None
+        length = None
+        
+        if end and tokens[0].startswith(SENTIMENT_PREFIX):
+            sentiment = tokens[0][len(SENTIMENT_PREFIX):]
+            start = 1
+        if end > start and tokens[-1].startswith(LENGTH_PREFIX):
+            value = tokens[-1][len(LENGTH_PREFIX):]
+            if value.isascii() and value.isdigit() and str(int(value)) == value:
+                length = int(value)
+                end -= 1
+        
+        content = tokens[start:end]
+        if any(token.startswith((SENTIMENT_PREFIX, LENGTH_PREFIX)) for token in content):
+            # Not in canonical form; keep every token verbatim
+            return cls(tokens)
+        
+        return cls(content, sentiment, length)
+    
+    def to_tokens(self) -> List[str]:
+        """
+        Convert back to the list-of-strings form
+        
+        Returns:
+            List of tokens
+        """
+        tokens = []
+        if self.sentiment is not None:
+            tokens.append(f"{SENTIMENT_PREFIX}{self.sentiment}")
+        tokens.extend(self.content_tokens)
+        if self.length is not None:
+            tokens.append(f"{LENGTH_PREFIX}{self.length}")
+        return tokens
+    
+    def __len__(self) -> int:
+        return len(self.token_ids) + (self.sentiment is not None) + (self.length is not None)
+    
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, TokenMessage):
+            return NotImplemented
+        return (
+            self.sentiment == other.sentiment
+            and self.length == other.length
+            and self.token_ids == other.token_ids
+            and self.overflow == other.overflow
+        )
+    
+    def __repr__(self) -> str:
+        return f"TokenMessage({self.to_tokens()!r})"
+
+
+class Context:
+    """Compact form of the context dictionary returned by extract_context"""
+    
+    __slots__ = (
+        'token_ids', 'overflow', 'sentiment', 'sentiment_score',
+        'key_phrases', 'word_count', 'sentence_count'
+    )
+    
+    def __init__(
+        self,
+        tokens: Iterable[str],
+        sentiment: str,
+        sentiment_score: float,
+        key_phrases: Iterable[str],
+        word_count: int,
+        sentence_count: int
+    ):
+        """
+        Initialize context
+        
+        Args:
+            tokens: Filtered content tokens
+            sentiment: Sentiment label
+            sentiment_score: Sentiment confidence
+            key_phrases: Key sentences from the message
+            word_count: Number of words in the message
+            sentence_count: Number of sentences in the message
+        """
+        self.token_ids, self.overflow = VOCABULARY.encode(tokens)
+        self.sentiment = sys.intern(sentiment)
+        self.sentiment_score = sentiment_score
+        self.key_phrases = tuple(key_phrases)
+        self.word_count = word_count
+        self.sentence_count = sentence_count
+    
+    @property
+    def tokens(self) -> List[str]:
+        """Filtered content tokens as strings"""
+        return VOCABULARY.decode(self.token_ids, self.overflow)
+    
+    @classmethod
+    def from_dict(cls, context: Dict[str, Any]) -> 'Context':
+        """
+        Build a compact context from the dictionary form
+        
+        Args:
+            context: Context dictionary from extract_context
+        
+        Returns:
+            Equivalent Context
+        """
+        return cls(
+            context['tokens'],
+            context['sentiment'],
+            context['sentiment_score'],
+            context['key_phrases'],
+            context['word_count'],
+            context['sentence_count']
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert back to the dictionary form
+        
+        Returns:
+            Context dictionary as returned by extract_context
+        """
+        return {
+            'tokens': self.tokens,
+            'sentiment': self.sentiment,
+            'sentiment_score': self.sentiment_score,
+            'key_phrases': list(self.key_phrases),
+            'word_count': self.word_count,
+            'sentence_count': self.sentence_count
+        }
@@ -0,0 +1,397 @@
+"""
+Tuner Module
+Calibrates inference and transport settings for throughput within a latency target
+"""
+import logging
+import os
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import Settings, get_settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Labeled messages whose text makes up the calibration workload
+CALIBRATION_PATH = 'fixtures/sentiment.tsv'
+
+BATCH_SIZES = (1, 4, 8, 16, 32)
+TOKEN_LENGTHS = (128, 256, 512)
+# The stand-in relay never pushes back, so throughput keeps rising with
+# concurrency and the search would always end on its largest value; the
+# cap keeps that value one a real relay is likely to accept
+TRANSPORT_CONCURRENCY = (1, 2, 4, 8, 16)
+
+# Candidates within this fraction of the best throughput count as ties,
+# settled in favour of the cheaper or more conservative value
+TIE_TOLERANCE = 0.05
+
+# Relay stand-in delay per reply when no relay round trip is given
+DEFAULT_RELAY_LATENCY_MS = 2.0
+
+# With a given relay round trip, telnet timeouts are raised to this
+# multiple of the slowest sends seen; they are never lowered
+TIMEOUT_MARGIN = 4.0
+
+# Loggers that write a line per message, which would swamp the calibration output
+_NOISY_LOGGERS = ('ai_processor', 'email_handler', 'circuit_breaker', 'batcher')
+
+
+@dataclass
+class Trial:
+    """Result of running the calibration workload with one set of values"""
+    
+    params: Dict[str, Any]
+    count: int
+    elapsed: float
+    latencies: List[float] = field(repr=False)
+    errors: int = 0
+    
+    @property
+    def throughput(self) -> float:
+        """Messages per second"""
+        return self.count / self.elapsed if self.elapsed else 0.0
+    
+    def percentile(self, fraction: float) -> float:
+        """Latency in milliseconds at a fraction of the sorted latencies"""
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return 0.0
+        return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000
+    
+    def describe(self) -> str:
+        params = ', '.join(f"{name}={value}" for name, value in self.params.items())
+        return (
+            f"{params}: {self.throughput:,.1f} msg/s, p95 {self.percentile(0.95):.0f} ms"
+            + (f", {self.errors} errors" if self.errors else '')
+        )
+
+
+def pick_best(trials: List[Trial], latency_target_ms: float) -> Trial:
+    """
+    Choose the trial with the highest throughput within the latency target
+    
+    Args:
+        trials: Trials ordered from the most to the least preferred values,
+            which decides near-ties
+        latency_target_ms: Highest acceptable p95 latency
+    
+    Returns:
+        Chosen trial; if none meets the target without errors, the one with
+        the lowest p95 latency
+    """
+    eligible = [
+        trial for trial in trials
+        if not trial.errors and trial.percentile(0.95) <= latency_target_ms
+    ]
+    if not eligible:
+        logger.warning(f"No candidate met the {latency_target_ms:.0f} ms p95 target")
+        return min(trials, key=lambda trial: (trial.errors, trial.percentile(0.95)))
+    best = max(trial.throughput for trial in eligible)
+    return next(trial for trial in eligible if trial.throughput >= best * (1 - TIE_TOLERANCE))
+
+
+def load_calibration_messages(path: str = CALIBRATION_PATH) -> List[str]:
+    """
+    Read the message texts of a labeled TSV fixture
+    
+    Args:
+        path: TSV file with a header row and label and text columns
+    
+    Returns:
+        Message texts
+    """
+    with open(path, encoding='utf-8') as f:
+        next(f, None)
+        return [line.rstrip('\n').split('\t', 1)[1] for line in f if '\t' in line]
+
+
+class _RelayHandler(socketserver.StreamRequestHandler):
+    """Answers the commands _transmit_telnet sends, after the configured delay"""
+    
+    disable_nagle_algorithm = True
+    
+    def handle(self):
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line.rstrip(b'\r\n') != b'.':
+                    continue
+                in_data = False
+                reply = b'250 OK'
+            else:
+                command = line[:4].upper()
+                if command == b'QUIT':
+                    return
+                in_data = command == b'DATA'
+                reply = b'354 End data with <CR><LF>.<CR><LF>' if in_data else b'250 OK'
+            time.sleep(self.server.reply_delay)
+            self.wfile.write(reply + b'\r\n')
+
+
+class _RelayStandIn(socketserver.ThreadingTCPServer):
+    """Local relay accepting telnet sends, with a fixed delay per reply"""
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    # The default backlog of 5 drops connections at high concurrency, and the
+    # retried SYN would show up as a second of latency
+    request_queue_size = 128
+    
+    def __init__(self, reply_delay: float):
+        super().__init__(('127.0.0.1', 0), _RelayHandler)
+        self.reply_delay = reply_delay
+
+
+class AutoTuner:
+    """
+    Searches settings for the most messages per second within a latency target
+    
+    Inference runs the real AIProcessor over the calibration messages from
+    DAEMON_AI_WORKERS threads, as the daemon would, or from as many threads
+    as the candidate batch size if that is more, so batches can fill. Torch
+    threads, then sentiment batch size, then MAX_TOKEN_LENGTH (only used
+    when KEY_PHRASE_MODE is 'embedding') are searched one at a time, each
+    keeping the best values found so far. Transport sends through
+    EmailHandler to a local relay stand-in at increasing concurrency, up to
+    the largest TRANSPORT_CONCURRENCY value. Telnet timeouts are only
+    raised, and only when the relay round trip is given, since sends to a
+    loopback stand-in say nothing about the real relay.
+    """
+    
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        latency_target_ms: float = 1000.0,
+        messages: int = 200,
+        relay_latency_ms: Optional[float] = None,
+        calibration_path: str = CALIBRATION_PATH,
+        on_trial: Optional[Callable[[str, Trial], None]] = None
+    ):
+        """
+        Initialize tuner
+        
+        Args:
+            settings: Settings to start from (defaults to the current settings)
+            latency_target_ms: Highest acceptable p95 latency per message, for
+                inference and for transport
+            messages: Messages per trial
+            relay_latency_ms: Measured round trip to the real relay, used
+                as the stand-in's delay per reply and to check the telnet
+                timeouts (None uses DEFAULT_RELAY_LATENCY_MS and keeps the
+                configured timeouts)
+            calibration_path: Labeled TSV fixture with the calibration messages
+            on_trial: Called with the stage name and each finished trial
+        """
+        self.settings = settings or get_settings()
+        self.latency_target_ms = latency_target_ms
+        self.messages = messages
+        self.relay_latency_ms = relay_latency_ms
+        self.on_trial = on_trial or (lambda stage, trial: None)
+        
+        # A reference number per message keeps repeated texts distinct
+        texts = load_calibration_messages(calibration_path)
+        self.workload = [f"{texts[i % len(texts)]} Reference {i}." for i in range(messages)]
+        
+        self.chosen: Dict[str, Trial] = {}
+        # Caveats about the chosen values, written to the profile
+        self.notes: List[str] = []
+    
+    def _run(self, stage: str, params: Dict[str, Any], workers: int, send: Callable[[int], bool]) -> Trial:
+        """Run the workload on worker threads, timing each message"""
+        latencies: List[float] = [0.0] * self.messages
+        errors = 0
+        
+        def timed(i: int) -> bool:
+            start = time.perf_counter()
+            try:
+                ok = send(i)
+            except Exception as e:
+                logger.debug(f"{stage} message {i} failed: {e}")
+                ok = False
+            latencies[i] = time.perf_counter() - start
+            return ok
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for ok in executor.map(timed, range(self.messages)):
+                errors += not ok
+        trial = Trial(params, self.messages, time.perf_counter() - start, latencies, errors)
+        
+        logger.info(f"{stage} trial {trial.describe()}")
+        self.on_trial(stage, trial)
+        return trial
+    
+    def _inference_trial(self, params: Dict[str, Any]) -> Trial:
+        from ai_processor import AIProcessor
+        
+        # Embedding cache hits would flatter every candidate equally; measure misses
+        settings = replace(self.settings, EMBEDDING_CACHE_SIZE=0, **params)
+        # The weights load once and every trial's processor reuses them
+        processor = AIProcessor(model_load_mode='shared', settings=settings)
+        try:
+            # The first messages pay for lazy initialization, outside the timing
+            for text in self.workload[:2]:
+                processor.extract_context(text)
+            
+            def send(i: int) -> bool:
+                context = processor.extract_context(self.workload[i])
+                return 'error' not in context and bool(processor.generate_tokens(context))
+            
+            # Fewer callers than the batch size would never fill a batch
+            workers = max(self.settings.DAEMON_AI_WORKERS, params['INFERENCE_MAX_BATCH'])
+            return self._run('inference', params, workers, send)
+        finally:
+            processor.close()
+    
+    def tune_inference(self) -> Dict[str, Any]:
+        """
+        Search torch threads, sentiment batch size and MAX_TOKEN_LENGTH
+        
+        Returns:
+            Dictionary with the chosen TORCH_THREADS, INFERENCE_MAX_BATCH and
+            MAX_TOKEN_LENGTH, and DAEMON_AI_WORKERS raised to the batch size
+            it was measured with
+        """
+        import torch
+        
+        cores = os.cpu_count() or 1
+        threads = sorted({n for n in (1, 2, 4, 8, 16, 32) if n <= cores} | {cores})
+        
+        best = {
+            'TORCH_THREADS': self.settings.TORCH_THREADS or torch.get_num_threads(),
+            'INFERENCE_MAX_BATCH': self.settings.INFERENCE_MAX_BATCH,
+            'MAX_TOKEN_LENGTH': self.settings.MAX_TOKEN_LENGTH
+        }
+        searches: List[Tuple[str, Tuple[int, ...]]] = [
+            ('TORCH_THREADS', tuple(threads)),
+            ('INFERENCE_MAX_BATCH', BATCH_SIZES)
+        ]
+        if self.settings.KEY_PHRASE_MODE == 'embedding':
+            # Longest first, so a tie keeps more of each sentence
+            searches.append(('MAX_TOKEN_LENGTH', tuple(reversed(TOKEN_LENGTHS))))
+        
+        for name, candidates in searches:
+            trials = [self._inference_trial({**best, name: value}) for value in candidates]
+            chosen = pick_best(trials, self.latency_target_ms)
+            best = dict(chosen.params)
+            self.chosen['inference'] = chosen
+        
+        best['DAEMON_AI_WORKERS'] = max(
+            self.settings.DAEMON_AI_WORKERS, best['INFERENCE_MAX_BATCH']
+        )
+        return best
+    
+    def tune_transport(self) -> Dict[str, Any]:
+        """
+        Search concurrent telnet sends, and raise the telnet timeouts if
+        the relay round trip was given and sends need longer
+        
+        Returns:
+            Dictionary with the chosen DAEMON_TRANSPORT_WORKERS and
+            SCHEDULER_WORKERS (the same value), plus TELNET_CONNECT_TIMEOUT
+            and TELNET_REPLY_TIMEOUT with a given relay round trip
+        """
+        from email_handler import EmailHandler
+        
+        latency_ms = self.relay_latency_ms
+        if latency_ms is None:
+            latency_ms = DEFAULT_RELAY_LATENCY_MS
+        relay = _RelayStandIn(latency_ms / 1000)
+        threading.Thread(target=relay.serve_forever, name='relay-stand-in', daemon=True).start()
+        try:
+            host, port = relay.server_address
+            # SMTP points at the stand-in too, so a failed send can't fall back to a real relay
+            handler = EmailHandler(settings=replace(
+                self.settings,
+                TELNET_HOST=host,
+                TELNET_PORT=port,
+                SMTP_SERVER=host,
+                SMTP_PORT=port,
+                SMTP_TLS='none',
+                BREAKER_FAILURE_THRESHOLD=self.messages + 1
+            ))
+            tokens = self.workload[0].split()
+            
+            def send(i: int) -> bool:
+                return handler.send_via_telnet(f"user{i}@example.com", tokens)
+            
+            trials = [
+                self._run('transport', {'concurrency': concurrency}, concurrency, send)
+                for concurrency in TRANSPORT_CONCURRENCY
+            ]
+        finally:
+            relay.shutdown()
+            relay.server_close()
+        
+        chosen = pick_best(trials, self.latency_target_ms)
+        self.chosen['transport'] = chosen
+        
+        concurrency = chosen.params['concurrency']
+        if concurrency == TRANSPORT_CONCURRENCY[-1]:
+            note = (
+                f"transport concurrency stopped at the {concurrency} cap; the relay "
+                f"stand-in never pushes back, so check the real relay's connection limit"
+            )
+            logger.warning(note)
+            self.notes.append(note)
+        values = {
+            'DAEMON_TRANSPORT_WORKERS': concurrency,
+            'SCHEDULER_WORKERS': concurrency
+        }
+        
+        if self.relay_latency_ms is not None:
+            # No single reply takes longer than the whole send it is part of
+            needed = round(TIMEOUT_MARGIN * chosen.percentile(0.99) / 1000, 1)
+            values['TELNET_CONNECT_TIMEOUT'] = max(self.settings.TELNET_CONNECT_TIMEOUT, needed)
+            values['TELNET_REPLY_TIMEOUT'] = max(self.settings.TELNET_REPLY_TIMEOUT, needed)
+        return values
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        Tune inference, then transport
+        
+        Returns:
+            Chosen values by setting name
+        """
+        levels = {name: logging.getLogger(name).level for name in _NOISY_LOGGERS}
+        for name in _NOISY_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+        try:
+            return {**self.tune_inference(), **self.tune_transport()}
+        finally:
+            for name, level in levels.items():
+                logging.getLogger(name).setLevel(level)
+    
+    def write_profile(self, path: str, values: Dict[str, Any]):
+        """
+        Write chosen values as a profile for TUNING_PROFILE
+        
+        Args:
+            path: Profile file, in .env format
+            values: Chosen values by setting name
+        """
+        if self.relay_latency_ms is not None:
+            relay = f"relay round trip {self.relay_latency_ms:g} ms per reply"
+        else:
+            relay = (
+                f"relay stand-in latency {DEFAULT_RELAY_LATENCY_MS:g} ms per reply, "
+                f"telnet timeouts left as configured"
+            )
+        lines = [
+            f"# Written by `python main.py --mode tune` on {datetime.now():%Y-%m-%d %H:%M}",
+            f"# Target p95 latency {self.latency_target_ms:.0f} ms, {self.messages} messages per trial, {relay}",
+        ]
+        for stage, trial in self.chosen.items():
+            lines.append(f"# {stage}: {trial.describe()}")
+        lines.extend(f"# Note: {note}" for note in self.notes)
+        lines.extend(f"{name}={value}" for name, value in values.items())
+        
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        logger.info(f"Tuning profile written to {path}")